@@ -1,16 +1,21 @@
 from flask import Flask, render_template, flash, redirect, url_for, session, request, Response
 from flask_sqlalchemy import SQLAlchemy
 from werkzeug.security import generate_password_hash, check_password_hash
-from functools import wraps
+from sqlalchemy import func
+from sqlalchemy.schema import CreateIndex
 import os
-import time
-import cv2
-import numpy as np
-import pyttsx3
+import bulk_io
+import database
+import medical_summary
+import search_index
+from auth import login_required_admin, login_required_user
+from config import Config
+from listings import paginate, page_size, prefix_filter
 
 app = Flask(__name__)
 app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY', os.urandom(24))
-app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///site.db'
+app.config['SQLALCHEMY_DATABASE_URI'] = Config.SQLALCHEMY_DATABASE_URI
+app.config['SQLALCHEMY_ENGINE_OPTIONS'] = database.engine_options(Config.SQLALCHEMY_DATABASE_URI)
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 # Enable CSRF protection
 app.config['WTF_CSRF_ENABLED'] = True
@@ -18,36 +23,27 @@ app.config['WTF_CSRF_ENABLED'] = True
 app.config['SESSION_PERMANENT'] = False
 app.config['PERMANENT_SESSION_LIFETIME'] = 1800  # 30 minutes
 db = SQLAlchemy(app)
+# WAL, synchronous and busy-timeout pragmas on every pooled SQLite connection
+database.init_app(app, db)
 
 class Users(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     username = db.Column(db.String(20), unique=True, nullable=False)
     uname = db.Column(db.String(20), nullable=False)
-    lname = db.Column(db.String(20), nullable=False)
+    lname = db.Column(db.String(20), nullable=False, index=True)
     email = db.Column(db.String(120), unique=True, nullable=False)
     date = db.Column(db.String(120), nullable=False)
     address = db.Column(db.String(120), nullable=False)
     phone = db.Column(db.String(20), unique=True, nullable=False)
     pass1 = db.Column(db.String(60), nullable=False)
 
-# Authentication decorators
-def login_required_user(f):
-    @wraps(f)
-    def decorated_function(*args, **kwargs):
-        if 'user_id' not in session or 'user_type' not in session or session.get('user_type') != 'user':
-            flash('Please login as a user to access this page.', 'danger')
-            return redirect(url_for('login'))
-        return f(*args, **kwargs)
-    return decorated_function
-
-def login_required_admin(f):
-    @wraps(f)
-    def decorated_function(*args, **kwargs):
-        if 'user_id' not in session or 'user_type' not in session or session.get('user_type') != 'admin':
-            flash('Please login as an admin to access this page.', 'danger')
-            return redirect(url_for('admin_login'))
-        return f(*args, **kwargs)
-    return decorated_function
+
+# Case-insensitive prefix search in the user listing scans these (see listings.prefix_filter)
+db.Index('ix_users_lower_username', func.lower(Users.username))
+db.Index('ix_users_lower_email', func.lower(Users.email))
+db.Index('ix_users_lower_phone', func.lower(Users.phone))
+db.Index('ix_users_lower_lname', func.lower(Users.lname))
+
 
 # admin database
 class User(db.Model):
@@ -61,14 +57,14 @@ class User(db.Model):
 # models.py
 class Medical(db.Model):
     id = db.Column(db.Integer, primary_key=True)
-    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False, index=True)
     uname = db.Column(db.String(255))  # Add this line
     address = db.Column(db.String(255))
     allergies = db.Column(db.String(255))
     visionstatus = db.Column(db.String(255))
     medications = db.Column(db.String(255))
     surgeries = db.Column(db.String(255))
-    bloodgroup = db.Column(db.String(255))
+    bloodgroup = db.Column(db.String(255), index=True)
     age = db.Column(db.String(255))
     chronic_conditions = db.Column(db.String(255))
     emergency_contact = db.Column(db.String(20))
@@ -205,6 +201,7 @@ def delete_user(id):
         user = Users.query.get_or_404(id)
         db.session.delete(user)
         db.session.commit()
+        medical_summary.cache.invalidate(id)
         flash('User deleted successfully', 'success')
     except Exception as e:
         db.session.rollback()
@@ -224,7 +221,7 @@ def delete_user(id):
 def home():
     if request.method == 'POST':
         if request.form.get('start_detection') == 'Start Detection':
-           return redirect(url_for('start'))
+           return redirect(url_for('detection.start'))
         elif request.form.get('Continue') == 'Continue':
            return render_template("test1.html")
     
@@ -260,8 +257,51 @@ def admin_login():
 @app.route("/admin_home")
 @login_required_admin
 def admin_home():
-    return render_template("admin_home.html")
+    return render_template("admin_home.html", detector=detector_profiles.status())
+
+
+# Emergency medical summaries, cached per user and refreshed on every medical record write
+def load_medical_summary(user_id):
+    return medical_summary.load_summary(db.session, Medical, user_id)
 
+def refresh_medical_summary(user_id):
+    try:
+        summary = load_medical_summary(user_id)
+        medical_summary.cache.put(user_id, summary)
+        worker = running_speech_worker()
+        if summary and worker is not None and Config.MEDICAL_SUMMARY_PRESYNTHESIZE:
+            # Render the sentences now so the first readout in an emergency plays instantly;
+            # an admin write never starts a speech engine just for this
+            worker.prerender(summary['fragments'], private=True)
+    except Exception as e:
+        medical_summary.cache.invalidate(user_id)
+        print(f"Error refreshing medical summary: {e}")
+
+@app.route('/medical_summary')
+@login_required_user
+def my_medical_summary():
+    summary = medical_summary.cache.get(session['user_id'], load_medical_summary)
+    if summary is None:
+        return {'error': 'No medical information recorded'}, 404
+    return summary
+
+@app.route('/medical_summary/speak', methods=['POST'])
+@login_required_user
+def speak_medical_summary():
+    summary = medical_summary.cache.get(session['user_id'], load_medical_summary)
+    if summary is None:
+        return {'error': 'No medical information recorded'}, 404
+    queued = get_speech_worker().say(summary['text'], PRIORITY_INFO, key=f"medical-summary:{session['user_id']}",
+                                     max_age=30, fragments=summary['fragments'], private=True)
+    return {'queued': queued, 'text': summary['text']}
+
+@app.route('/medical_summary/<int:user_id>')
+@login_required_admin
+def user_medical_summary(user_id):
+    summary = medical_summary.cache.get(user_id, load_medical_summary)
+    if summary is None:
+        return {'error': 'No medical information recorded'}, 404
+    return summary
 
 @app.route('/medical_info/', methods=['GET', 'POST'])
 @login_required_user
@@ -307,6 +347,7 @@ def medical_info():
             # Add and commit the medical_info to the database
             db.session.add(medical_info)
             db.session.commit()
+            refresh_medical_summary(user_id)
             flash('Medical information added successfully!', 'success')
             return redirect(url_for('home'))
 
@@ -317,35 +358,116 @@ def medical_info():
 
     return render_template("add_medical.html")
 
+# Admin listings: keyset-paginated, sortable and filterable
+USER_SORTS = {'id': Users.id, 'username': Users.username, 'lname': Users.lname, 'email': Users.email}
+MEDICAL_SORTS = {'id': Medical.id, 'user_id': Medical.user_id}
+
+
+def ensure_indexes():
+    """Create indexes declared on the models that an older database is missing"""
+    # IF NOT EXISTS rather than checkfirst: reflection cannot read the lower() expression indexes
+    with db.engine.begin() as connection:
+        for table in db.metadata.sorted_tables:
+            for index in table.indexes:
+                connection.execute(CreateIndex(index, if_not_exists=True))
+
+
+def database_stats():
+    """User and medical record counts in one query"""
+    # count(*) rather than count(id): SQLite answers it from the smallest index without reading rows
+    user_count, medical_count = db.session.query(
+        db.session.query(func.count()).select_from(Users).scalar_subquery(),
+        db.session.query(func.count()).select_from(Medical).scalar_subquery(),
+    ).one()
+    return {'user_count': user_count, 'medical_count': medical_count}
+
+
+def user_filters(prefix=''):
+    """WHERE clauses of the user listing and export filters in the query string"""
+    search = request.args.get(prefix + 'q', '').strip()
+    if not search:
+        return []
+    return [prefix_filter(Users.id, [Users.username, Users.email, Users.phone, Users.lname], search)]
+
+
+def medical_filters(prefix=''):
+    """WHERE clauses of the medical listing and export filters in the query string"""
+    filters = []
+    user_id = request.args.get(prefix + 'user_id', type=int)
+    if user_id is not None:
+        filters.append(Medical.user_id == user_id)
+    bloodgroup = request.args.get(prefix + 'bloodgroup', '').strip()
+    if bloodgroup:
+        filters.append(Medical.bloodgroup == bloodgroup)
+    return filters
+
+
+def user_page(prefix=''):
+    args = request.args
+    query = Users.query.filter(*user_filters(prefix))
+    return paginate(query, USER_SORTS, Users.id, sort=args.get(prefix + 'sort'), order=args.get(prefix + 'order'),
+                    cursor=args.get(prefix + 'cursor'), limit=page_size(args.get(prefix + 'limit')))
+
+
+def medical_page(prefix=''):
+    args = request.args
+    query = Medical.query.filter(*medical_filters(prefix))
+    return paginate(query, MEDICAL_SORTS, Medical.id, sort=args.get(prefix + 'sort'),
+                    order=args.get(prefix + 'order'), cursor=args.get(prefix + 'cursor'),
+                    limit=page_size(args.get(prefix + 'limit')))
+
+
+@app.template_global()
+def page_url(**changes):
+    """URL of the current listing with some query parameters replaced (None removes one)"""
+    args = request.args.to_dict()
+    for name, value in changes.items():
+        if value is None:
+            args.pop(name, None)
+        else:
+            args[name] = value
+    return url_for(request.endpoint, **request.view_args, **args)
+
+
 @app.route("/database_viewer")
 @login_required_admin
 def database_viewer():
     try:
-        # Get all users
-        users = Users.query.all()
-        
-        # Get all medical records
-        medical_records = Medical.query.all()
-        
-        # Get database statistics
-        user_count = Users.query.count()
-        medical_count = Medical.query.count()
-        
-        return render_template('database_viewer.html', 
-                             users=users, 
-                             medical_records=medical_records,
-                             user_count=user_count,
-                             medical_count=medical_count)
+        # Users and medical records page independently: their query parameters are prefixed u_ and m_
+        return render_template('database_viewer.html',
+                               users=user_page('u_'),
+                               medical_records=medical_page('m_'),
+                               **database_stats())
     except Exception as e:
         flash('Error accessing database viewer. Please try again.', 'danger')
         return redirect(url_for('admin_home'))
 
+@app.route("/admin/search")
+@login_required_admin
+def admin_search():
+    search = request.args.get('q', '').strip()
+    scope = 'medical' if request.args.get('scope') == 'medical' else 'users'
+    model = Medical if scope == 'medical' else Users
+    results = None
+    try:
+        if search:
+            limit = page_size(request.args.get('limit'))
+            if search_index.ensure(db.engine):
+                results = search_index.search(db.session, model, scope, search, request.args.get('cursor'), limit)
+            else:
+                columns = [getattr(model, column) for column in search_index.INDEXES[scope]['columns']]
+                results = paginate(model.query.filter(search_index.like_filter(columns, search)),
+                                   {'id': model.id}, model.id, cursor=request.args.get('cursor'), limit=limit)
+    except Exception as e:
+        print(f"Search failed: {e}")
+        flash('Search failed. Please try again.', 'danger')
+    return render_template('search.html', search=search, scope=scope, results=results)
+
 @app.route("/users")
 @login_required_admin
 def users():
     try:
-        users = Users.query.all()
-        return render_template('view_user.html', users=users)
+        return render_template('view_user.html', users=user_page(), **database_stats())
     except Exception as e:
         flash('Error loading users. Please try again.', 'danger')
         return redirect(url_for('admin_home'))
@@ -354,8 +476,7 @@ def users():
 @login_required_admin
 def view_user():
     try:
-        users = Users.query.all()
-        return render_template('view_user.html', users=users)
+        return render_template('view_user.html', users=user_page(), **database_stats())
     except Exception as e:
         flash('Error loading users. Please try again.', 'danger')
         return redirect(url_for('admin_home'))
@@ -365,8 +486,7 @@ def view_user():
 @login_required_admin
 def view_medical():
     try:
-        user_medical_info = Medical.query.all()
-        return render_template('view_medical.html', user_medical_info=user_medical_info)
+        return render_template('view_medical.html', user_medical_info=medical_page())
     except Exception as e:
         flash('Error loading medical records. Please try again.', 'danger')
         return redirect(url_for('admin_home'))
@@ -391,6 +511,7 @@ def update_medical(id):
 
             # Commit the changes to the database
             db.session.commit()
+            refresh_medical_summary(medical_info.user_id)
             flash('Medical information updated successfully', 'success')
             return redirect(url_for('view_medical'))
 
@@ -409,183 +530,93 @@ def delete_medical(id):
     try:
         medical_info = Medical.query.get_or_404(id)
 
+        user_id = medical_info.user_id
+
         # Delete the medical_info from the database
         db.session.delete(medical_info)
         db.session.commit()
+        refresh_medical_summary(user_id)
         flash('Medical information deleted successfully', 'success')
     except Exception as e:
         db.session.rollback()
         flash('Error deleting medical information. Please try again.', 'danger')
     return redirect(url_for('view_medical'))
 
+# Bulk import and export of users and medical records
+BULK_KINDS = ('users', 'medical')
 
+@app.route('/admin/import', methods=['GET', 'POST'])
+@login_required_admin
+def bulk_import():
+    report = None
+    if request.method == 'POST':
+        upload = request.files.get('file')
+        kind = request.form.get('kind')
+        fmt = bulk_io.detect_format(upload.filename if upload else None, request.form.get('format'))
+        if not upload or not upload.filename:
+            flash('Please choose a file to import.', 'danger')
+        elif kind not in BULK_KINDS:
+            flash('Please choose what the file contains.', 'danger')
+        elif fmt is None:
+            flash('Unknown file type: upload a .csv or .jsonl file or choose the format.', 'danger')
+        else:
+            dry_run = bool(request.form.get('dry_run'))
+            try:
+                if kind == 'users':
+                    report = bulk_io.import_users(db.session, Users, upload.stream, fmt, dry_run)
+                else:
+                    report = bulk_io.import_medical(db.session, Medical, Users, upload.stream, fmt, dry_run)
+                    if report.inserted and not dry_run:
+                        # Too many users may be affected to refresh one by one
+                        medical_summary.cache.clear()
+            except Exception as e:
+                db.session.rollback()
+                print(f"Bulk import failed: {e}")
+                flash('Import failed. Please check the file and try again.', 'danger')
+        if report is not None and request.accept_mimetypes.best_match(['text/html', 'application/json']) == 'application/json':
+            return report.as_dict()
+    return render_template('bulk_import.html', report=report.as_dict() if report else None)
 
-# detection code
+@app.route('/admin/export/<kind>')
+@login_required_admin
+def bulk_export(kind):
+    fmt = request.args.get('format', 'csv')
+    if kind not in BULK_KINDS or fmt not in bulk_io.FORMATS:
+        return Response(status=404)
+    # The same filters as the listings, without a prefix; password hashes are never exported
+    if kind == 'users':
+        model, fields, filters = Users, bulk_io.USER_EXPORT_FIELDS, user_filters()
+    else:
+        model, fields, filters = Medical, bulk_io.MEDICAL_EXPORT_FIELDS, medical_filters()
+    where = db.and_(*filters) if filters else None
+    content_type = 'text/csv; charset=utf-8' if fmt == 'csv' else 'application/x-ndjson; charset=utf-8'
+    return Response(bulk_io.export_stream(db.engine, model, fields, fmt, where), content_type=content_type,
+                    headers={'Content-Disposition': f'attachment; filename={kind}.{fmt}'})
 
 
 
-import cv2
-import numpy as np
-import pyttsx3
+# detection code
 
-# Global variables for camera and detection
-camera = None
-detection_active = False
-voice_enabled = True
 
-def generate_frames():
-    global camera, detection_active, voice_enabled
-    camera = cv2.VideoCapture(0)
-    
-    # Initialize text-to-speech engine
-    engine = pyttsx3.init()
-    engine.setProperty('rate', 150)  # Speed of speech
-    
-    # Load YOLO model
-    net = cv2.dnn.readNetFromDarknet('yolov3.cfg', 'yolov3.weights')
-    classes = []
-    with open('coco.names', 'r') as f:
-        classes = [line.strip() for line in f.readlines()]
-    layer_names = net.getLayerNames()
-    output_layers = net.getUnconnectedOutLayersNames()
-    colors = np.random.uniform(0, 255, size=(len(classes), 3))
-    
-    FOCAL_LENGTH = 1000  # in pixels
-    OBJECT_HEIGHT = 0.5  # in meters
-    MIN_DISTANCE = 2  # in meters
-    
-    last_voice_time = 0
-    voice_cooldown = 2  # seconds between voice alerts
-    
-    while detection_active and camera.isOpened():
-        success, frame = camera.read()
-        if not success:
-            break
-        
-        # Perform object detection
-        height, width, channels = frame.shape
-        blob = cv2.dnn.blobFromImage(frame, 0.00392, (416, 416), (0, 0, 0), True, crop=False)
-        net.setInput(blob)
-        outs = net.forward(output_layers)
-        
-        # Process detections
-        class_ids = []
-        confidences = []
-        boxes = []
-        for out in outs:
-            for detection in out:
-                scores = detection[5:]
-                class_id = np.argmax(scores)
-                confidence = scores[class_id]
-                if confidence > 0.5:
-                    center_x = int(detection[0] * width)
-                    center_y = int(detection[1] * height)
-                    w = int(detection[2] * width)
-                    h = int(detection[3] * height)
-                    x = center_x - w // 2
-                    y = center_y - h // 2
-                    boxes.append([x, y, w, h])
-                    confidences.append(float(confidence))
-                    class_ids.append(class_id)
-        
-        # Apply non-max suppression
-        indexes = cv2.dnn.NMSBoxes(boxes, confidences, 0.5, 0.4)
-        
-        # Draw bounding boxes and labels
-        current_time = time.time()
-        for i in range(len(boxes)):
-            if i in indexes:
-                x, y, w, h = boxes[i]
-                label = str(classes[class_ids[i]])
-                color = colors[class_ids[i]]
-                cv2.rectangle(frame, (x, y), (x + w, y + h), color, 2)
-                
-                # Calculate distance
-                obj_height = h
-                if obj_height > 0:
-                    distance = (OBJECT_HEIGHT * FOCAL_LENGTH) / obj_height
-                    distance = round(distance, 2)
-                    
-                    # Add label with distance
-                    label_text = f"{label}: {distance}m"
-                    if distance < MIN_DISTANCE:
-                        label_text = f"WARNING: {label_text}"
-                        cv2.putText(frame, label_text, (x, y - 10), 
-                                   cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 0, 255), 2)
-                        
-                        # Voice warning for close objects
-                        if current_time - last_voice_time > voice_cooldown and voice_enabled:
-                            try:
-                                engine.say(f"Warning! {label} too close at {distance} meters")
-                                engine.runAndWait()
-                                last_voice_time = current_time
-                            except:
-                                pass  # Ignore voice errors
-                    else:
-                        cv2.putText(frame, label_text, (x, y - 10), 
-                                   cv2.FONT_HERSHEY_SIMPLEX, 0.5, color, 2)
-                        
-                        # Voice announcement for important objects (less frequent)
-                        important_objects = ['person', 'car', 'bicycle', 'dog', 'cat']
-                        if label in important_objects and current_time - last_voice_time > voice_cooldown * 2 and voice_enabled:
-                            try:
-                                engine.say(f"{label} detected at {distance} meters")
-                                engine.runAndWait()
-                                last_voice_time = current_time
-                            except:
-                                pass  # Ignore voice errors
-        
-        # Encode frame for streaming
-        ret, buffer = cv2.imencode('.jpg', frame)
-        frame = buffer.tobytes()
-        
-        yield (b'--frame\r\n'
-               b'Content-Type: image/jpeg\r\n\r\n' + frame + b'\r\n')
-    
-    # Cleanup
-    if camera is not None:
-        camera.release()
 
-@app.route('/video_feed')
-def video_feed():
-    return Response(generate_frames(), 
-                   mimetype='multipart/x-mixed-replace; boundary=frame')
+import metrics
+from detection import detection
+from model_registry import detector_profiles
+from speech import PRIORITY_INFO, get_speech_worker, running_speech_worker
 
-@app.route('/toggle_voice')
-@login_required_user
-def toggle_voice():
-    global voice_enabled
-    voice_enabled = not voice_enabled
-    return {'voice_enabled': voice_enabled}
+# The detection routes import OpenCV and the pipeline only when first used
+app.register_blueprint(detection)
 
-@app.route('/stop_detection')
-@login_required_user
-def stop_detection():
-    global detection_active, camera
-    detection_active = False
-    if camera is not None:
-        camera.release()
-        camera = None
-    flash('Detection stopped successfully.', 'info')
-    return redirect(url_for('home'))
-
-@app.route("/start", methods=['GET', 'POST'])
-@login_required_user
-def start():
-    global detection_active
-    
-    if request.method == 'POST':
-        if request.form.get('Start') == 'Start':
-            # Validate file existence
-            if not os.path.exists('yolov3.cfg') or not os.path.exists('yolov3.weights') or not os.path.exists('coco.names'):
-                flash('Required YOLO files not found. Please ensure yolov3.cfg, yolov3.weights, and coco.names are present.', 'danger')
-                return render_template("start.html")
-            
-            # Start detection
-            detection_active = True
-            return render_template("detection.html")
-    else:
-        return render_template("start.html")
+@app.route('/database_status')
+@login_required_admin
+def database_status():
+    return dict(database.status(db.engine), medical_summary_cache=medical_summary.cache.stats())
+
+@app.route('/metrics')
+def metrics_endpoint():
+    if not metrics.enabled:
+        return Response(status=404)
+    return Response(metrics.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
 
 
 
@@ -593,4 +624,7 @@ def start():
 if __name__ == '__main__':
     with app.app_context():
         db.create_all()
+        ensure_indexes()
+        # Builds the full-text indexes on first run; triggers keep them in sync afterwards
+        search_index.ensure(db.engine)
     app.run(debug=True)
@@ -0,0 +1,27 @@
+"""
+Login decorators shared by the app and its blueprints
+"""
+
+from functools import wraps
+
+from flask import flash, redirect, session, url_for
+
+
+def login_required_user(f):
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        if 'user_id' not in session or 'user_type' not in session or session.get('user_type') != 'user':
+            flash('Please login as a user to access this page.', 'danger')
+            return redirect(url_for('login'))
+        return f(*args, **kwargs)
+    return decorated_function
+
+
+def login_required_admin(f):
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        if 'user_id' not in session or 'user_type' not in session or session.get('user_type') != 'admin':
+            flash('Please login as an admin to access this page.', 'danger')
+            return redirect(url_for('admin_login'))
+        return f(*args, **kwargs)
+    return decorated_function
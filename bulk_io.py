@@ -0,0 +1,327 @@
+"""
+Bulk import and export of users and medical records
+Imports stream a CSV or JSONL upload in chunks: each chunk is validated,
+checked for duplicates with one IN query per unique column, has its
+passwords hashed on a thread pool (the hashing releases the GIL) and is
+inserted in a single transaction. Every rejected row is reported with its
+line number instead of failing the whole file. Exports stream the tables in
+id order, one short query per chunk, in the same formats.
+"""
+
+import csv
+import io
+import itertools
+import json
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from sqlalchemy import insert, select
+from sqlalchemy.exc import IntegrityError
+from werkzeug.security import generate_password_hash
+
+from config import Config
+
+FORMATS = ('csv', 'jsonl')
+USER_FIELDS = ('username', 'uname', 'lname', 'email', 'date', 'address', 'phone', 'password')
+USER_EXPORT_FIELDS = ('id', 'username', 'uname', 'lname', 'email', 'date', 'address', 'phone')
+MEDICAL_FIELDS = ('uname', 'address', 'allergies', 'visionstatus', 'medications', 'surgeries', 'bloodgroup', 'age',
+                  'chronic_conditions', 'emergency_contact', 'blood_pressure')
+MEDICAL_EXPORT_FIELDS = ('id', 'user_id') + MEDICAL_FIELDS
+BLOOD_GROUPS = ('A+', 'A-', 'B+', 'B-', 'AB+', 'AB-', 'O+', 'O-')
+MIN_PASSWORD_LENGTH = 6
+EMAIL_PATTERN = re.compile(r'^[^@\s]+@[^@\s]+\.[^@\s]+$')
+# SQLite before 3.32 allows at most 999 bound parameters per statement
+MAX_IN_PARAMETERS = 500
+
+
+def detect_format(filename, requested=None):
+    """Return 'csv' or 'jsonl' from an explicit choice or the file extension, or None"""
+    if requested in FORMATS:
+        return requested
+    extension = (filename or '').rsplit('.', 1)[-1].lower()
+    if extension in ('jsonl', 'ndjson', 'json'):
+        return 'jsonl'
+    if extension in ('csv', 'txt'):
+        return 'csv'
+    return None
+
+
+def read_records(stream, fmt):
+    """Yield (line, record, error) for every row of a binary CSV or JSONL stream"""
+    text = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+    try:
+        if fmt == 'csv':
+            reader = csv.DictReader(text)
+            if not reader.fieldnames:
+                yield 1, None, "Missing CSV header row"
+                return
+            for record in reader:
+                if None in record:
+                    yield reader.line_num, None, "More values than header columns"
+                else:
+                    yield reader.line_num, record, None
+        else:
+            for line, raw in enumerate(text, 1):
+                if not raw.strip():
+                    continue
+                try:
+                    record = json.loads(raw)
+                except ValueError as e:
+                    yield line, None, f"Invalid JSON: {e}"
+                    continue
+                if isinstance(record, dict):
+                    yield line, record, None
+                else:
+                    yield line, None, "Each line must be a JSON object"
+    except UnicodeDecodeError:
+        yield None, None, "File is not UTF-8 text"
+    finally:
+        text.detach()
+
+
+def clean(record, fields):
+    """Stripped string values for fields; missing and null values become ''"""
+    values = {}
+    for field in fields:
+        value = record.get(field)
+        values[field] = '' if value is None else str(value).strip()
+    return values
+
+
+def length_errors(model, values):
+    errors = []
+    for field, value in values.items():
+        column = model.__table__.columns.get(field)
+        length = getattr(column.type, 'length', None) if column is not None else None
+        if length and len(value) > length:
+            errors.append(f"{field} is longer than {length} characters")
+    return errors
+
+
+def existing_values(session, column, values):
+    """The subset of values already present in column, in IN queries of bounded size"""
+    values = list(values)
+    found = set()
+    for offset in range(0, len(values), MAX_IN_PARAMETERS):
+        found.update(session.scalars(select(column).where(column.in_(values[offset:offset + MAX_IN_PARAMETERS]))))
+    return found
+
+
+class ImportReport:
+    def __init__(self, kind, dry_run=False, max_errors=None):
+        self.kind = kind
+        self.dry_run = dry_run
+        self.max_errors = Config.BULK_IMPORT_MAX_ERRORS if max_errors is None else max_errors
+        self.rows = 0
+        self.inserted = 0
+        self.error_count = 0
+        self.errors = []
+        self.seconds = 0.0
+
+    def error(self, line, message):
+        self.error_count += 1
+        if len(self.errors) < self.max_errors:
+            self.errors.append({'line': line, 'error': message})
+
+    def as_dict(self):
+        return {
+            'kind': self.kind,
+            'dry_run': self.dry_run,
+            'rows': self.rows,
+            'inserted': self.inserted,
+            'rejected': self.error_count,
+            'errors': sorted(self.errors, key=lambda error: error['line'] or 0),
+            'errors_truncated': self.error_count > len(self.errors),
+            'seconds': round(self.seconds, 3),
+        }
+
+
+def chunks(records, size):
+    records = iter(records)
+    while True:
+        chunk = list(itertools.islice(records, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def insert_chunk(session, model, pending, report):
+    """Insert [(line, row)] in one transaction; on a constraint race fall back to row by row"""
+    if report.dry_run or not pending:
+        # Nothing to write: just end the read transaction of the duplicate checks
+        session.rollback()
+        report.inserted += len(pending)
+        return
+    try:
+        session.execute(insert(model), [row for _, row in pending])
+        session.commit()
+        report.inserted += len(pending)
+        return
+    except IntegrityError:
+        session.rollback()
+    # A concurrent registration took one of these values after the duplicate check
+    for line, row in pending:
+        try:
+            with session.begin_nested():
+                session.execute(insert(model), [row])
+            report.inserted += 1
+        except IntegrityError as e:
+            report.error(line, f"Rejected by the database: {e.orig}")
+    session.commit()
+
+
+def import_users(session, Users, stream, fmt, dry_run=False, batch=None, workers=None,
+                 hash_password=generate_password_hash):
+    """Import user accounts from a CSV/JSONL stream; returns an ImportReport"""
+    batch = batch or Config.BULK_IMPORT_BATCH
+    report = ImportReport('users', dry_run)
+    start = time.perf_counter()
+    # Lines of the values accepted so far, to catch duplicates within the file
+    seen = {'username': {}, 'email': {}, 'phone': {}}
+    labels = {'username': 'Username', 'email': 'Email', 'phone': 'Phone number'}
+    with ThreadPoolExecutor(max_workers=workers or Config.BULK_HASH_WORKERS) as executor:
+        for chunk in chunks(read_records(stream, fmt), batch):
+            candidates = []
+            for line, record, error in chunk:
+                report.rows += 1
+                if error:
+                    report.error(line, error)
+                    continue
+                values = clean(record, USER_FIELDS)
+                errors = [f"{field} is required" for field in USER_FIELDS if not values[field]]
+                if values['email'] and not EMAIL_PATTERN.match(values['email']):
+                    errors.append("email is not a valid address")
+                if values['password'] and len(values['password']) < MIN_PASSWORD_LENGTH:
+                    errors.append(f"password must be at least {MIN_PASSWORD_LENGTH} characters")
+                errors += length_errors(Users, {k: v for k, v in values.items() if k != 'password'})
+                for field in seen:
+                    if values[field] in seen[field]:
+                        errors.append(f"{labels[field]} duplicates line {seen[field][values[field]]}")
+                if errors:
+                    report.error(line, '; '.join(errors))
+                    continue
+                for field in seen:
+                    seen[field][values[field]] = line
+                candidates.append((line, values))
+
+            taken = {field: existing_values(session, getattr(Users, field), [v[field] for _, v in candidates])
+                     for field in seen}
+            accepted = []
+            for line, values in candidates:
+                if values['email'] in taken['email']:
+                    report.error(line, "Email already registered")
+                elif values['phone'] in taken['phone']:
+                    report.error(line, "Phone number already registered")
+                elif values['username'] in taken['username']:
+                    report.error(line, "Username already taken")
+                else:
+                    accepted.append((line, values))
+
+            if dry_run:
+                hashes = itertools.repeat(None)
+            else:
+                hashes = executor.map(hash_password, [values['password'] for _, values in accepted])
+            pending = []
+            for (line, values), password_hash in zip(accepted, hashes):
+                row = {field: values[field] for field in USER_FIELDS if field != 'password'}
+                row['pass1'] = password_hash
+                pending.append((line, row))
+            insert_chunk(session, Users, pending, report)
+    session.rollback()
+    report.seconds = time.perf_counter() - start
+    return report
+
+
+def import_medical(session, Medical, Users, stream, fmt, dry_run=False, batch=None):
+    """Import medical records; each row names its user by user_id or username"""
+    batch = batch or Config.BULK_IMPORT_BATCH
+    report = ImportReport('medical', dry_run)
+    start = time.perf_counter()
+    for chunk in chunks(read_records(stream, fmt), batch):
+        candidates = []
+        for line, record, error in chunk:
+            report.rows += 1
+            if error:
+                report.error(line, error)
+                continue
+            values = clean(record, MEDICAL_FIELDS + ('user_id', 'username'))
+            errors = []
+            if values['user_id'] and not values['user_id'].isdigit():
+                errors.append("user_id must be a number")
+            elif not values['user_id'] and not values['username']:
+                errors.append("user_id or username is required")
+            if values['bloodgroup'] and values['bloodgroup'] not in BLOOD_GROUPS:
+                errors.append(f"bloodgroup must be one of {', '.join(BLOOD_GROUPS)}")
+            errors += length_errors(Medical, {field: values[field] for field in MEDICAL_FIELDS})
+            if errors:
+                report.error(line, '; '.join(errors))
+                continue
+            candidates.append((line, values))
+
+        user_ids = existing_values(session, Users.id, {int(v['user_id']) for _, v in candidates if v['user_id']})
+        usernames = [v['username'] for _, v in candidates if not v['user_id']]
+        ids_by_username = {}
+        for offset in range(0, len(usernames), MAX_IN_PARAMETERS):
+            ids_by_username.update(session.execute(
+                select(Users.username, Users.id).where(Users.username.in_(usernames[offset:offset + MAX_IN_PARAMETERS]))
+            ).all())
+
+        pending = []
+        for line, values in candidates:
+            user_id = int(values['user_id']) if values['user_id'] else ids_by_username.get(values['username'])
+            if user_id is None or (values['user_id'] and user_id not in user_ids):
+                report.error(line, "No such user")
+                continue
+            row = {field: values[field] or None for field in MEDICAL_FIELDS}
+            row['user_id'] = user_id
+            pending.append((line, row))
+        insert_chunk(session, Medical, pending, report)
+    session.rollback()
+    report.seconds = time.perf_counter() - start
+    return report
+
+
+def export_rows(engine, model, fields, where=None, batch=None):
+    """Yield lists of rows in id order, one short-lived query per chunk
+
+    Each chunk is read on its own connection and keyed on the last id, so a
+    slow download holds no transaction open and never blocks the WAL
+    checkpoint.
+    """
+    batch = batch or Config.BULK_EXPORT_BATCH
+    columns = [getattr(model, field) for field in fields]
+    id_index = fields.index('id')
+    last_id = None
+    while True:
+        statement = select(*columns).order_by(model.id).limit(batch)
+        if where is not None:
+            statement = statement.where(where)
+        if last_id is not None:
+            statement = statement.where(model.id > last_id)
+        with engine.connect() as connection:
+            rows = connection.execute(statement).all()
+        if not rows:
+            return
+        yield rows
+        last_id = rows[-1][id_index]
+
+
+def export_stream(engine, model, fields, fmt, where=None, batch=None):
+    """Yield the CSV or JSONL text of an export, one chunk at a time"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer) if fmt == 'csv' else None
+    if writer:
+        writer.writerow(fields)
+    for rows in export_rows(engine, model, fields, where, batch):
+        if writer:
+            writer.writerows(rows)
+        else:
+            for row in rows:
+                buffer.write(json.dumps(dict(zip(fields, row)), ensure_ascii=False))
+                buffer.write('\n')
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
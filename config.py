@@ -8,6 +8,33 @@ class Config:
     SECRET_KEY = os.environ.get('SECRET_KEY') or os.urandom(24)
     SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL') or 'sqlite:///site.db'
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+
+    # Connection pool (per process) and SQLite concurrency settings. WAL lets readers run
+    # alongside a writer; writers wait up to the busy timeout for the lock instead of failing
+    DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', 10))
+    DB_MAX_OVERFLOW = int(os.environ.get('DB_MAX_OVERFLOW', 20))
+    DB_POOL_TIMEOUT = float(os.environ.get('DB_POOL_TIMEOUT', 30))
+    DB_POOL_RECYCLE = int(os.environ.get('DB_POOL_RECYCLE', 1800))
+    SQLITE_JOURNAL_MODE = os.environ.get('SQLITE_JOURNAL_MODE', 'WAL')
+    SQLITE_SYNCHRONOUS = os.environ.get('SQLITE_SYNCHRONOUS', 'NORMAL')
+    SQLITE_BUSY_TIMEOUT_MS = int(os.environ.get('SQLITE_BUSY_TIMEOUT_MS', 5000))
+    SQLITE_WRITE_GATE = os.environ.get('SQLITE_WRITE_GATE', 'true').lower() in ('1', 'true', 'yes')
+
+    # Bulk import/export: rows per transaction, password hashing threads, export rows per query
+    BULK_IMPORT_BATCH = int(os.environ.get('BULK_IMPORT_BATCH', 500))
+    BULK_HASH_WORKERS = int(os.environ.get('BULK_HASH_WORKERS', 0)) or os.cpu_count() or 1
+    BULK_IMPORT_MAX_ERRORS = int(os.environ.get('BULK_IMPORT_MAX_ERRORS', 1000))
+    BULK_EXPORT_BATCH = int(os.environ.get('BULK_EXPORT_BATCH', 1000))
+
+    # Emergency medical summaries: per-process LRU cache, refreshed by this process's writes;
+    # the TTL bounds how stale another worker process's copy can get
+    MEDICAL_SUMMARY_CACHE_SIZE = int(os.environ.get('MEDICAL_SUMMARY_CACHE_SIZE', 4096))
+    MEDICAL_SUMMARY_TTL = float(os.environ.get('MEDICAL_SUMMARY_TTL', 300))
+    # Pre-render a summary's speech on each write, only in a speech worker that is already running.
+    # Summary clips are held in memory (MEDICAL_SUMMARY_AUDIO_CLIPS of them), never in the phrase cache
+    MEDICAL_SUMMARY_PRESYNTHESIZE = os.environ.get('MEDICAL_SUMMARY_PRESYNTHESIZE', 'false').lower() in ('1', 'true', 'yes')
+    MEDICAL_SUMMARY_AUDIO_CLIPS = int(os.environ.get('MEDICAL_SUMMARY_AUDIO_CLIPS', 256))
+
     WTF_CSRF_ENABLED = True
     
     # YOLO Configuration
@@ -24,3 +51,73 @@ class Config:
     # Detection Thresholds
     CONFIDENCE_THRESHOLD = float(os.environ.get('CONFIDENCE_THRESHOLD', 0.5))
     NMS_THRESHOLD = float(os.environ.get('NMS_THRESHOLD', 0.4))
+
+    # Detector profiles: network files, input size and thresholds per named profile.
+    # The active profile can be switched at runtime from the admin dashboard.
+    YOLO_TINY_CONFIG_PATH = os.environ.get('YOLO_TINY_CONFIG_PATH') or 'yolov3-tiny.cfg'
+    YOLO_TINY_WEIGHTS_PATH = os.environ.get('YOLO_TINY_WEIGHTS_PATH') or 'yolov3-tiny.weights'
+    DETECTOR_PROFILES = {
+        'yolov3-320': {'config': YOLO_CONFIG_PATH, 'weights': YOLO_WEIGHTS_PATH, 'input_size': 320,
+                       'confidence': CONFIDENCE_THRESHOLD, 'nms': NMS_THRESHOLD},
+        'yolov3-416': {'config': YOLO_CONFIG_PATH, 'weights': YOLO_WEIGHTS_PATH, 'input_size': 416,
+                       'confidence': CONFIDENCE_THRESHOLD, 'nms': NMS_THRESHOLD},
+        'yolov3-608': {'config': YOLO_CONFIG_PATH, 'weights': YOLO_WEIGHTS_PATH, 'input_size': 608,
+                       'confidence': CONFIDENCE_THRESHOLD, 'nms': NMS_THRESHOLD},
+        'yolov3-tiny-320': {'config': YOLO_TINY_CONFIG_PATH, 'weights': YOLO_TINY_WEIGHTS_PATH, 'input_size': 320,
+                            'confidence': 0.4, 'nms': NMS_THRESHOLD},
+        'yolov3-tiny-416': {'config': YOLO_TINY_CONFIG_PATH, 'weights': YOLO_TINY_WEIGHTS_PATH, 'input_size': 416,
+                            'confidence': 0.4, 'nms': NMS_THRESHOLD},
+    }
+    DETECTOR_PROFILE = os.environ.get('DETECTOR_PROFILE', 'yolov3-416')
+
+    # Model files are checksummed once by scripts/setup.py into a manifest under
+    # MODEL_CACHE_DIR, and a network is loaded once per recorded checksum (never hashed on load)
+    MODEL_CACHE_DIR = os.environ.get('MODEL_CACHE_DIR') or os.path.join('instance', 'models')
+    MODEL_CHECKSUMS = os.environ.get('MODEL_CHECKSUMS', 'true').lower() in ('1', 'true', 'yes')
+    # Winograd 3x3 convolutions: faster frames, but a slower first forward pass and much
+    # more memory per loaded network. Turn off for faster startup or many worker processes
+    MODEL_WINOGRAD = os.environ.get('MODEL_WINOGRAD', 'true').lower() in ('1', 'true', 'yes')
+
+    # Batched inference across streams: wait up to the window for a batch of frames
+    INFERENCE_BATCHING = os.environ.get('INFERENCE_BATCHING', 'true').lower() in ('1', 'true', 'yes')
+    INFERENCE_MAX_BATCH = int(os.environ.get('INFERENCE_MAX_BATCH', 4))
+    INFERENCE_BATCH_WINDOW_MS = float(os.environ.get('INFERENCE_BATCH_WINDOW_MS', 10))
+
+    # Worker processes for keyframe inference (0 = run in the web process). Frames are handed
+    # over in shared memory; larger frames are downscaled to fit the slot size
+    INFERENCE_WORKERS = int(os.environ.get('INFERENCE_WORKERS', 0))
+    INFERENCE_WORKER_QUEUE_DEPTH = int(os.environ.get('INFERENCE_WORKER_QUEUE_DEPTH', 2))
+    INFERENCE_WORKER_MAX_WIDTH = int(os.environ.get('INFERENCE_WORKER_MAX_WIDTH', 1920))
+    INFERENCE_WORKER_MAX_HEIGHT = int(os.environ.get('INFERENCE_WORKER_MAX_HEIGHT', 1080))
+    # Seconds a worker may spend on one frame (including a model load) before it is replaced
+    INFERENCE_WORKER_TIMEOUT = float(os.environ.get('INFERENCE_WORKER_TIMEOUT', 30))
+
+    # Tracking: run YOLO every KEYFRAME_INTERVAL frames and track objects in between
+    KEYFRAME_INTERVAL = int(os.environ.get('KEYFRAME_INTERVAL', 3))
+    ADAPTIVE_KEYFRAMES = os.environ.get('ADAPTIVE_KEYFRAMES', 'true').lower() in ('1', 'true', 'yes')
+
+    # MJPEG stream encoding: each viewer steps down from the best level towards the
+    # cheapest one (lower JPEG quality, smaller frames) while it cannot keep up
+    STREAM_JPEG_QUALITY = int(os.environ.get('STREAM_JPEG_QUALITY', 80))
+    STREAM_MIN_JPEG_QUALITY = int(os.environ.get('STREAM_MIN_JPEG_QUALITY', 45))
+    STREAM_MIN_SCALE = float(os.environ.get('STREAM_MIN_SCALE', 0.5))
+    STREAM_QUALITY_STEPS = int(os.environ.get('STREAM_QUALITY_STEPS', 4))
+    STREAM_ADAPTIVE_QUALITY = os.environ.get('STREAM_ADAPTIVE_QUALITY', 'true').lower() in ('1', 'true', 'yes')
+
+    # Client camera ingestion: frames POSTed by browsers/phones, per-session drop-oldest queue
+    INGEST_QUEUE_SIZE = int(os.environ.get('INGEST_QUEUE_SIZE', 2))
+    INGEST_MAX_FRAME_BYTES = int(os.environ.get('INGEST_MAX_FRAME_BYTES', 2 * 1024 * 1024))
+    INGEST_IDLE_TIMEOUT = float(os.environ.get('INGEST_IDLE_TIMEOUT', 30))
+
+    # Speech phrase cache: alert fragments rendered to WAV once and replayed, with spoken
+    # distances rounded to PHRASE_DISTANCE_STEP so a small set of clips covers every alert
+    PHRASE_CACHE_ENABLED = os.environ.get('PHRASE_CACHE_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+    PHRASE_CACHE_DIR = os.environ.get('PHRASE_CACHE_DIR') or os.path.join('instance', 'phrases')
+    PHRASE_CACHE_PREBUILD = os.environ.get('PHRASE_CACHE_PREBUILD', 'true').lower() in ('1', 'true', 'yes')
+    PHRASE_CACHE_MAX_FILES = int(os.environ.get('PHRASE_CACHE_MAX_FILES', 512))
+    PHRASE_CACHE_MAX_MEMORY = int(os.environ.get('PHRASE_CACHE_MAX_MEMORY', 128))
+    PHRASE_DISTANCE_STEP = float(os.environ.get('PHRASE_DISTANCE_STEP', 0.5))
+    PHRASE_MAX_DISTANCE = float(os.environ.get('PHRASE_MAX_DISTANCE', 10))
+
+    # Prometheus-style /metrics endpoint and hot-path timers
+    METRICS_ENABLED = os.environ.get('METRICS_ENABLED', 'true').lower() in ('1', 'true', 'yes')
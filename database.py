@@ -0,0 +1,133 @@
+"""
+Database engine settings
+Builds the SQLAlchemy engine options for DATABASE_URL and, for SQLite,
+sets WAL journaling, the synchronous level and a busy timeout on every new
+connection, so concurrent requests wait briefly for the write lock instead
+of failing, and readers never block on a writer.
+"""
+
+import threading
+
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+from sqlalchemy.pool import StaticPool
+
+from config import Config
+
+
+def is_sqlite(uri):
+    return make_url(uri).get_backend_name() == 'sqlite'
+
+
+def engine_options(uri, pool_size=None, max_overflow=None, pool_timeout=None, busy_timeout_ms=None):
+    """Return create_engine keyword arguments (SQLALCHEMY_ENGINE_OPTIONS) for uri"""
+    pool_size = Config.DB_POOL_SIZE if pool_size is None else pool_size
+    max_overflow = Config.DB_MAX_OVERFLOW if max_overflow is None else max_overflow
+    pool_timeout = Config.DB_POOL_TIMEOUT if pool_timeout is None else pool_timeout
+    if not is_sqlite(uri):
+        return {
+            'pool_size': pool_size,
+            'max_overflow': max_overflow,
+            'pool_timeout': pool_timeout,
+            'pool_recycle': Config.DB_POOL_RECYCLE,
+            'pool_pre_ping': True,
+        }
+
+    busy_timeout_ms = Config.SQLITE_BUSY_TIMEOUT_MS if busy_timeout_ms is None else busy_timeout_ms
+    # The driver's own timeout is the busy handler; PRAGMA busy_timeout below sets the same value
+    connect_args = {'timeout': busy_timeout_ms / 1000, 'check_same_thread': False}
+    database = make_url(uri).database
+    if not database or database == ':memory:':
+        # Every connection to :memory: is a separate database, so share exactly one
+        return {'connect_args': connect_args, 'poolclass': StaticPool}
+    return {
+        'connect_args': connect_args,
+        'pool_size': pool_size,
+        'max_overflow': max_overflow,
+        'pool_timeout': pool_timeout,
+    }
+
+
+def install_sqlite_pragmas(engine, journal_mode=None, synchronous=None, busy_timeout_ms=None, write_gate=None):
+    """Apply the SQLite pragmas to every connection engine opens
+
+    The driver only issues BEGIN right before the first INSERT/UPDATE/DELETE,
+    so a write transaction takes the write lock up front, where the busy
+    timeout applies, rather than upgrading an older read snapshot, which WAL
+    would refuse immediately.
+    """
+    if engine.dialect.name != 'sqlite':
+        return
+    journal_mode = Config.SQLITE_JOURNAL_MODE if journal_mode is None else journal_mode
+    synchronous = Config.SQLITE_SYNCHRONOUS if synchronous is None else synchronous
+    busy_timeout_ms = Config.SQLITE_BUSY_TIMEOUT_MS if busy_timeout_ms is None else busy_timeout_ms
+    write_gate = Config.SQLITE_WRITE_GATE if write_gate is None else write_gate
+
+    @event.listens_for(engine, 'connect')
+    def set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            cursor.execute(f'PRAGMA busy_timeout = {int(busy_timeout_ms)}')
+            if journal_mode:
+                cursor.execute(f'PRAGMA journal_mode = {journal_mode}')
+            if synchronous:
+                cursor.execute(f'PRAGMA synchronous = {synchronous}')
+        finally:
+            cursor.close()
+
+    if write_gate:
+        install_write_gate(engine, busy_timeout_ms / 1000)
+
+
+def install_write_gate(engine, timeout):
+    """Let one write transaction per process at a time contend for the SQLite write lock
+
+    SQLite's busy handler polls with growing sleeps (up to 100 ms), so with
+    many threads waiting for the lock most of them oversleep its release and
+    some run out of busy timeout altogether. Queueing a process's writers on
+    a Python lock hands the lock over as soon as it is free; only one waiter
+    per process is left polling against the other processes.
+    """
+    gate = threading.Lock()
+
+    @event.listens_for(engine, 'before_cursor_execute')
+    def enter_gate(connection, cursor, statement, parameters, context, executemany):
+        if connection.info.get('write_gate') or statement.lstrip()[:6].upper() not in ('INSERT', 'UPDATE', 'DELETE'):
+            return
+        # On timeout go ahead anyway and let SQLite's busy timeout decide
+        connection.info['write_gate'] = gate.acquire(timeout=timeout)
+
+    def leave_gate(info):
+        if info.pop('write_gate', False):
+            gate.release()
+
+    @event.listens_for(engine, 'commit')
+    def on_commit(connection):
+        leave_gate(connection.info)
+
+    @event.listens_for(engine, 'rollback')
+    def on_rollback(connection):
+        leave_gate(connection.info)
+
+    @event.listens_for(engine.pool, 'reset')
+    def on_reset(dbapi_connection, connection_record, reset_state):
+        # A connection returned to the pool mid-transaction is rolled back here, not via rollback()
+        leave_gate(connection_record.info)
+
+
+def init_app(app, db):
+    """Install the per-connection settings on the Flask-SQLAlchemy engine"""
+    with app.app_context():
+        install_sqlite_pragmas(db.engine)
+
+
+def status(engine):
+    """Pool and pragma state for the admin status pages"""
+    pool = engine.pool
+    info = {'backend': engine.dialect.name, 'pool': pool.status()}
+    if engine.dialect.name == 'sqlite':
+        with engine.connect() as connection:
+            info['journal_mode'] = connection.exec_driver_sql('PRAGMA journal_mode').scalar()
+            info['synchronous'] = connection.exec_driver_sql('PRAGMA synchronous').scalar()
+            info['busy_timeout_ms'] = connection.exec_driver_sql('PRAGMA busy_timeout').scalar()
+    return info
@@ -0,0 +1,236 @@
+"""
+Detection endpoints
+Camera streaming, client camera ingest, detection status and the detector
+profile admin as a blueprint. The detection stack - OpenCV, NumPy, the
+pipeline, the shared stream producers and the inference workers - is
+imported on the first request that needs it, so a web worker that only
+serves login, registration and admin pages never loads it. Opening /start
+warms it in the background, so it is ready by the time detection starts.
+"""
+
+import threading
+import time
+import types
+
+from flask import Blueprint, Response, flash, redirect, render_template, request, session, url_for
+
+from auth import login_required_admin, login_required_user
+from config import Config
+from model_registry import detector_profiles, registry
+from speech import speech_status
+
+detection = Blueprint('detection', __name__)
+
+# Global variables for detection
+voice_enabled = True
+
+_stack = None
+_stack_lock = threading.Lock()
+
+
+def stack():
+    """Import the detection stack on first use and return its shared objects"""
+    global _stack
+    if _stack is None:
+        with _stack_lock:
+            if _stack is None:
+                start = time.perf_counter()
+                from inference_scheduler import scheduler
+                from ingest import read_frames, sessions
+                from stream_hub import EVENTS, hub
+                from worker_pool import get_pool
+                pool = get_pool()
+                if pool is not None:
+                    # Profile switches are warmed in the workers, never in this process
+                    detector_profiles.warmer = pool.warm
+                _stack = types.SimpleNamespace(scheduler=scheduler, ingest_sessions=sessions, read_frames=read_frames,
+                                               hub=hub, EVENTS=EVENTS, get_pool=get_pool,
+                                               load_seconds=time.perf_counter() - start)
+                print(f"Detection stack loaded in {_stack.load_seconds:.2f}s")
+    return _stack
+
+
+def loaded():
+    return _stack is not None
+
+
+def warm_up():
+    """Import the stack and load the active model in the background (in the workers, with a pool)"""
+    def run():
+        try:
+            pool = stack().get_pool()
+            if not detector_profiles.files_present():
+                return
+            if pool is not None:
+                pool.start().warm(detector_profiles.active_name)
+            else:
+                detector_profiles.active()
+        except Exception as e:
+            print(f"Error warming up detection: {e}")
+    threading.Thread(target=run, name='detection-warm-up', daemon=True).start()
+
+
+def detection_source():
+    # The server camera, or the frames this user's browser or phone is pushing to /ingest
+    if session.get('detection_source') == 'client':
+        return stack().ingest_sessions.open(session.get('user_id'), voice_enabled=lambda: voice_enabled).source
+    return Config.CAMERA_INDEX
+
+
+def generate_frames(subscriber):
+    # One shared producer per camera runs detection; each viewer only streams its output
+    for chunk in subscriber.frames():
+        yield chunk
+
+
+@detection.route('/video_feed')
+def video_feed():
+    if not session.get('detection_active'):
+        return Response(status=204)
+    try:
+        subscriber = stack().hub.subscribe(detection_source(), owner=session.get('user_id'),
+                                           voice_enabled=lambda: voice_enabled)
+    except RuntimeError as e:
+        print(f"Error starting detection: {e}")
+        return Response(status=503)
+    return Response(generate_frames(subscriber),
+                    mimetype='multipart/x-mixed-replace; boundary=frame')
+
+
+def generate_events(subscriber):
+    # Server-sent events: one JSON line per frame with detections, comments keep idle connections alive
+    for event in subscriber.frames(keepalive=': keepalive\n\n'):
+        if event.startswith(':'):
+            yield event
+        else:
+            yield f'data: {event}\n\n'
+
+
+@detection.route('/detections')
+def detections():
+    if not session.get('detection_active'):
+        return Response(status=204)
+    try:
+        subscriber = stack().hub.subscribe(detection_source(), owner=session.get('user_id'), kind=stack().EVENTS,
+                                           voice_enabled=lambda: voice_enabled)
+    except RuntimeError as e:
+        print(f"Error starting detection: {e}")
+        return Response(status=503)
+    return Response(generate_events(subscriber), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+
+@detection.route('/ingest', methods=['POST'])
+@login_required_user
+def ingest():
+    # Frames from the user's own camera: a single image/jpeg per request, or a chunked
+    # application/octet-stream of 4-byte big-endian length-prefixed JPEG frames
+    user_id = session.get('user_id')
+    try:
+        ingest_session = stack().ingest_sessions.open(user_id, voice_enabled=lambda: voice_enabled)
+    except RuntimeError as e:
+        print(f"Error starting detection: {e}")
+        return {'error': str(e)}, 503
+    session['detection_source'] = 'client'
+    session['detection_active'] = True
+
+    if request.mimetype == 'image/jpeg':
+        data = request.get_data()
+        if len(data) > Config.INGEST_MAX_FRAME_BYTES:
+            return {'error': 'Frame too large'}, 413
+        ingest_session.source.push(data)
+        return ingest_session.latest()
+
+    frames = 0
+    try:
+        for data in stack().read_frames(request.stream):
+            if not ingest_session.source.push(data):
+                break  # Detection was stopped while the client was still sending
+            frames += 1
+    except ValueError as e:
+        return {'error': str(e), 'frames': frames}, 400
+    result = ingest_session.latest()
+    result['frames'] = frames
+    return result
+
+
+@detection.route('/model_status')
+@login_required_admin
+def model_status():
+    return registry.report()
+
+
+@detection.route('/admin/detector_profile', methods=['GET', 'POST'])
+@login_required_admin
+def detector_profile():
+    if request.method == 'POST':
+        name = request.form.get('profile') or (request.get_json(silent=True) or {}).get('profile')
+        try:
+            detector_profiles.switch(name)
+        except ValueError as e:
+            if request.is_json:
+                return {'error': str(e)}, 400
+            flash(str(e), 'danger')
+            return redirect(url_for('admin_home'))
+        if not request.is_json:
+            flash(f'Switching detector profile to {name}. The current model keeps running until it is ready.', 'info')
+            return redirect(url_for('admin_home'))
+    return detector_profiles.status()
+
+
+@detection.route('/detection_status')
+@login_required_user
+def detection_status():
+    if not loaded():
+        # Nothing has run in this worker; do not load the stack just to report that
+        return {'loaded': False, 'speech': speech_status()}
+    status = stack().hub.status()
+    status['loaded'] = True
+    status['inference'] = stack().scheduler.stats()
+    status['ingest'] = stack().ingest_sessions.status()
+    status['speech'] = speech_status()
+    pool = stack().get_pool()
+    if pool is not None:
+        status['workers'] = pool.stats()
+    return status
+
+
+@detection.route('/toggle_voice')
+@login_required_user
+def toggle_voice():
+    global voice_enabled
+    voice_enabled = not voice_enabled
+    return {'voice_enabled': voice_enabled}
+
+
+@detection.route('/stop_detection')
+@login_required_user
+def stop_detection():
+    session['detection_active'] = False
+    if loaded():
+        # Only this user's streams are closed; the camera stays open for other viewers
+        stack().hub.close_owner(session.get('user_id'))
+        stack().ingest_sessions.close(session.get('user_id'))
+    flash('Detection stopped successfully.', 'info')
+    return redirect(url_for('home'))
+
+
+@detection.route("/start", methods=['GET', 'POST'])
+@login_required_user
+def start():
+    if request.method == 'POST':
+        if request.form.get('Start') == 'Start':
+            # Validate file existence for the active detector profile
+            if not detector_profiles.files_present():
+                flash(f'Required YOLO files for the {detector_profiles.active_name} profile not found. Please ensure the model files and coco.names are present.', 'danger')
+                return render_template("start.html")
+
+            # Start detection on the server camera or on frames from this device
+            client_camera = request.form.get('camera_source') == 'client'
+            session['detection_source'] = 'client' if client_camera else 'server'
+            session['detection_active'] = True
+            return render_template("detection.html", client_camera=client_camera)
+    else:
+        if not loaded():
+            warm_up()
+        return render_template("start.html")
@@ -0,0 +1,74 @@
+"""
+Reusable per-stream buffers for the steady-state frame loop
+The blob, its resize scratch, the network outputs and the decode work
+arrays are allocated once per stream and refilled every keyframe, so the
+loop does not churn hundreds of kilobytes through the allocator per frame.
+Each FrameBuffers must only be used from one thread at a time.
+"""
+
+import cv2
+import numpy as np
+
+BLOB_SCALE = np.float32(0.00392)
+
+
+class BlobBuffer:
+    """Reused NCHW float32 blob equivalent to blobFromImage(frame, 0.00392, size, swapRB=True)"""
+
+    def __init__(self):
+        self._resized = None
+        self._blob = None
+
+    def fill(self, frames, size):
+        """Resize and pack frames into the reused blob and return it"""
+        shape = (len(frames), 3, size, size)
+        if self._blob is None or self._blob.shape != shape:
+            self._resized = np.empty((size, size, 3), dtype=np.uint8)
+            self._blob = np.empty(shape, dtype=np.float32)
+        for index, frame in enumerate(frames):
+            cv2.resize(frame, (size, size), dst=self._resized, interpolation=cv2.INTER_LINEAR)
+            # BGR -> RGB and HWC -> CHW are views; the multiply writes straight into the blob
+            np.multiply(self._resized[:, :, ::-1].transpose(2, 0, 1), BLOB_SCALE,
+                        out=self._blob[index], casting='unsafe')
+        return self._blob
+
+
+class DecodeScratch:
+    """Full-size work arrays for decode_outputs, sized to the network's output rows"""
+
+    def __init__(self):
+        self._rows = None
+        self._mask = None
+
+    def rows(self, rows, columns):
+        """Buffer for the concatenated output layers"""
+        if self._rows is None or self._rows.shape != (rows, columns):
+            self._rows = np.empty((rows, columns), dtype=np.float32)
+        return self._rows
+
+    def mask(self, rows):
+        """Buffer for the per-row candidate mask"""
+        if self._mask is None or self._mask.shape != (rows,):
+            self._mask = np.empty(rows, dtype=bool)
+        return self._mask
+
+
+class FrameBuffers:
+    """Blob, output and decode buffers for one stream's inference stage"""
+
+    def __init__(self):
+        self.blob = BlobBuffer()
+        self.decode = DecodeScratch()
+        self._model = None
+        self._outs = None
+
+    def forward(self, model, frame):
+        """Run model on frame, writing into this stream's output buffers"""
+        blob = self.blob.fill([frame], model.input_size)
+        if model is not self._model:
+            # New profile: let the first pass allocate outputs of the right shape, then keep them
+            self._model = model
+            self._outs = None
+        outs = model.forward(blob, self._outs)
+        self._outs = list(outs)
+        return outs
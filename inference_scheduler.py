@@ -0,0 +1,154 @@
+"""
+Batched multi-stream inference
+Frames from all active streams are collected for a short window (or until a
+full batch) and run through one batched blob + forward call.
+"""
+
+import collections
+import threading
+import time
+
+import numpy as np
+
+import metrics
+from config import Config
+from frame_buffers import BlobBuffer
+
+
+class InferenceRequest:
+    """One frame waiting for its share of a batched forward pass"""
+
+    def __init__(self, model, frame, stream_id):
+        self.model = model
+        self.frame = frame
+        self.stream_id = stream_id
+        self.submitted = time.perf_counter()
+        self.outs = None
+        self.error = None
+        self.done = threading.Event()
+
+
+def split_outputs(outs, batch_size):
+    """Split batched output layers into one list of layers per image"""
+    per_image = [[] for _ in range(batch_size)]
+    for out in outs:
+        # Region layers return (rows, cols) for a single image and (batch, rows, cols) for several
+        if out.ndim == 2:
+            out = out.reshape(batch_size, -1, out.shape[-1])
+        for index in range(batch_size):
+            per_image[index].append(out[index])
+    return per_image
+
+
+class InferenceScheduler:
+    """Collects pending frames from every stream and runs them as one batch"""
+
+    def __init__(self, max_batch=4, window_ms=10):
+        self.max_batch = max(1, max_batch)
+        self.window = window_ms / 1000.0
+        self._pending = collections.deque()
+        self._cond = threading.Condition()
+        self._streams = 0
+        self._thread = None
+        self.batches = 0
+        self.frames = 0
+        self.batch_sizes = collections.Counter()
+        self._latencies = {}
+        # Only the scheduler thread fills blobs, so one reused buffer is enough. Outputs are not
+        # reused: requesting threads are still decoding them while the next batch runs.
+        self._blob = BlobBuffer()
+
+    def register_stream(self):
+        with self._cond:
+            self._streams += 1
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='inference-scheduler', daemon=True)
+                self._thread.start()
+
+    def unregister_stream(self, stream_id=None):
+        with self._cond:
+            self._streams = max(0, self._streams - 1)
+            self._latencies.pop(stream_id, None)
+            self._cond.notify_all()
+
+    def infer(self, model, frame, stream_id=None):
+        """Queue frame for the next batch and wait for its raw output layers"""
+        request = InferenceRequest(model, frame, stream_id)
+        with self._cond:
+            self._pending.append(request)
+            self._cond.notify_all()
+        request.done.wait()
+        if request.error is not None:
+            raise request.error
+        latency = (time.perf_counter() - request.submitted) * 1000
+        self._latencies.setdefault(stream_id, collections.deque(maxlen=100)).append(latency)
+        return request.outs
+
+    def _collect(self):
+        """Wait for a batch of requests for the same model"""
+        with self._cond:
+            while not self._pending:
+                self._cond.wait()
+            deadline = time.perf_counter() + self.window
+            # With one stream there is nobody to wait for, so never pay the window
+            target = min(self.max_batch, max(self._streams, 1))
+            while len(self._pending) < target:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+
+            model = self._pending[0].model
+            batch = []
+            kept = collections.deque()
+            while self._pending and len(batch) < self.max_batch:
+                request = self._pending.popleft()
+                (batch if request.model is model else kept).append(request)
+            # Requests for another model (e.g. mid profile switch) go in the next batch
+            kept.extend(self._pending)
+            self._pending = kept
+            return model, batch
+
+    def _run(self):
+        while True:
+            model, batch = self._collect()
+            try:
+                blob = self._blob.fill([request.frame for request in batch], model.input_size)
+                with metrics.INFERENCE_SECONDS.time():
+                    outs = model.forward(blob)
+                if len(batch) == 1:
+                    per_image = [list(outs)]
+                else:
+                    per_image = split_outputs(outs, len(batch))
+                for request, image_outs in zip(batch, per_image):
+                    request.outs = image_outs
+            except Exception as e:
+                for request in batch:
+                    request.error = e
+            self.batches += 1
+            self.frames += len(batch)
+            self.batch_sizes[len(batch)] += 1
+            for request in batch:
+                request.done.set()
+
+    def stats(self):
+        latency = {}
+        for stream_id, samples in list(self._latencies.items()):
+            values = np.array(samples)
+            latency[str(stream_id)] = {
+                'mean_ms': round(float(values.mean()), 1),
+                'p95_ms': round(float(np.percentile(values, 95)), 1),
+            }
+        return {
+            'streams': self._streams,
+            'max_batch': self.max_batch,
+            'window_ms': self.window * 1000,
+            'batches': self.batches,
+            'frames': self.frames,
+            'mean_batch_size': round(self.frames / self.batches, 2) if self.batches else 0.0,
+            'batch_sizes': {str(size): count for size, count in sorted(self.batch_sizes.items())},
+            'stream_latency': latency,
+        }
+
+
+scheduler = InferenceScheduler(Config.INFERENCE_MAX_BATCH, Config.INFERENCE_BATCH_WINDOW_MS)
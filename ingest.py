@@ -0,0 +1,249 @@
+"""
+Client camera ingestion
+Browsers and phones POST JPEG frames; each session gets its own small
+drop-oldest queue that its detection pipeline reads like a camera, and its
+alerts are handed back to that session instead of the server speaker.
+"""
+
+import collections
+import json
+import struct
+import threading
+import time
+
+import cv2
+import numpy as np
+
+from config import Config
+from speech import PRIORITY_INFO, SpeechAlert
+from stream_hub import hub, POLL
+
+
+class IngestSource:
+    """Frames pushed by one client, read by the pipeline's capture stage like a cv2.VideoCapture"""
+
+    def __init__(self, key, max_pending=None):
+        self.key = key
+        self._frames = collections.deque(maxlen=max_pending or Config.INGEST_QUEUE_SIZE)
+        self._cond = threading.Condition()
+        self._closed = False
+        self.received = 0
+        self.dropped = 0
+        self.decode_errors = 0
+        self.last_push = time.monotonic()
+
+    def __str__(self):
+        return f'client:{self.key}'
+
+    def push(self, data):
+        """Queue one encoded frame; the oldest waiting frame is dropped when the queue is full"""
+        with self._cond:
+            if self._closed:
+                return False
+            if len(self._frames) == self._frames.maxlen:
+                self.dropped += 1
+            self._frames.append(data)
+            self.received += 1
+            self.last_push = time.monotonic()
+            self._cond.notify()
+        return True
+
+    def read(self, timeout=1.0):
+        """Return (success, frame); frame is None when nothing arrived within timeout
+
+        Returning instead of blocking lets the capture stage notice when its
+        pipeline is stopped; success is only False once the source is closed.
+        """
+        with self._cond:
+            if not self._frames and not self._closed:
+                self._cond.wait(timeout)
+            if not self._frames:
+                return not self._closed, None
+            data = self._frames.popleft()
+        # Decode on the capture thread, not the request thread
+        frame = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_COLOR)
+        if frame is None:
+            self.decode_errors += 1
+        return True, frame
+
+    def isOpened(self):
+        return not self._closed
+
+    def release(self):
+        with self._cond:
+            self._closed = True
+            self._frames.clear()
+            self._cond.notify_all()
+
+    def idle_seconds(self):
+        return time.monotonic() - self.last_push
+
+    def stats(self):
+        return {
+            'received': self.received,
+            'dropped': self.dropped,
+            'decode_errors': self.decode_errors,
+            'pending': len(self._frames),
+        }
+
+
+class ClientAlerts:
+    """Stands in for the speech worker: collects alert sentences for the client to speak"""
+
+    def __init__(self, max_pending=4, max_age=3.0):
+        self.max_age = max_age
+        self._pending = collections.deque(maxlen=max_pending)
+        self._lock = threading.Lock()
+
+    def say(self, text, priority=PRIORITY_INFO, key=None, max_age=None, fragments=None, private=False):
+        alert = SpeechAlert(text, priority, key, self.max_age if max_age is None else max_age, fragments, private)
+        with self._lock:
+            if key is not None:
+                # Same object: only the newest sentence is worth saying
+                for entry in list(self._pending):
+                    if entry.key == key:
+                        self._pending.remove(entry)
+            self._pending.append(alert)
+        return True
+
+    def drain(self):
+        """Take all alerts that are still fresh, most urgent first"""
+        now = time.monotonic()
+        with self._lock:
+            pending = list(self._pending)
+            self._pending.clear()
+        fresh = [alert for alert in pending if not alert.is_stale(now)]
+        fresh.sort(key=lambda alert: (alert.priority, -alert.created))
+        return [{'text': alert.text, 'warning': alert.priority == 0} for alert in fresh]
+
+
+class IngestSession:
+    """One client's frame source, its detection pipeline and the latest result"""
+
+    def __init__(self, key, source, subscriber, alerts):
+        self.key = key
+        self.source = source
+        self.subscriber = subscriber
+        self.alerts = alerts
+        self.last_event = None
+
+    @property
+    def active(self):
+        return self.source.isOpened() and self.subscriber.active and self.subscriber.producer.running
+
+    def latest(self):
+        """Most recent detections plus any alerts waiting to be spoken"""
+        event = self.subscriber.poll()
+        if event is not None:
+            # Events are JSON text for SSE; decoded so the response nests an object, not a string
+            self.last_event = json.loads(event)
+        return {'event': self.last_event, 'alerts': self.alerts.drain(), 'source': self.source.stats()}
+
+    def close(self):
+        self.subscriber.close()
+        self.source.release()
+
+
+class IngestRegistry:
+    """Maps each client session to its IngestSession, reaping clients that went quiet
+
+    A background thread reaps idle sessions while any are open, so a client
+    that vanishes has its pipeline stopped even if no other client connects.
+    """
+
+    def __init__(self, stream_hub, idle_timeout=None):
+        self.hub = stream_hub
+        self.idle_timeout = Config.INGEST_IDLE_TIMEOUT if idle_timeout is None else idle_timeout
+        self._sessions = {}
+        self._lock = threading.Lock()
+        self._reaper = None
+
+    def open(self, key, **pipeline_kwargs):
+        """Return the session for key, starting its pipeline on first use"""
+        self.reap()
+        with self._lock:
+            session = self._sessions.get(key)
+            if session is not None and session.active:
+                return session
+            source = IngestSource(key)
+            alerts = ClientAlerts()
+            # The session holds a subscription of its own so the pipeline runs even with no viewer
+            subscriber = self.hub.subscribe(source, owner=key, kind=POLL, speech=alerts, **pipeline_kwargs)
+            session = IngestSession(key, source, subscriber, alerts)
+            self._sessions[key] = session
+            if self._reaper is None:
+                self._reaper = threading.Thread(target=self._reap_loop, daemon=True)
+                self._reaper.start()
+            return session
+
+    def get(self, key):
+        session = self._sessions.get(key)
+        return session if session is not None and session.active else None
+
+    def close(self, key):
+        with self._lock:
+            session = self._sessions.pop(key, None)
+        if session is not None:
+            session.close()
+
+    def reap(self):
+        """Close sessions whose client stopped sending frames"""
+        with self._lock:
+            stale = [key for key, session in self._sessions.items()
+                     if not session.active or session.source.idle_seconds() > self.idle_timeout]
+            sessions = [self._sessions.pop(key) for key in stale]
+        for session in sessions:
+            session.close()
+
+    def _reap_loop(self):
+        """Reap every half idle timeout until no sessions are left"""
+        interval = max(1.0, self.idle_timeout / 2)
+        while True:
+            time.sleep(interval)
+            try:
+                self.reap()
+            except Exception as e:
+                print(f"Error reaping client camera sessions: {e}")
+            with self._lock:
+                if not self._sessions:
+                    self._reaper = None
+                    return
+
+    def status(self):
+        with self._lock:
+            sessions = list(self._sessions.values())
+        return [{'source': str(session.source), 'idle_seconds': round(session.source.idle_seconds(), 1),
+                 **session.source.stats()} for session in sessions]
+
+
+def read_frames(stream, max_frame_bytes=None):
+    """Yield JPEG payloads from a stream of 4-byte big-endian length-prefixed frames"""
+    max_frame_bytes = max_frame_bytes or Config.INGEST_MAX_FRAME_BYTES
+    while True:
+        header = _read_exact(stream, 4)
+        if not header:
+            return
+        if len(header) < 4:
+            raise ValueError("Truncated frame header")
+        (length,) = struct.unpack('>I', header)
+        if length > max_frame_bytes:
+            raise ValueError(f"Frame of {length} bytes exceeds the {max_frame_bytes} byte limit")
+        data = _read_exact(stream, length)
+        if len(data) < length:
+            raise ValueError("Truncated frame")
+        yield data
+
+
+def _read_exact(stream, size):
+    parts = []
+    remaining = size
+    while remaining:
+        part = stream.read(remaining)
+        if not part:
+            break
+        parts.append(part)
+        remaining -= len(part)
+    return b''.join(parts)
+
+
+sessions = IngestRegistry(hub)
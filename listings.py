@@ -0,0 +1,117 @@
+"""
+Keyset pagination for the admin listings
+A page is fetched with WHERE (sort, id) > (last sort, last id) ORDER BY
+sort, id LIMIT n, so every page costs one index range scan no matter how
+deep it is, unlike OFFSET. The position travels in the query string as an
+opaque cursor.
+"""
+
+import base64
+import json
+import string
+
+from sqlalchemy import func, or_, select, union
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+# SQLite's lower() only folds ASCII letters, so search text is folded the same way
+ASCII_LOWER = str.maketrans(string.ascii_uppercase, string.ascii_lowercase)
+
+
+def encode_cursor(value, row_id, backward=False):
+    raw = json.dumps([value, row_id, backward], separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Return (value, id, backward) for a cursor, or None if it is missing or malformed"""
+    if not cursor:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        value, row_id, backward = json.loads(raw)
+        return value, int(row_id), bool(backward)
+    except (ValueError, TypeError):
+        return None
+
+
+def page_size(value, default=DEFAULT_PAGE_SIZE):
+    try:
+        return max(1, min(int(value), MAX_PAGE_SIZE))
+    except (TypeError, ValueError):
+        return default
+
+
+def prefix_filter(id_column, columns, text):
+    """Match rows where any of columns starts with text, ignoring case, as one index range scan per column
+
+    Each column needs an index on lower(column) for its range to be a scan.
+    """
+    # LIKE 'x%' cannot use an index at all; a range over lower(column) can use an expression index. The
+    # ranges are unioned by id because with a bound LIMIT SQLite plans a plain OR as a full scan
+    text = text.translate(ASCII_LOWER)
+    ranges = [select(id_column).where(func.lower(column) >= text, func.lower(column) < text + '\uffff')
+              for column in columns]
+    return id_column.in_(union(*ranges))
+
+
+class Page:
+    """One page of rows plus the cursors of its neighbours"""
+
+    def __init__(self, items, sort, order, limit, next_cursor=None, prev_cursor=None):
+        self.items = items
+        self.sort = sort
+        self.order = order
+        self.limit = limit
+        self.next_cursor = next_cursor
+        self.prev_cursor = prev_cursor
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __len__(self):
+        return len(self.items)
+
+
+def paginate(query, sort_columns, id_column, sort=None, order='asc', cursor=None, limit=DEFAULT_PAGE_SIZE):
+    """Return one Page of query ordered by sort_columns[sort] then id
+
+    sort_columns maps the names allowed in the query string to columns; an
+    unknown sort name falls back to the id. Sort columns must be NOT NULL.
+    """
+    if sort not in sort_columns:
+        sort = 'id'
+    column = sort_columns.get(sort, id_column)
+    order = 'desc' if order == 'desc' else 'asc'
+    position = decode_cursor(cursor)
+    backward = position is not None and position[2]
+    # Walking backwards is the same scan in the opposite direction, reversed afterwards
+    ascending = (order == 'asc') != backward
+    by_id = column is id_column
+
+    if position is not None:
+        value, row_id = position[0], position[1]
+        if by_id:
+            query = query.filter(id_column > row_id if ascending else id_column < row_id)
+        # The redundant outer bound is what lets SQLite seek the sort index instead of scanning it
+        elif ascending:
+            query = query.filter(column >= value, or_(column > value, id_column > row_id))
+        else:
+            query = query.filter(column <= value, or_(column < value, id_column < row_id))
+
+    ordering = [id_column] if by_id else [column, id_column]
+    ordering = [item.asc() if ascending else item.desc() for item in ordering]
+    rows = query.order_by(*ordering).limit(limit + 1).all()
+    more = len(rows) > limit
+    rows = rows[:limit]
+    if backward:
+        rows.reverse()
+
+    def key(row):
+        return getattr(row, column.key), getattr(row, id_column.key)
+
+    has_next = backward or more
+    has_prev = more if backward else position is not None
+    next_cursor = encode_cursor(*key(rows[-1])) if rows and has_next else None
+    prev_cursor = encode_cursor(*key(rows[0]), backward=True) if rows and has_prev else None
+    return Page(rows, sort, order, limit, next_cursor, prev_cursor)
@@ -0,0 +1,149 @@
+"""
+Emergency medical summaries
+A user's latest medical record boiled down to what a responder needs -
+blood group, allergies, medications, conditions and the emergency contact -
+both as fields and as short sentences that can be read aloud. Summaries
+live in an in-process LRU cache that the medical record write paths
+refresh, so a lookup in an emergency is a dictionary hit, not a query.
+"""
+
+import collections
+import threading
+import time
+
+from sqlalchemy import select
+
+import metrics
+from config import Config
+
+FIELDS = ('uname', 'bloodgroup', 'allergies', 'medications', 'chronic_conditions', 'visionstatus',
+          'blood_pressure', 'age', 'emergency_contact')
+BLOOD_GROUP_WORDS = {'+': 'positive', '-': 'negative'}
+
+
+def spoken_blood_group(bloodgroup):
+    """'AB-' -> 'A B negative', so the speech engine spells the group out"""
+    group, sign = bloodgroup[:-1], bloodgroup[-1:]
+    if sign not in BLOOD_GROUP_WORDS or not group:
+        return bloodgroup
+    return f"{' '.join(group)} {BLOOD_GROUP_WORDS[sign]}"
+
+
+def spoken_number(number):
+    """Digits separated by spaces, so a phone number is read digit by digit"""
+    words = ['plus' if character == '+' else character for character in number
+             if character.isdigit() or character == '+']
+    return ' '.join(words)
+
+
+def summary_fragments(values):
+    """The sentences of a spoken summary; each is a separate phrase cache clip"""
+    fragments = []
+    if values.get('uname'):
+        fragments.append(f"Medical summary for {values['uname']}.")
+    if values.get('bloodgroup'):
+        fragments.append(f"Blood group {spoken_blood_group(values['bloodgroup'])}.")
+    for field, label in (('allergies', 'Allergies'), ('medications', 'Medications'),
+                         ('chronic_conditions', 'Conditions'), ('visionstatus', 'Vision')):
+        if values.get(field):
+            fragments.append(f"{label}: {values[field]}.")
+    if values.get('emergency_contact'):
+        fragments.append(f"Emergency contact {spoken_number(values['emergency_contact'])}.")
+    return fragments
+
+
+def build_summary(record):
+    """Summary dict of a Medical row, or None when the user has no record"""
+    if record is None:
+        return None
+    values = {field: (getattr(record, field) or '').strip() for field in FIELDS}
+    fragments = summary_fragments(values)
+    return dict(values, user_id=record.user_id, record_id=record.id, fragments=fragments, text=' '.join(fragments))
+
+
+def load_summary(session, Medical, user_id):
+    """Summary of the user's most recent medical record: one lookup on the user_id index"""
+    record = session.scalars(
+        select(Medical).where(Medical.user_id == user_id).order_by(Medical.id.desc()).limit(1)
+    ).first()
+    return build_summary(record)
+
+
+class SummaryCache:
+    """Least-recently-used summaries by user id, with hit/miss counts and an optional TTL
+
+    A user without a record is cached too (as None), so repeated lookups for
+    them do not reach the database either.
+    """
+
+    def __init__(self, max_entries=None, ttl=None):
+        self.max_entries = Config.MEDICAL_SUMMARY_CACHE_SIZE if max_entries is None else max_entries
+        self.ttl = Config.MEDICAL_SUMMARY_TTL if ttl is None else ttl
+        self._entries = collections.OrderedDict()
+        self._lock = threading.Lock()
+        # Bumped on every write so a load that raced with one is not cached
+        self._generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.refreshes = 0
+        self.invalidations = 0
+
+    def get(self, user_id, load):
+        """Return the cached summary for user_id, calling load(user_id) on a miss"""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is not None and (not self.ttl or now - entry[0] < self.ttl):
+                self._entries.move_to_end(user_id)
+                self.hits += 1
+                metrics.MEDICAL_SUMMARY_LOOKUPS.labels('hit').inc()
+                return entry[1]
+            self.misses += 1
+            generation = self._generation
+        metrics.MEDICAL_SUMMARY_LOOKUPS.labels('miss').inc()
+        summary = load(user_id)
+        with self._lock:
+            if generation == self._generation:
+                self._store(user_id, summary, now)
+        return summary
+
+    def put(self, user_id, summary):
+        """Write-through after a change to the user's medical records"""
+        with self._lock:
+            self._generation += 1
+            self.refreshes += 1
+            self._store(user_id, summary, time.monotonic())
+
+    def invalidate(self, user_id):
+        with self._lock:
+            self._generation += 1
+            self.invalidations += 1
+            self._entries.pop(user_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._generation += 1
+            self._entries.clear()
+
+    def _store(self, user_id, summary, now):
+        self._entries[user_id] = (now, summary)
+        self._entries.move_to_end(user_id)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'ttl_seconds': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else None,
+                'refreshes': self.refreshes,
+                'invalidations': self.invalidations,
+            }
+
+
+cache = SummaryCache()
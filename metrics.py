@@ -0,0 +1,219 @@
+"""
+Minimal Prometheus-style metrics for the detection hot path
+Counters, gauges and histograms rendered in the Prometheus text format at
+/metrics. When METRICS_ENABLED is off every update is a single flag check.
+"""
+
+import bisect
+import threading
+import time
+
+from config import Config
+
+enabled = Config.METRICS_ENABLED
+
+# Seconds; spans a fast decode step up to a slow CPU forward pass
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+
+def _format_labels(labelnames, values):
+    if not labelnames:
+        return ''
+    pairs = ','.join(f'{name}="{value}"' for name, value in zip(labelnames, values))
+    return '{' + pairs + '}'
+
+
+class _Metric:
+    kind = 'untyped'
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._children = {}
+        REGISTRY.append(self)
+
+    def labels(self, *values):
+        child = self._children.get(values)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(values, self._new_child())
+        return child
+
+    def _samples(self):
+        if not self.labelnames:
+            return self._render_child(self.labels(), ())
+        lines = []
+        for values, child in sorted(self._children.items()):
+            lines.extend(self._render_child(child, values))
+        return lines
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.kind}']
+        lines.extend(self._samples())
+        return lines
+
+
+class _Value:
+    def __init__(self):
+        self.value = 0.0
+        self.function = None
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1):
+        if enabled:
+            with self._lock:
+                self.value += amount
+
+    def dec(self, amount=1):
+        self.inc(-amount)
+
+    def set(self, value):
+        if enabled:
+            self.value = value
+
+    def set_function(self, function):
+        """Read the value from function at scrape time instead of tracking it"""
+        self.function = function
+
+    def get(self):
+        if self.function is not None:
+            try:
+                return float(self.function())
+            except Exception:
+                return float('nan')
+        return self.value
+
+
+class Counter(_Metric):
+    kind = 'counter'
+
+    def _new_child(self):
+        return _Value()
+
+    def inc(self, amount=1):
+        self.labels().inc(amount)
+
+    def _render_child(self, child, values):
+        return [f'{self.name}{_format_labels(self.labelnames, values)} {child.get()}']
+
+
+class Gauge(Counter):
+    kind = 'gauge'
+
+    def set(self, value):
+        self.labels().set(value)
+
+    def dec(self, amount=1):
+        self.labels().dec(amount)
+
+    def set_function(self, function):
+        self.labels().set_function(function)
+
+
+class _HistogramValue:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, seconds):
+        if not enabled:
+            return
+        index = bisect.bisect_left(self.buckets, seconds)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += seconds
+
+    def time(self):
+        return _Timer(self)
+
+
+class _Timer:
+    """Context manager that observes the elapsed time of its block"""
+
+    __slots__ = ('histogram', 'start')
+
+    def __init__(self, histogram):
+        self.histogram = histogram
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.start)
+
+
+class Histogram(_Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        super().__init__(name, documentation, labelnames)
+
+    def _new_child(self):
+        return _HistogramValue(self.buckets)
+
+    def observe(self, seconds):
+        self.labels().observe(seconds)
+
+    def time(self):
+        return self.labels().time()
+
+    def _render_child(self, child, values):
+        with child._lock:
+            counts = list(child.counts)
+            total = child.sum
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets + (float('inf'),), counts):
+            cumulative += count
+            le = '+Inf' if bound == float('inf') else repr(bound)
+            labels = _format_labels(self.labelnames + ('le',), values + (le,))
+            lines.append(f'{self.name}_bucket{labels} {cumulative}')
+        labels = _format_labels(self.labelnames, values)
+        lines.append(f'{self.name}_sum{labels} {total}')
+        lines.append(f'{self.name}_count{labels} {cumulative}')
+        return lines
+
+
+REGISTRY = []
+
+
+def render():
+    """Return every registered metric in the Prometheus text exposition format"""
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return '\n'.join(lines) + '\n'
+
+
+# Detection hot path
+INFERENCE_SECONDS = Histogram('voas_inference_seconds', 'Time spent in the network forward pass')
+DECODE_SECONDS = Histogram('voas_decode_seconds', 'Time spent decoding YOLO outputs and running NMS')
+ENCODE_SECONDS = Histogram('voas_encode_seconds', 'Time spent encoding annotated frames to JPEG')
+FRAME_LATENCY_SECONDS = Histogram('voas_frame_latency_seconds',
+                                  'Time from camera capture to an encoded frame being ready')
+FRAMES_DROPPED = Counter('voas_frames_dropped_total', 'Frames overwritten before a stage read them',
+                         labelnames=('stage',))
+
+# Streams and devices
+ACTIVE_STREAMS = Gauge('voas_active_streams', 'Open /video_feed and /detections responses')
+OPEN_CAMERAS = Gauge('voas_open_cameras', 'Cameras currently held open by a detection producer')
+
+# Speech
+SPEECH_QUEUE_DEPTH = Gauge('voas_speech_queue_depth', 'Alerts waiting to be spoken')
+ALERTS_SPOKEN = Counter('voas_alerts_spoken_total', 'Speech alerts spoken')
+ALERT_START_SECONDS = Histogram('voas_alert_start_seconds', 'Time from queueing an alert to the start of its audio',
+                                labelnames=('source',))
+SCENE_CHANGES = Counter('voas_scene_changes_total', 'Objects appearing, coming too close or leaving',
+                        labelnames=('change',))
+ALERTS_SUPPRESSED = Counter('voas_alerts_suppressed_total', 'Speech alerts dropped before being spoken',
+                            labelnames=('reason',))
+
+# Medical summaries
+MEDICAL_SUMMARY_LOOKUPS = Counter('voas_medical_summary_lookups_total', 'Emergency medical summary cache lookups',
+                                  labelnames=('result',))
@@ -0,0 +1,109 @@
+"""
+Model file checksums
+SHA-256 checksums of the network files, recorded in a manifest by
+scripts/setup.py so each file version is hashed once rather than on every
+start. The registry keys loaded networks by a recorded checksum, so the same
+network under another path or copy is not loaded twice; it never hashes the
+weights itself, so files without a recorded checksum are keyed by path.
+
+OpenCV parses Darknet weights into its own buffers and repacks them on the
+first forward pass, so a loaded network cannot be serialized to disk or
+memory-mapped and shared between processes.
+"""
+
+import hashlib
+import json
+import os
+import threading
+
+from config import Config
+
+CHUNK_BYTES = 1024 * 1024
+
+_lock = threading.Lock()
+
+
+def manifest_path(cache_dir=None):
+    return os.path.join(cache_dir or Config.MODEL_CACHE_DIR, 'manifest.json')
+
+
+def load_manifest(cache_dir=None):
+    try:
+        with open(manifest_path(cache_dir), 'r') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_manifest(manifest, cache_dir=None):
+    path = manifest_path(cache_dir)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    # Written aside and renamed so another process never reads half a manifest
+    temporary = f'{path}.{os.getpid()}.tmp'
+    with open(temporary, 'w') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(temporary, path)
+
+
+def sha256_file(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(CHUNK_BYTES), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _signature(path):
+    stat = os.stat(path)
+    return [stat.st_size, stat.st_mtime_ns]
+
+
+def recorded_checksum(path, cache_dir=None):
+    """SHA-256 of path from the manifest, or None if it was not recorded for this size and mtime"""
+    try:
+        signature = _signature(path)
+    except OSError:
+        return None
+    entry = load_manifest(cache_dir).get(os.path.realpath(path))
+    if entry and entry.get('signature') == signature:
+        return entry['sha256']
+    return None
+
+
+def checksum(path, cache_dir=None):
+    """SHA-256 of path, taken from the manifest while its size and mtime are unchanged"""
+    key = os.path.realpath(path)
+    signature = _signature(path)
+    with _lock:
+        manifest = load_manifest(cache_dir)
+        entry = manifest.get(key)
+        if entry and entry.get('signature') == signature:
+            return entry['sha256']
+        digest = sha256_file(path)
+        manifest[key] = {'signature': signature, 'sha256': digest}
+        try:
+            save_manifest(manifest, cache_dir)
+        except OSError as e:
+            print(f"Error saving model checksum manifest: {e}")
+        return digest
+
+
+def model_key(cfg_path, weights_path, cache_dir=None):
+    """One checksum for a cfg and weights pair, hashing files not yet in the manifest"""
+    return _combine(checksum(path, cache_dir) for path in (cfg_path, weights_path))
+
+
+def recorded_model_key(cfg_path, weights_path, cache_dir=None):
+    """model_key from the manifest alone, or None if either file has no recorded checksum"""
+    checksums = [recorded_checksum(path, cache_dir) for path in (cfg_path, weights_path)]
+    if None in checksums:
+        return None
+    return _combine(checksums)
+
+
+def _combine(checksums):
+    digest = hashlib.sha256()
+    for value in checksums:
+        digest.update(value.encode())
+    return digest.hexdigest()
+
@@ -0,0 +1,341 @@
+"""
+Process-wide YOLO model registry
+Loads and warms each Darknet network once and shares it between all streams.
+OpenCV and NumPy are imported only when a model is loaded, so profile status
+and class names are available without them.
+"""
+
+import os
+import random
+import threading
+import time
+
+import model_cache
+from config import Config
+from sysinfo import current_rss_mb
+
+DEFAULT_CONFIG_PATH = Config.YOLO_CONFIG_PATH
+DEFAULT_WEIGHTS_PATH = Config.YOLO_WEIGHTS_PATH
+DEFAULT_CLASSES_PATH = Config.YOLO_CLASSES_PATH
+DEFAULT_INPUT_SIZE = 416
+# How often a process checks whether another process switched the detector profile
+PROFILE_CHECK_SECONDS = 2.0
+
+
+_labels = {}
+_labels_lock = threading.Lock()
+
+
+def load_labels(classes_path=DEFAULT_CLASSES_PATH):
+    """Return (class names, drawing colors) for a classes file, read once per process"""
+    key = os.path.abspath(classes_path)
+    with _labels_lock:
+        labels = _labels.get(key)
+        if labels is None:
+            with open(classes_path, 'r') as f:
+                classes = [line.strip() for line in f.readlines()]
+            # Plain tuples so drawing does not convert a numpy row per box
+            colors = [tuple(random.uniform(0, 255) for _ in range(3)) for _ in classes]
+            labels = (classes, colors)
+            _labels[key] = labels
+    return labels
+
+
+class YoloModel:
+    """A loaded network plus its class names and colors, safe to share between threads"""
+
+    def __init__(self, net, classes, output_layers, colors, input_size=DEFAULT_INPUT_SIZE):
+        self.net = net
+        self.classes = classes
+        self.output_layers = output_layers
+        self.colors = colors
+        self.input_size = input_size
+        self.checksum = None
+        self.load_seconds = 0.0
+        self.warmup_seconds = 0.0
+        self.rss_delta_mb = 0.0
+        # cv2.dnn.Net keeps its input as state, so setInput/forward must not interleave
+        self._lock = threading.Lock()
+
+    def forward(self, blob, outputs=None):
+        """Run one forward pass and return the raw output layers
+
+        With outputs (arrays from an earlier pass of this model) OpenCV writes
+        into them instead of allocating new ones.
+        """
+        with self._lock:
+            self.net.setInput(blob)
+            if outputs is not None:
+                return self.net.forward(self.output_layers, outputs)
+            return self.net.forward(self.output_layers)
+
+    def warmup(self):
+        """Run a forward pass on a blank blob so the first real frame is not slow"""
+        import numpy as np
+        start = time.perf_counter()
+        blob = np.zeros((1, 3, self.input_size, self.input_size), dtype=np.float32)
+        self.forward(blob)
+        self.warmup_seconds = time.perf_counter() - start
+
+
+class ModelRegistry:
+    """Keeps one YoloModel per (cfg, weights, classes, input size) for the whole process
+
+    With Config.MODEL_CHECKSUMS the same files under another path share a
+    model too, keyed by the checksum of cfg and weights that scripts/setup.py
+    recorded. Nothing is hashed here, so a cold load never reads the weights
+    twice; files without a recorded checksum are only shared by path.
+    """
+
+    def __init__(self):
+        self._models = {}
+        self._by_checksum = {}
+        self._lock = threading.Lock()
+        self._loading = {}
+
+    def get(self, cfg_path=DEFAULT_CONFIG_PATH, weights_path=DEFAULT_WEIGHTS_PATH,
+            classes_path=DEFAULT_CLASSES_PATH, input_size=DEFAULT_INPUT_SIZE, warmup=True):
+        """Return the shared model for these files, loading it on first use"""
+        key = (os.path.abspath(cfg_path), os.path.abspath(weights_path),
+               os.path.abspath(classes_path), input_size)
+        model = self._models.get(key)
+        if model is not None:
+            return model
+
+        with self._lock:
+            model = self._models.get(key)
+            if model is not None:
+                return model
+            # One lock per key so two different models can load concurrently
+            key_lock = self._loading.setdefault(key, threading.Lock())
+
+        with key_lock:
+            model = self._models.get(key)
+            if model is None:
+                checksum_key = None
+                recorded = model_cache.recorded_model_key(cfg_path, weights_path) if Config.MODEL_CHECKSUMS else None
+                if recorded is not None:
+                    checksum_key = (recorded, key[2], input_size)
+                    with self._lock:
+                        model = self._by_checksum.get(checksum_key)
+                if model is None:
+                    model = self._load(cfg_path, weights_path, classes_path, input_size, warmup)
+                    if checksum_key is not None:
+                        model.checksum = checksum_key[0]
+                with self._lock:
+                    self._models[key] = model
+                    if checksum_key is not None:
+                        self._by_checksum[checksum_key] = model
+                    self._loading.pop(key, None)
+        return model
+
+    def discard(self, model):
+        """Forget a model so its memory is freed once no stream holds it any more"""
+        with self._lock:
+            for models in (self._models, self._by_checksum):
+                for key, cached in list(models.items()):
+                    if cached is model:
+                        del models[key]
+
+    def _load(self, cfg_path, weights_path, classes_path, input_size, warmup):
+        import cv2
+        rss_before = current_rss_mb()
+        start = time.perf_counter()
+
+        net = cv2.dnn.readNetFromDarknet(cfg_path, weights_path)
+        if not Config.MODEL_WINOGRAD and hasattr(net, 'enableWinograd'):
+            net.enableWinograd(False)
+        classes, colors = load_labels(classes_path)
+        output_layers = net.getUnconnectedOutLayersNames()
+
+        model = YoloModel(net, classes, output_layers, colors, input_size)
+        model.load_seconds = time.perf_counter() - start
+        if warmup:
+            model.warmup()
+        model.rss_delta_mb = current_rss_mb() - rss_before
+
+        print(f"Loaded YOLO model {os.path.basename(weights_path)} ({input_size}x{input_size}) "
+              f"in {model.load_seconds:.2f}s, warm-up {model.warmup_seconds:.2f}s, "
+              f"+{model.rss_delta_mb:.1f} MB RSS")
+        return model
+
+    def report(self):
+        """Return load time and memory figures for every loaded model"""
+        models = []
+        for key, model in list(self._models.items()):
+            cfg_path, weights_path, classes_path, input_size = key
+            models.append({
+                'config': os.path.basename(cfg_path),
+                'weights': os.path.basename(weights_path),
+                'input_size': input_size,
+                'checksum': model.checksum,
+                'load_seconds': round(model.load_seconds, 3),
+                'warmup_seconds': round(model.warmup_seconds, 3),
+                'rss_delta_mb': round(model.rss_delta_mb, 1),
+            })
+        return {'models': models, 'process_rss_mb': round(current_rss_mb(), 1)}
+
+
+class DetectorProfiles:
+    """Named detector profiles from Config with one active at a time
+
+    Switching loads and warms the new model in the background; the old one
+    keeps serving frames until the new one takes over. With a warmer set
+    (the inference worker pool's warm) the new profile is loaded in the
+    workers instead, and this process never loads a network for it.
+
+    The chosen name is stored at state_path, so every web worker process
+    follows a switch made in any of them; a process that has not loaded
+    detection only records the name and loads nothing.
+    """
+
+    def __init__(self, registry, profiles, active_name, classes_path=DEFAULT_CLASSES_PATH, state_path=None):
+        if active_name not in profiles:
+            raise ValueError(f"Unknown detector profile: {active_name}")
+        self.registry = registry
+        self.profiles = profiles
+        self.classes_path = classes_path
+        self.state_path = state_path
+        self._stored_name = self._read_stored()
+        self._checked_at = time.monotonic()
+        self.active_name = self._stored_name or active_name
+        self.pending_name = None
+        self.last_error = None
+        self.warmer = None
+        # (profile, model) swapped as one reference so readers never see a mismatched pair
+        self._active = None
+        self._lock = threading.Lock()
+
+    def files_present(self, name=None):
+        profile = self.profiles[name or self.active_name]
+        return all(os.path.exists(path) for path in (profile['config'], profile['weights'], self.classes_path))
+
+    def active(self):
+        """Return (profile, model) for the active profile, loading it on first use"""
+        self._follow_stored()
+        active = self._active
+        if active is not None:
+            return active
+        with self._lock:
+            if self._active is None:
+                self._active = (self.profiles[self.active_name], self._load(self.active_name))
+            return self._active
+
+    def active_profile(self):
+        """Return (name, profile) of the active profile without loading its model"""
+        self._follow_stored()
+        with self._lock:
+            return self.active_name, self.profiles[self.active_name]
+
+    def switch(self, name):
+        """Store profile name for every process and start switching this one to it"""
+        if name not in self.profiles:
+            raise ValueError(f"Unknown detector profile: {name}")
+        if not self.files_present(name):
+            raise ValueError(f"Model files for profile {name} are missing")
+        if self.state_path is not None:
+            try:
+                os.makedirs(os.path.dirname(self.state_path) or '.', exist_ok=True)
+                # Written aside and renamed so another process never reads half a name
+                temporary = f'{self.state_path}.{os.getpid()}.tmp'
+                with open(temporary, 'w') as f:
+                    f.write(name)
+                os.replace(temporary, self.state_path)
+            except OSError as e:
+                print(f"Error saving detector profile {name}: {e}")
+        self._stored_name = name
+        return self._follow(name)
+
+    def _follow(self, name):
+        """Make name active here: warm it in the background if detection is loaded, else just record it"""
+        with self._lock:
+            if name == self.active_name and (self._active is not None or self.warmer is not None):
+                self.pending_name = None
+                return False
+            if self._active is None and self.warmer is None:
+                # No model loaded in this process: the next one loaded is simply the new profile
+                self.active_name = name
+                self.pending_name = None
+                return True
+            if self.pending_name == name:
+                return True
+            self.pending_name = name
+        threading.Thread(target=self._switch, args=(name,), name='profile-switch', daemon=True).start()
+        return True
+
+    def _read_stored(self):
+        if self.state_path is None:
+            return None
+        try:
+            with open(self.state_path, 'r') as f:
+                name = f.read().strip()
+        except OSError:
+            return None
+        return name if name in self.profiles else None
+
+    def _follow_stored(self):
+        """Follow a switch another process stored, checked at most every PROFILE_CHECK_SECONDS"""
+        now = time.monotonic()
+        if self.state_path is None or now - self._checked_at < PROFILE_CHECK_SECONDS:
+            return
+        self._checked_at = now
+        name = self._read_stored()
+        if name is None or name == self._stored_name:
+            return
+        self._stored_name = name
+        if not self.files_present(name):
+            print(f"Model files for detector profile {name} are missing; keeping {self.active_name}")
+            return
+        self._follow(name)
+
+    def _switch(self, name):
+        try:
+            if self.warmer is not None:
+                self.warmer(name)
+                model = None
+            else:
+                model = self._load(name)
+        except Exception as e:
+            print(f"Error loading detector profile {name}: {e}")
+            with self._lock:
+                self.last_error = f"{name}: {e}"
+                if self.pending_name == name:
+                    self.pending_name = None
+            return
+
+        with self._lock:
+            if self.pending_name != name:
+                return  # A newer switch request won
+            previous = self._active[1] if self._active is not None else None
+            self.active_name = name
+            self._active = (self.profiles[name], model) if model is not None else None
+            self.pending_name = None
+            self.last_error = None
+        if previous is not None and previous is not model:
+            self.registry.discard(previous)
+        print(f"Detector profile switched to {name}")
+
+    def _load(self, name):
+        profile = self.profiles[name]
+        return self.registry.get(cfg_path=profile['config'], weights_path=profile['weights'],
+                                 classes_path=self.classes_path, input_size=profile['input_size'])
+
+    def status(self):
+        self._follow_stored()
+        return {
+            'active': self.active_name,
+            'pending': self.pending_name,
+            'last_error': self.last_error,
+            'profiles': [{
+                'name': name,
+                'input_size': profile['input_size'],
+                'confidence': profile['confidence'],
+                'nms': profile['nms'],
+                'available': self.files_present(name),
+            } for name, profile in self.profiles.items()],
+        }
+
+
+registry = ModelRegistry()
+detector_profiles = DetectorProfiles(registry, Config.DETECTOR_PROFILES, Config.DETECTOR_PROFILE,
+                                     state_path=os.path.join(Config.MODEL_CACHE_DIR, 'detector_profile'))
@@ -0,0 +1,198 @@
+"""
+Pre-rendered speech for alerts
+Alert sentences are split into a class fragment ("person detected",
+"Warning! person too close", "person gone") and a quantized distance
+fragment ("at 1.5 meters"). Each fragment is rendered once to a WAV file
+with pyttsx3's save_to_file, so an alert is played by concatenating its
+clips instead of being synthesized while the user waits.
+
+A memory-only cache keeps clips of personal text, such as a user's medical
+summary, out of the shared directory: each clip is read back and its file
+deleted as soon as it is rendered.
+"""
+
+import collections
+import hashlib
+import io
+import os
+import tempfile
+import threading
+import wave
+
+from config import Config
+
+
+def quantize_distance(distance, step=None, maximum=None):
+    """Round a distance to the spoken step, clamped to [step, maximum]"""
+    step = Config.PHRASE_DISTANCE_STEP if step is None else step
+    maximum = Config.PHRASE_MAX_DISTANCE if maximum is None else maximum
+    return min(max(round(distance / step) * step, step), maximum)
+
+
+def distance_fragment(distance):
+    spoken = f'{distance:.1f}'.rstrip('0').rstrip('.')
+    return f'at {spoken} meters'
+
+
+def alert_phrase(label, distance, warning):
+    """Return (sentence, fragments) for an alert about label at distance"""
+    head = f'Warning! {label} too close' if warning else f'{label} detected'
+    tail = distance_fragment(quantize_distance(distance))
+    return f'{head} {tail}', (head, tail)
+
+
+def left_phrase(label):
+    """Return (sentence, fragments) for an object that is no longer in view"""
+    text = f'{label} gone'
+    return text, (text,)
+
+
+def all_fragments(labels, step=None, maximum=None):
+    """Every fragment alert_phrase and left_phrase can produce for labels"""
+    step = Config.PHRASE_DISTANCE_STEP if step is None else step
+    maximum = Config.PHRASE_MAX_DISTANCE if maximum is None else maximum
+    fragments = []
+    for label in labels:
+        fragments.append(f'Warning! {label} too close')
+        fragments.append(f'{label} detected')
+        fragments.append(left_phrase(label)[0])
+    steps = int(round(maximum / step))
+    fragments.extend(distance_fragment(quantize_distance(index * step, step, maximum))
+                     for index in range(1, steps + 1))
+    return fragments
+
+
+class PhraseCache:
+    """WAV fragments on disk and decoded in memory, both bounded least-recently-used"""
+
+    def __init__(self, directory=None, voice='default', max_files=None, max_memory=None, memory_only=False):
+        self.memory_only = memory_only
+        if memory_only and directory is None:
+            # Private (0700) scratch directory for the moment between rendering and reading back
+            directory = tempfile.mkdtemp(prefix='voas-speech-')
+        self.directory = directory or Config.PHRASE_CACHE_DIR
+        self.voice = voice
+        self.max_files = Config.PHRASE_CACHE_MAX_FILES if max_files is None else max_files
+        self.max_memory = Config.PHRASE_CACHE_MAX_MEMORY if max_memory is None else max_memory
+        self._memory = collections.OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.rendered = 0
+        os.makedirs(self.directory, exist_ok=True)
+
+    def path(self, text):
+        # The voice settings are part of the key so a rate change does not play stale clips
+        digest = hashlib.sha1(f'{self.voice}|{text}'.encode('utf-8')).hexdigest()[:20]
+        return os.path.join(self.directory, digest + '.wav')
+
+    def has(self, text):
+        if self.memory_only:
+            return text in self._memory
+        return text in self._memory or os.path.exists(self.path(text))
+
+    def missing(self, fragments):
+        return [text for text in fragments if not self.has(text)]
+
+    def render(self, engine, fragments):
+        """Render fragments to disk with an initialized pyttsx3 engine (on the engine's thread)"""
+        pending = self.missing(fragments)
+        for text in pending:
+            engine.save_to_file(text, self.path(text))
+        if pending:
+            engine.runAndWait()
+            self.rendered += len(pending)
+            if self.memory_only:
+                for text in pending:
+                    self.load(text)
+                    try:
+                        os.remove(self.path(text))
+                    except OSError:
+                        pass
+            else:
+                self.prune()
+        return len(pending)
+
+    def load(self, text):
+        """Return (wave params, frames) for a fragment, or None if it is not rendered yet"""
+        with self._lock:
+            clip = self._memory.get(text)
+            if clip is not None:
+                self._memory.move_to_end(text)
+                return clip
+        path = self.path(text)
+        try:
+            with wave.open(path, 'rb') as f:
+                clip = (f.getparams()[:3], f.readframes(f.getnframes()))
+            os.utime(path)  # Disk LRU goes by modification time
+        except (OSError, EOFError, wave.Error):
+            return None
+        with self._lock:
+            self._memory[text] = clip
+            while len(self._memory) > self.max_memory:
+                self._memory.popitem(last=False)
+        return clip
+
+    def audio(self, fragments):
+        """Concatenate rendered fragments into (wave params, frames), or None if any is missing"""
+        clips = []
+        for text in fragments:
+            clip = self.load(text)
+            if clip is None or (clips and clip[0] != clips[0][0]):
+                self.misses += 1
+                return None
+            clips.append(clip)
+        self.hits += 1
+        return clips[0][0], b''.join(frames for params, frames in clips)
+
+    def prune(self):
+        """Delete the least recently used files beyond max_files"""
+        try:
+            paths = [os.path.join(self.directory, name) for name in os.listdir(self.directory)
+                     if name.endswith('.wav')]
+            if len(paths) <= self.max_files:
+                return
+            paths.sort(key=os.path.getmtime)
+            for path in paths[:len(paths) - self.max_files]:
+                os.remove(path)
+        except OSError as e:
+            print(f"Error pruning phrase cache: {e}")
+
+    def stats(self):
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'rendered': self.rendered,
+            'in_memory': len(self._memory),
+        }
+
+
+def wav_bytes(params, frames):
+    """Wrap raw frames in a WAV header"""
+    buffer = io.BytesIO()
+    with wave.open(buffer, 'wb') as f:
+        f.setnchannels(params[0])
+        f.setsampwidth(params[1])
+        f.setframerate(params[2])
+        f.writeframes(frames)
+    return buffer.getvalue()
+
+
+def get_player():
+    """Return a blocking play(params, frames) function, or None if no audio output is available"""
+    try:
+        import winsound
+
+        def play(params, frames):
+            winsound.PlaySound(wav_bytes(params, frames), winsound.SND_MEMORY)
+        return play
+    except ImportError:
+        pass
+    try:
+        import simpleaudio
+
+        def play(params, frames):
+            simpleaudio.play_buffer(frames, params[0], params[1], params[2]).wait_done()
+        return play
+    except ImportError:
+        return None
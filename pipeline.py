@@ -0,0 +1,466 @@
+"""
+Staged object detection pipeline
+capture -> inference -> annotate/encode, each stage on its own thread and
+joined by single-item slots that always hold only the newest frame, so the
+stream runs at the speed of the slowest stage instead of the sum of all.
+"""
+
+import json
+import threading
+import time
+
+import cv2
+
+import metrics
+from config import Config
+from frame_buffers import FrameBuffers
+from inference_scheduler import scheduler as default_scheduler
+from model_registry import detector_profiles, load_labels
+from phrase_cache import alert_phrase, left_phrase
+from scene_state import SceneState, LEFT
+from speech import get_speech_worker, PRIORITY_WARNING, PRIORITY_INFO
+from stream_encoder import ChunkEncoder, StreamQuality
+from tracker import IouTracker, KeyframeScheduler
+from worker_pool import WorkerError, get_pool
+from yolo_postprocess import postprocess
+
+# Camera parameters
+FOCAL_LENGTH = Config.FOCAL_LENGTH  # in pixels
+OBJECT_HEIGHT = Config.OBJECT_HEIGHT  # in meters
+MIN_DISTANCE = Config.MIN_DISTANCE  # in meters
+
+IMPORTANT_OBJECTS = ['person', 'car', 'bicycle', 'dog', 'cat']
+
+
+class LatestSlot:
+    """A size-1 hand-off between stages; putting a new item drops the unread old one"""
+
+    def __init__(self):
+        self._item = None
+        self._full = False
+        self._closed = False
+        self._cond = threading.Condition()
+
+    def put(self, item):
+        """Store item, returning True if an unread item was overwritten"""
+        with self._cond:
+            dropped = self._full
+            self._item = item
+            self._full = True
+            self._cond.notify_all()
+        return dropped
+
+    def get(self, timeout=None):
+        """Wait for and take the newest item, or return None if closed or timed out"""
+        with self._cond:
+            if not self._full and not self._closed:
+                self._cond.wait(timeout)
+            if not self._full:
+                return None
+            item = self._item
+            self._item = None
+            self._full = False
+            return item
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+
+class PipelineCounters:
+    """Thread-safe frame counters for one pipeline"""
+
+    NAMES = ('captured', 'inferred', 'tracked', 'dropped_capture', 'dropped_inference',
+             'dropped_stream', 'streamed', 'dropped_events', 'events', 'worker_errors')
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._values = dict.fromkeys(self.NAMES, 0)
+        self.last_frame_age_ms = 0.0
+        self.last_alert_frame_age_ms = 0.0
+
+    def increment(self, name, amount=1):
+        with self._lock:
+            self._values[name] += amount
+        if name.startswith('dropped_'):
+            metrics.FRAMES_DROPPED.labels(name[len('dropped_'):]).inc(amount)
+
+    def snapshot(self):
+        with self._lock:
+            values = dict(self._values)
+        values['dropped'] = (values['dropped_capture'] + values['dropped_inference']
+                             + values['dropped_stream'] + values['dropped_events'])
+        values['last_frame_age_ms'] = round(self.last_frame_age_ms, 1)
+        values['last_alert_frame_age_ms'] = round(self.last_alert_frame_age_ms, 1)
+        return values
+
+
+class FramePacket:
+    """A captured frame travelling through the stages"""
+
+    def __init__(self, sequence, frame, captured_at):
+        self.sequence = sequence
+        self.frame = frame
+        self.captured_at = captured_at
+        self.detections = []
+        self.changes = []
+        self.colors = None
+
+
+def estimate_distance(box_height):
+    """Estimate distance in meters from the pixel height of a bounding box"""
+    if box_height <= 0:
+        return None
+    return round((OBJECT_HEIGHT * FOCAL_LENGTH) / box_height, 2)
+
+
+def make_detection(label, class_id, confidence, box):
+    """Build one detection dict with distance and warning flag"""
+    distance = estimate_distance(box[3])
+    return {
+        'label': label,
+        'class_id': class_id,
+        'confidence': round(confidence, 3),
+        'box': box,
+        'distance': distance,
+        'warning': distance is not None and distance < MIN_DISTANCE,
+        'track_id': None,
+    }
+
+
+def build_detections(boxes, confidences, class_ids, classes):
+    """Turn post-processed arrays into detection dicts"""
+    return [make_detection(str(classes[class_id]), class_id, confidence, (x, y, w, h))
+            for (x, y, w, h), confidence, class_id
+            in zip(boxes.tolist(), confidences.tolist(), class_ids.tolist())]
+
+
+def detection_event(packet):
+    """Serialize a packet's detections as one compact JSON event"""
+    height, width = packet.frame.shape[:2]
+    return json.dumps({
+        'seq': packet.sequence,
+        'age_ms': round((time.monotonic() - packet.captured_at) * 1000, 1),
+        'size': [width, height],
+        'objects': [{
+            'label': detection['label'],
+            'confidence': detection['confidence'],
+            'box': list(detection['box']),
+            'distance': detection['distance'],
+            'warning': detection['warning'],
+            'track_id': detection['track_id'],
+        } for detection in packet.detections],
+        'changes': packet.changes,
+    }, separators=(',', ':'))
+
+
+def draw_detections(frame, detections, colors):
+    """Draw bounding boxes, labels and distances onto frame in place"""
+    for detection in detections:
+        x, y, w, h = detection['box']
+        color = colors[detection['class_id']]
+        cv2.rectangle(frame, (x, y), (x + w, y + h), color, 2)
+        if detection['distance'] is None:
+            continue
+
+        # Add label with distance
+        label_text = f"{detection['label']}: {detection['distance']}m"
+        if detection['warning']:
+            cv2.putText(frame, f"WARNING: {label_text}", (x, y - 10),
+                        cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 0, 255), 2)
+        else:
+            cv2.putText(frame, label_text, (x, y - 10),
+                        cv2.FONT_HERSHEY_SIMPLEX, 0.5, color, 2)
+
+
+class AlertPolicy:
+    """Speaks scene changes: objects appearing, coming too close or leaving
+
+    Only changes are spoken, so an object standing still is announced once
+    and a new obstacle is never held back by an earlier alert.
+    """
+
+    def __init__(self, speech, scene=None):
+        self.speech = speech
+        self.scene = scene or SceneState()
+
+    def update(self, detections, current_time):
+        """Fold a frame's detections into the scene; returns its changes"""
+        changes = self.scene.update(detections, current_time)
+        for change in changes:
+            metrics.SCENE_CHANGES.labels(change['change']).inc()
+        return changes
+
+    def announce(self, changes):
+        """Queue speech for scene changes; returns True if an alert was queued"""
+        alerted = False
+        for change in changes:
+            label = change['label']
+            # Alerts about the same object replace each other in the speech queue
+            key = change['track_id']
+            if change['change'] == LEFT:
+                if label not in IMPORTANT_OBJECTS:
+                    continue
+                text, fragments = left_phrase(label)
+                priority = PRIORITY_INFO
+            elif change['warning']:
+                # Voice warning for close objects, as soon as they appear or come close
+                text, fragments = alert_phrase(label, change['distance'], warning=True)
+                priority = PRIORITY_WARNING
+            elif label in IMPORTANT_OBJECTS:
+                text, fragments = alert_phrase(label, change['distance'], warning=False)
+                priority = PRIORITY_INFO
+            else:
+                continue
+            self.speech.say(text, priority=priority, key=key, fragments=fragments)
+            alerted = True
+        return alerted
+
+
+class DetectionPipeline:
+    """Runs capture, inference and annotate/encode stages on separate threads
+
+    Detection runs once per frame no matter how many outputs are attached.
+    Each video output has its own StreamQuality; outputs on the same level
+    share one encode, and nothing is drawn or encoded while no video output
+    is attached. Event outputs get the detections as JSON straight from the
+    inference stage.
+    """
+
+    def __init__(self, source=0, model=None, speech=None, voice_enabled=None,
+                 keyframe_interval=None, adaptive_keyframes=None, profiles=None, scheduler=None, pool=None):
+        self.source = source
+        self.model = model
+        # A fixed model pins the pipeline; otherwise every keyframe follows the active profile
+        if profiles is None and model is None:
+            profiles = detector_profiles
+        self.profiles = profiles
+        # With INFERENCE_WORKERS set, keyframes run in worker processes that follow the active profile
+        if pool is None and profiles is not None:
+            pool = get_pool()
+        self.pool = pool
+        # Otherwise frames from all streams share batched forward passes unless batching is off
+        if scheduler is None and pool is None and Config.INFERENCE_BATCHING:
+            scheduler = default_scheduler
+        self.scheduler = scheduler
+        self.classes = None
+        self.colors = None
+        # Reused every frame: blob/output/decode buffers for inference, resize buffers for encoding
+        self._buffers = FrameBuffers()
+        self._encoder = ChunkEncoder()
+        self.speech = speech
+        self.voice_enabled = voice_enabled or (lambda: True)
+        self.counters = PipelineCounters()
+        self.alerts = None
+        self.tracker = IouTracker()
+        self.keyframes = KeyframeScheduler(
+            Config.KEYFRAME_INTERVAL if keyframe_interval is None else keyframe_interval,
+            Config.ADAPTIVE_KEYFRAMES if adaptive_keyframes is None else adaptive_keyframes)
+        self._camera = None
+        self._captured = LatestSlot()
+        self._inferred = LatestSlot()
+        self._outputs = {}
+        self._event_outputs = []
+        self._outputs_lock = threading.Lock()
+        self._sent_empty_event = False
+        self._threads = []
+        self._running = False
+
+    @property
+    def running(self):
+        return self._running
+
+    def start(self):
+        """Open the camera and start the stage threads"""
+        # Load the detector before opening the camera so a missing model fails fast
+        if self.pool is not None:
+            name, profile = self.profiles.active_profile()
+            if not self.profiles.files_present(name):
+                raise RuntimeError(f"Model files for profile {name} are missing")
+            self.pool.start()
+            self.classes, self.colors = load_labels(self.profiles.classes_path)
+        else:
+            profile, self.model = self._current_detector()
+            self.classes, self.colors = self.model.classes, self.model.colors
+        if self.speech is None:
+            self.speech = get_speech_worker()
+        self.alerts = AlertPolicy(self.speech)
+
+        # A source with read() (e.g. frames pushed by a client) is used as the camera directly
+        self._camera = self.source if hasattr(self.source, 'read') else cv2.VideoCapture(self.source)
+        if not self._camera.isOpened():
+            self._camera.release()
+            raise RuntimeError(f"Unable to open camera {self.source}")
+
+        self._running = True
+        if self.scheduler is not None:
+            self.scheduler.register_stream()
+        for name, target in (('capture', self._capture_loop),
+                             ('inference', self._inference_loop),
+                             ('encode', self._encode_loop)):
+            thread = threading.Thread(target=target, name=f'pipeline-{name}', daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        return self
+
+    def stop(self):
+        """Stop all stages; the capture thread releases the camera on its way out"""
+        self._running = False
+        with self._outputs_lock:
+            outputs = list(self._outputs) + list(self._event_outputs)
+        for slot in [self._captured, self._inferred] + outputs:
+            slot.close()
+        for thread in self._threads:
+            if thread is not threading.current_thread():
+                thread.join(timeout=2)
+        if self._threads and self.scheduler is not None:
+            self.scheduler.unregister_stream(self.source)
+        self._threads = []
+
+    def _current_detector(self):
+        """Return (profile, model) to use for the next keyframe"""
+        if self.profiles is None:
+            return {'confidence': Config.CONFIDENCE_THRESHOLD, 'nms': Config.NMS_THRESHOLD}, self.model
+        return self.profiles.active()
+
+    def add_output(self, slot, quality=None):
+        """Start broadcasting encoded chunks into slot at a level chosen by quality"""
+        with self._outputs_lock:
+            self._outputs[slot] = quality or StreamQuality()
+
+    def remove_output(self, slot):
+        with self._outputs_lock:
+            self._outputs.pop(slot, None)
+
+    def add_event_output(self, slot):
+        """Start sending JSON detection events into slot"""
+        with self._outputs_lock:
+            self._event_outputs.append(slot)
+            self._sent_empty_event = False
+
+    def remove_event_output(self, slot):
+        with self._outputs_lock:
+            if slot in self._event_outputs:
+                self._event_outputs.remove(slot)
+
+    def _capture_loop(self):
+        sequence = 0
+        try:
+            while self._running and self._camera.isOpened():
+                success, frame = self._camera.read()
+                if not success:
+                    break
+                if frame is None:
+                    continue  # Pushed sources return no frame while the client is quiet
+                sequence += 1
+                self.counters.increment('captured')
+                if self._captured.put(FramePacket(sequence, frame, time.monotonic())):
+                    self.counters.increment('dropped_capture')
+        finally:
+            self._camera.release()
+            self._running = False
+            self._captured.close()
+
+    def _inference_loop(self):
+        while self._running:
+            packet = self._captured.get(timeout=1)
+            if packet is None:
+                continue
+            boxes = None
+            if self.keyframes.is_keyframe():
+                # Picked up per keyframe so a profile switch takes effect on a running stream
+                if self.pool is not None:
+                    # Workers hold the networks and run decode/NMS too; only labels are needed here
+                    name, profile = self.profiles.active_profile()
+                    try:
+                        boxes, confidences, class_ids = self.pool.detect(packet.frame, name, profile)
+                    except WorkerError as e:
+                        # Never load the network here: the tracker covers this frame and the next one retries
+                        print(f"Error in inference worker, tracking this frame instead: {e}")
+                        self.counters.increment('worker_errors')
+                        self.keyframes.retry()
+                else:
+                    profile, self.model = self._current_detector()
+                    self.classes, self.colors = self.model.classes, self.model.colors
+                    boxes, confidences, class_ids = self._detect(packet.frame, profile)
+            if boxes is not None:
+                detections = build_detections(boxes, confidences, class_ids, self.classes)
+                packet.detections = self.tracker.update(detections)
+                self.keyframes.adjust(packet.detections, self.tracker)
+                self.counters.increment('inferred')
+            else:
+                # Between keyframes (or after a failed one) the tracker carries boxes forward without running YOLO
+                packet.detections = self.tracker.predict(make_detection)
+                self.counters.increment('tracked')
+            packet.colors = self.colors
+
+            # Alerts go out as soon as detections exist, before drawing and encoding
+            packet.changes = self.alerts.update(packet.detections, time.monotonic())
+            if packet.changes and self.voice_enabled() and self.alerts.announce(packet.changes):
+                self.counters.last_alert_frame_age_ms = (time.monotonic() - packet.captured_at) * 1000
+
+            self._publish_event(packet)
+            if self._inferred.put(packet):
+                self.counters.increment('dropped_inference')
+
+    def _detect(self, frame, profile):
+        """Run the in-process model on frame and return post-processed arrays"""
+        height, width = frame.shape[:2]
+        if self.scheduler is not None:
+            outs = self.scheduler.infer(self.model, frame, self.source)
+        else:
+            with metrics.INFERENCE_SECONDS.time():
+                outs = self._buffers.forward(self.model, frame)
+        with metrics.DECODE_SECONDS.time():
+            return postprocess(outs, width, height, profile['confidence'], profile['nms'],
+                               scratch=self._buffers.decode)
+
+    def _publish_event(self, packet):
+        with self._outputs_lock:
+            outputs = list(self._event_outputs)
+        if not outputs:
+            return
+        # An empty scene is sent once, not on every frame
+        if not packet.detections:
+            if self._sent_empty_event:
+                return
+            self._sent_empty_event = True
+        else:
+            self._sent_empty_event = False
+        event = detection_event(packet)
+        for slot in outputs:
+            if slot.put(event):
+                self.counters.increment('dropped_events')
+
+    def _encode_loop(self):
+        while self._running:
+            packet = self._inferred.get(timeout=1)
+            if packet is None:
+                continue
+            with self._outputs_lock:
+                outputs = list(self._outputs.items())
+            if not outputs:
+                continue  # Nobody is watching: detection and alerts still ran, skip drawing and encoding
+
+            draw_detections(packet.frame, packet.detections, packet.colors)
+            # Encode once per (quality, scale) level in use for this frame
+            chunks = {}
+            for slot, quality in outputs:
+                settings = quality.settings()
+                if settings not in chunks:
+                    with metrics.ENCODE_SECONDS.time():
+                        chunks[settings] = self._encoder.encode(packet.frame, *settings)
+                chunk = chunks[settings]
+                if chunk is None:
+                    continue
+                # A slow viewer just skips frames, and steps down a level if it keeps doing so
+                dropped = slot.put(chunk)
+                quality.record(dropped)
+                if dropped:
+                    self.counters.increment('dropped_stream')
+
+            if any(chunk is not None for chunk in chunks.values()):
+                frame_age = time.monotonic() - packet.captured_at
+                self.counters.last_frame_age_ms = frame_age * 1000
+                metrics.FRAME_LATENCY_SECONDS.observe(frame_age)
@@ -0,0 +1,109 @@
+"""
+Incremental scene state for spoken alerts
+Keeps the objects currently in view and reports only what changed since the
+previous frame: an object appearing, coming closer than MIN_DISTANCE, or
+leaving. Appearing, clearing "too close" and leaving all use hysteresis so a
+detection that flickers for a frame does not produce a burst of alerts.
+"""
+
+from config import Config
+
+APPEARED = 'appeared'
+CLOSER = 'closer'
+LEFT = 'left'
+
+
+class SceneObject:
+    """One object the scene knows about, pending until it has been seen enough frames"""
+
+    def __init__(self, detection, now):
+        self.track_id = detection['track_id']
+        self.label = detection['label']
+        self.box = detection['box']
+        self.distance = detection['distance']
+        self.seen = 0
+        self.last_seen = now
+        self.present = False
+        self.close = False
+
+    def near(self, box):
+        """True if box is centred within one object size of this object's last box"""
+        x, y, w, h = self.box
+        bx, by, bw, bh = box
+        size = max(w, h, bw, bh, 1)
+        return abs((x + w / 2) - (bx + bw / 2)) <= size and abs((y + h / 2) - (by + bh / 2)) <= size
+
+
+class SceneState:
+    """Tracks present objects across frames and emits change events"""
+
+    def __init__(self, min_distance=None, enter_frames=2, leave_seconds=1.0, clear_margin=1.25):
+        self.min_distance = Config.MIN_DISTANCE if min_distance is None else min_distance
+        self.enter_frames = enter_frames  # consecutive sightings before an object counts as present
+        self.leave_seconds = leave_seconds  # unseen this long before an object counts as gone
+        self.clear_margin = clear_margin  # "too close" clears only beyond min_distance * clear_margin
+        self._objects = {}
+
+    def update(self, detections, now):
+        """Fold one frame's detections into the scene and return the changes as dicts"""
+        changes = []
+        detections = [detection for detection in detections
+                      if detection['distance'] is not None and detection['track_id'] is not None]
+        seen = {detection['track_id'] for detection in detections}
+        for detection in detections:
+            obj = self._objects.get(detection['track_id'])
+            if obj is None:
+                obj = self._adopt(detection, seen, now)
+            obj.box = detection['box']
+            obj.distance = detection['distance']
+            obj.seen += 1
+            obj.last_seen = now
+
+            if not obj.present:
+                if obj.seen >= self.enter_frames:
+                    obj.present = True
+                    obj.close = obj.distance < self.min_distance
+                    changes.append(self._change(APPEARED, obj))
+            elif not obj.close and obj.distance < self.min_distance:
+                obj.close = True
+                changes.append(self._change(CLOSER, obj))
+            elif obj.close and obj.distance > self.min_distance * self.clear_margin:
+                obj.close = False
+
+        for track_id, obj in list(self._objects.items()):
+            if track_id in seen:
+                continue
+            if not obj.present:
+                # Sightings must be consecutive: a pending object that skips a frame starts over
+                del self._objects[track_id]
+            elif now - obj.last_seen > self.leave_seconds:
+                del self._objects[track_id]
+                changes.append(self._change(LEFT, obj))
+        return changes
+
+    def present(self):
+        """Objects currently counted as in view"""
+        return [obj for obj in self._objects.values() if obj.present]
+
+    def _adopt(self, detection, seen, now):
+        # The tracker can lose an object and pick it up under a new id; an unseen object of the
+        # same class at the same place is taken over instead of announcing it again
+        for track_id, obj in self._objects.items():
+            if track_id not in seen and obj.present and obj.label == detection['label'] \
+                    and obj.near(detection['box']):
+                del self._objects[track_id]
+                obj.track_id = detection['track_id']
+                self._objects[obj.track_id] = obj
+                return obj
+        obj = SceneObject(detection, now)
+        self._objects[obj.track_id] = obj
+        return obj
+
+    def _change(self, change, obj):
+        return {
+            'change': change,
+            'label': obj.label,
+            'track_id': obj.track_id,
+            'distance': obj.distance,
+            'warning': obj.close,
+        }
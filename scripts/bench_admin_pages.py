@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""
+Admin listing latency benchmark
+Seeds (or reuses) a database and times the old load-everything queries of
+/users, /view_medical and /database_viewer against the keyset-paginated
+pages and the single-query stats, including template rendering for the
+paginated pages. OFFSET paging is timed too, to show why deep pages use a
+cursor instead.
+
+    python scripts/bench_admin_pages.py --database sqlite:////tmp/voas-100k.db --users 100000
+    python scripts/bench_admin_pages.py --database sqlite:////tmp/voas-100k.db --explain
+"""
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+
+from sqlalchemy import create_engine, event, func, inspect
+from sqlalchemy.orm import Session
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from app import app, db, Medical, Users, USER_SORTS, MEDICAL_SORTS  # noqa: E402
+from flask import render_template  # noqa: E402
+from listings import encode_cursor, paginate, prefix_filter  # noqa: E402
+from seed_db import seed  # noqa: E402
+from sysinfo import peak_rss_mb  # noqa: E402
+
+
+def timed(function, repeats):
+    """Median and max milliseconds of function over repeats calls"""
+    samples = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        function()
+        samples.append((time.perf_counter() - start) * 1000)
+    return {'median_ms': round(statistics.median(samples), 2), 'max_ms': round(max(samples), 2)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the admin listing pages on a large database")
+    parser.add_argument('--database', required=True, help="SQLAlchemy URL of a scratch database")
+    parser.add_argument('--users', type=int, default=100000, help="Seed up to this many users if there are fewer")
+    parser.add_argument('--repeats', type=int, default=5)
+    parser.add_argument('--limit', type=int, default=50, help="Page size")
+    parser.add_argument('--explain', action='store_true', help="Print SQLite query plans of the paginated queries")
+    parser.add_argument('--output', help="Write results as JSON to this path")
+    args = parser.parse_args()
+
+    engine = create_engine(args.database)
+    db.metadata.create_all(engine)
+    # Indexes declared on the models, for databases created before they existed
+    for table in db.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=engine, checkfirst=True)
+    session = Session(engine)
+    existing = session.query(func.count(Users.id)).scalar()
+    if existing < args.users:
+        print(f"Seeding {args.users - existing} users...")
+        seed(engine, args.users - existing)
+    user_count = session.query(func.count(Users.id)).scalar()
+    middle = user_count // 2
+    deep_user = session.query(Users).order_by(Users.lname, Users.id).offset(middle).first()
+    deep_cursor = encode_cursor(deep_user.lname, deep_user.id)
+
+    def users_page(**kwargs):
+        return paginate(session.query(Users), USER_SORTS, Users.id, limit=args.limit, **kwargs)
+
+    def render_users(page):
+        with app.test_request_context('/users'):
+            render_template('view_user.html', users=page, user_count=user_count, medical_count=0)
+
+    scenarios = {
+        # What the pages did before: every row, then two more count queries for the viewer
+        'legacy_users_all': lambda: session.query(Users).all(),
+        'legacy_medical_all': lambda: session.query(Medical).all(),
+        'legacy_viewer_counts': lambda: (session.query(Users).count(), session.query(Medical).count()),
+        'stats_one_query': lambda: session.query(
+            session.query(func.count()).select_from(Users).scalar_subquery(),
+            session.query(func.count()).select_from(Medical).scalar_subquery()).one(),
+        'users_first_page': lambda: users_page(),
+        'users_first_page_rendered': lambda: render_users(users_page()),
+        'users_by_lname_deep_keyset': lambda: users_page(sort='lname', cursor=deep_cursor),
+        'users_by_lname_deep_offset': lambda: session.query(Users).order_by(Users.lname, Users.id)
+        .offset(middle).limit(args.limit).all(),
+        'users_prefix_search': lambda: paginate(
+            session.query(Users).filter(prefix_filter(Users.id, [Users.username, Users.email, Users.phone,
+                                                                 Users.lname], 'user00421')),
+            USER_SORTS, Users.id, limit=args.limit),
+        'medical_by_user': lambda: paginate(session.query(Medical).filter(Medical.user_id == middle),
+                                            MEDICAL_SORTS, Medical.id, limit=args.limit),
+        'medical_by_bloodgroup_deep': lambda: paginate(
+            session.query(Medical).filter(Medical.bloodgroup == 'O+'), MEDICAL_SORTS, Medical.id,
+            cursor=encode_cursor(middle, middle), limit=args.limit),
+    }
+
+    results = {}
+    print(f"{user_count} users, page size {args.limit}, {args.repeats} repeats")
+    print(f"{'scenario':32} {'median ms':>10} {'max ms':>10}")
+    for name, function in scenarios.items():
+        function()  # Warm the page cache and the statement cache
+        results[name] = timed(function, args.repeats)
+        session.expunge_all()
+        print(f"{name:32} {results[name]['median_ms']:10.2f} {results[name]['max_ms']:10.2f}")
+    print(f"Peak RSS {peak_rss_mb():.1f} MB")
+
+    if args.explain and engine.dialect.name == 'sqlite':
+        print("\nIndexes:", {table: [index['name'] for index in inspect(engine).get_indexes(table)]
+                             for table in ('users', 'medical')})
+        for name in ('users_by_lname_deep_keyset', 'users_prefix_search', 'medical_by_user'):
+            statements = []
+
+            def capture(conn, cursor, statement, parameters, context, executemany):
+                statements.append((statement, parameters))
+            event.listen(engine, 'before_cursor_execute', capture)
+            scenarios[name]()
+            event.remove(engine, 'before_cursor_execute', capture)
+            statement, parameters = statements[-1]
+            with engine.connect() as connection:
+                plan = connection.exec_driver_sql('EXPLAIN QUERY PLAN ' + statement, parameters).fetchall()
+            print(f"\n{name}:")
+            for row in plan:
+                print('   ', row[-1])
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'users': user_count, 'limit': args.limit, 'results': results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+Bulk import benchmark
+Imports the same generated users the way /register/ would, one duplicate
+check and one commit per row, and through bulk_io.import_users, on fresh
+copies of a seeded SQLite file. Both sides share one precomputed password
+hash so the database work is what gets compared; password hashing is timed
+separately, serially and on the thread pool. Streaming export is timed too.
+
+    python scripts/bench_bulk_import.py --database /tmp/voas-bulk.db --rows 5000
+"""
+
+import argparse
+import io
+import json
+import os
+import shutil
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from sqlalchemy import create_engine, or_
+from sqlalchemy.orm import Session
+from werkzeug.security import generate_password_hash
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import bulk_io  # noqa: E402
+import database  # noqa: E402
+from app import Users  # noqa: E402
+from seed_db import seed  # noqa: E402
+
+
+def csv_file(rows, start):
+    lines = ["username,uname,lname,email,date,address,phone,password"]
+    for index in range(start, start + rows):
+        lines.append(f"bulk{index},Asha,Patel,bulk{index}@example.com,1990-01-01,1 Main Road,6{index:09d},password{index}")
+    return ('\n'.join(lines) + '\n').encode('utf-8')
+
+
+def make_engine(path):
+    uri = f'sqlite:///{path}'
+    engine = create_engine(uri, **database.engine_options(uri))
+    database.install_sqlite_pragmas(engine)
+    return engine
+
+
+def fresh_copy(source, label):
+    path = f'{source}.{label}'
+    for suffix in ('', '-wal', '-shm'):
+        if os.path.exists(path + suffix):
+            os.remove(path + suffix)
+    shutil.copyfile(source, path)
+    return path
+
+
+def legacy_import(session, data, password_hash):
+    """What registering every row through /register/ costs the database"""
+    for line, record, error in bulk_io.read_records(io.BytesIO(data), 'csv'):
+        existing = session.query(Users).filter(or_(Users.email == record['email'], Users.phone == record['phone'],
+                                                   Users.username == record['username'])).first()
+        if existing is None:
+            session.add(Users(username=record['username'], uname=record['uname'], lname=record['lname'],
+                              email=record['email'], date=record['date'], address=record['address'],
+                              phone=record['phone'], pass1=password_hash))
+            session.commit()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark bulk user import against one-at-a-time registration")
+    parser.add_argument('--database', required=True, help="Scratch SQLite file; copies are made next to it")
+    parser.add_argument('--users', type=int, default=20000, help="Existing users to seed if the file does not exist")
+    parser.add_argument('--rows', type=int, default=5000, help="Users to import")
+    parser.add_argument('--hashes', type=int, default=16, help="Passwords to hash for the hashing timings")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--output', help="Write results as JSON to this path")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.database):
+        print(f"Seeding {args.users} users into {args.database}...")
+        seed(create_engine(f'sqlite:///{args.database}'), args.users)
+    data = csv_file(args.rows, 10 ** 8)
+    password_hash = generate_password_hash('password')
+    results = {}
+
+    engine = make_engine(fresh_copy(args.database, 'legacy'))
+    with Session(engine) as session:
+        start = time.perf_counter()
+        legacy_import(session, data, password_hash)
+        results['legacy_rows_per_second'] = round(args.rows / (time.perf_counter() - start), 1)
+    engine.dispose()
+
+    engine = make_engine(fresh_copy(args.database, 'bulk'))
+    with Session(engine) as session:
+        report = bulk_io.import_users(session, Users, io.BytesIO(data), 'csv',
+                                      hash_password=lambda password: password_hash)
+        results['bulk_rows_per_second'] = round(report.inserted / report.seconds, 1)
+        # The same file again: every row is now a duplicate, found by the batched checks
+        report = bulk_io.import_users(session, Users, io.BytesIO(data), 'csv', dry_run=True)
+        results['duplicate_check_rows_per_second'] = round(report.rows / report.seconds, 1)
+    for fmt in bulk_io.FORMATS:
+        start = time.perf_counter()
+        rows = sum(text.count('\n') for text in bulk_io.export_stream(engine, Users, bulk_io.USER_EXPORT_FIELDS, fmt))
+        results[f'export_{fmt}_rows_per_second'] = round(rows / (time.perf_counter() - start), 1)
+    engine.dispose()
+
+    passwords = [f'password{index}' for index in range(args.hashes)]
+    start = time.perf_counter()
+    for password in passwords:
+        generate_password_hash(password)
+    results['hashes_per_second_serial'] = round(args.hashes / (time.perf_counter() - start), 2)
+    with ThreadPoolExecutor(max_workers=args.workers) as executor:
+        start = time.perf_counter()
+        list(executor.map(generate_password_hash, passwords))
+        results[f'hashes_per_second_{args.workers}_threads'] = round(args.hashes / (time.perf_counter() - start), 2)
+
+    for name, value in results.items():
+        print(f"{name:36} {value:12}")
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'rows': args.rows, 'cpus': os.cpu_count(), 'results': results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
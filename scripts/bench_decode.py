@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+"""
+YOLO output decode micro-benchmark
+Compares the original per-row Python loop with the vectorized decoder in
+yolo_postprocess.py on recorded (or synthetic) YOLOv3 output layers.
+
+Record real outputs once (needs the model files):
+    python scripts/bench_decode.py --record path/to/video.mp4 --frames 50 --save outputs.npz
+Then benchmark on them:
+    python scripts/bench_decode.py --outputs outputs.npz
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from yolo_postprocess import postprocess  # noqa: E402
+
+# YOLOv3 at 416x416 has 13x13, 26x26 and 52x52 grids with 3 anchors each
+LAYER_ROWS = (507, 2028, 8112)
+NUM_CLASSES = 80
+
+
+def legacy_postprocess(outs, width, height, conf_threshold=0.5, nms_threshold=0.4):
+    """The per-row loop that used to live in generate_frames() and detect.py"""
+    class_ids = []
+    confidences = []
+    boxes = []
+    for out in outs:
+        for detection in out:
+            scores = detection[5:]
+            class_id = np.argmax(scores)
+            confidence = scores[class_id]
+            if confidence > conf_threshold:
+                center_x = int(detection[0] * width)
+                center_y = int(detection[1] * height)
+                w = int(detection[2] * width)
+                h = int(detection[3] * height)
+                x = center_x - w // 2
+                y = center_y - h // 2
+                boxes.append([x, y, w, h])
+                confidences.append(float(confidence))
+                class_ids.append(class_id)
+
+    indexes = cv2.dnn.NMSBoxes(boxes, confidences, conf_threshold, nms_threshold)
+    kept = []
+    for i in range(len(boxes)):
+        if i in indexes:
+            kept.append(i)
+    return kept
+
+
+def synthetic_outputs(frames, objects_per_frame=8, seed=0):
+    """Build YOLOv3-shaped outputs with a few confident detections per frame"""
+    rng = np.random.default_rng(seed)
+    recorded = []
+    for _ in range(frames):
+        outs = []
+        for rows in LAYER_ROWS:
+            out = np.zeros((rows, 5 + NUM_CLASSES), dtype=np.float32)
+            out[:, :4] = rng.random((rows, 4), dtype=np.float32)
+            out[:, 4] = rng.random(rows, dtype=np.float32) * 0.1
+            out[:, 5:] = rng.random((rows, NUM_CLASSES), dtype=np.float32) * 0.05
+            # Each object fires on a handful of neighbouring cells, as real YOLO output does
+            for row in rng.choice(rows, size=objects_per_frame, replace=False):
+                class_id = rng.integers(NUM_CLASSES)
+                for neighbour in range(row, min(row + 3, rows)):
+                    out[neighbour, :4] = out[row, :4] + rng.normal(0, 0.01, 4)
+                    out[neighbour, 4] = 0.9
+                    out[neighbour, 5 + class_id] = rng.uniform(0.6, 0.99)
+            outs.append(out)
+        recorded.append(outs)
+    return recorded
+
+
+def record_outputs(source, frames):
+    """Run the real model over a video or image and keep the raw output layers"""
+    from model_registry import registry
+
+    model = registry.get()
+    capture = cv2.VideoCapture(source)
+    recorded = []
+    shape = None
+    while len(recorded) < frames:
+        success, frame = capture.read()
+        if not success:
+            if not recorded:
+                raise RuntimeError(f"Could not read any frames from {source}")
+            capture.set(cv2.CAP_PROP_POS_FRAMES, 0)
+            continue
+        shape = frame.shape
+        blob = cv2.dnn.blobFromImage(frame, 0.00392, (416, 416), (0, 0, 0), True, crop=False)
+        recorded.append([out.copy() for out in model.forward(blob)])
+    capture.release()
+    return recorded, shape[1], shape[0]
+
+
+def save_outputs(path, recorded, width, height):
+    arrays = {'width': width, 'height': height, 'frames': len(recorded), 'layers': len(recorded[0])}
+    for f, outs in enumerate(recorded):
+        for layer, out in enumerate(outs):
+            arrays[f'frame{f}_layer{layer}'] = out
+    np.savez_compressed(path, **arrays)
+
+
+def load_outputs(path):
+    data = np.load(path)
+    frames, layers = int(data['frames']), int(data['layers'])
+    recorded = [[data[f'frame{f}_layer{layer}'] for layer in range(layers)] for f in range(frames)]
+    return recorded, int(data['width']), int(data['height'])
+
+
+def time_per_frame(fn, recorded, width, height, repeats):
+    timings = []
+    for _ in range(repeats):
+        for outs in recorded:
+            start = time.perf_counter()
+            fn(outs, width, height)
+            timings.append(time.perf_counter() - start)
+    return np.array(timings) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark YOLO output decoding")
+    parser.add_argument('--outputs', help="Recorded outputs (.npz) to benchmark on")
+    parser.add_argument('--record', help="Video file, image or camera index to record outputs from")
+    parser.add_argument('--save', default='yolo_outputs.npz', help="Where to save recorded outputs")
+    parser.add_argument('--frames', type=int, default=30, help="Frames to record or synthesize")
+    parser.add_argument('--repeats', type=int, default=3, help="Passes over the recorded frames")
+    args = parser.parse_args()
+
+    if args.record is not None:
+        source = int(args.record) if args.record.isdigit() else args.record
+        recorded, width, height = record_outputs(source, args.frames)
+        save_outputs(args.save, recorded, width, height)
+        print(f"Saved {len(recorded)} frames of YOLO outputs to {args.save}")
+    elif args.outputs:
+        recorded, width, height = load_outputs(args.outputs)
+        print(f"Loaded {len(recorded)} recorded frames from {args.outputs}")
+    else:
+        recorded = synthetic_outputs(args.frames)
+        width, height = 640, 480
+        print(f"Using {len(recorded)} synthetic YOLOv3 frames (pass --outputs for recorded data)")
+
+    before = time_per_frame(legacy_postprocess, recorded, width, height, args.repeats)
+    after = time_per_frame(postprocess, recorded, width, height, args.repeats)
+
+    print(f"{'':12}{'mean ms':>10}{'p50 ms':>10}{'p95 ms':>10}")
+    for name, timings in (('loop', before), ('vectorized', after)):
+        print(f"{name:12}{timings.mean():10.2f}{np.percentile(timings, 50):10.2f}"
+              f"{np.percentile(timings, 95):10.2f}")
+    print(f"Speed-up: {before.mean() / after.mean():.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+"""
+Model download benchmark
+Serves a random file from a local HTTP server that honours byte ranges, can
+cap each connection's bandwidth and can drop connections part-way, and times
+scripts/setup.py's downloader against it: the old single urlretrieve, one
+and several parallel ranges, a flaky server, a download killed half-way and
+resumed, and a file that fails its pinned checksum.
+
+    python scripts/bench_download.py --size 64 --throttle 8
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import re
+import shutil
+import signal
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+SCRIPTS = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, SCRIPTS)
+
+import setup as setup_script  # noqa: E402
+
+RANGE = re.compile(r'bytes=(\d+)-(\d*)')
+
+
+class RangeHandler(BaseHTTPRequestHandler):
+    """Serves server.payload at /model.bin with Range support, a per-connection rate cap and drops"""
+
+    def do_GET(self):
+        payload = self.server.payload
+        first, last = 0, len(payload) - 1
+        match = RANGE.fullmatch(self.headers.get('Range', '')) if self.server.ranges else None
+        if match:
+            first = int(match.group(1))
+            last = min(int(match.group(2)), last) if match.group(2) else last
+            self.send_response(206)
+            self.send_header('Content-Range', f'bytes {first}-{last}/{len(payload)}')
+        else:
+            self.send_response(200)
+        self.send_header('Content-Length', str(last - first + 1))
+        self.send_header('ETag', self.server.etag)
+        self.end_headers()
+
+        sent, started = 0, time.perf_counter()
+        view = memoryview(payload)[first:last + 1]
+        while sent < len(view):
+            if self.server.drop_after and sent >= self.server.drop_after:
+                return  # Hang up mid-response, as a flaky connection would
+            chunk = view[sent:sent + 64 * 1024]
+            try:
+                self.wfile.write(chunk)
+            except (BrokenPipeError, ConnectionResetError):
+                return
+            sent += len(chunk)
+            if self.server.throttle:
+                delay = sent / self.server.throttle - (time.perf_counter() - started)
+                if delay > 0:
+                    time.sleep(delay)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_server(payload, throttle, ranges=True, drop_after=0):
+    server = ThreadingHTTPServer(('127.0.0.1', 0), RangeHandler)
+    server.daemon_threads = True
+    server.payload = payload
+    server.etag = '"%s"' % hashlib.sha256(payload).hexdigest()[:16]
+    server.throttle = throttle
+    server.ranges = ranges
+    server.drop_after = drop_after
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f'http://127.0.0.1:{server.server_address[1]}/model.bin'
+
+
+def timed(function):
+    start = time.perf_counter()
+    result = function()
+    return result, round(time.perf_counter() - start, 2)
+
+
+def fresh(directory):
+    for name in os.listdir(directory):
+        os.remove(os.path.join(directory, name))
+    return os.path.join(directory, 'model.bin')
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the setup downloader against a local range server")
+    parser.add_argument('--size', type=int, default=64, help="Payload size in MB")
+    parser.add_argument('--throttle', type=float, default=8, help="Per-connection cap in MB/s (0 = none)")
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--output', help="Write results as JSON to this path")
+    args = parser.parse_args()
+
+    payload = os.urandom(args.size * 1024 * 1024)
+    digest = hashlib.sha256(payload).hexdigest()
+    throttle = args.throttle * 1024 * 1024
+    directory = tempfile.mkdtemp(prefix='voas-download-')
+    results = {}
+    # Small ranges so a modest payload still splits across every worker
+    setup_script.MIN_PART_SIZE = 1024 * 1024
+
+    server, url = start_server(payload, throttle)
+    target = fresh(directory)
+    _, results['urlretrieve_s'] = timed(lambda: urllib.request.urlretrieve(url, target))
+    for workers in sorted({1, args.workers}):
+        target = fresh(directory)
+        ok, seconds = timed(lambda: setup_script.download_file(url, target, 'payload', len(payload), digest, workers))
+        results[f'ranged_{workers}_workers_s'] = seconds
+        assert ok and setup_script.sha256_file(target) == digest
+    server.shutdown()
+
+    # Every response is cut off after 4 MB; retries carry each range on from where it stopped
+    server, url = start_server(payload, throttle, drop_after=4 * 1024 * 1024)
+    target = fresh(directory)
+    ok, results['flaky_server_s'] = timed(
+        lambda: setup_script.download_file(url, target, 'payload', len(payload), digest, args.workers))
+    results['flaky_server_ok'] = ok and setup_script.sha256_file(target) == digest
+    server.shutdown()
+
+    # Killed half-way through, then run again: only the missing bytes are fetched
+    server, url = start_server(payload, throttle)
+    target = fresh(directory)
+    manifest = os.path.join(tempfile.mkdtemp(prefix='voas-manifest-'), 'models.json')
+    with open(manifest, 'w') as f:
+        json.dump([{'url': url, 'filename': 'model.bin', 'description': 'payload', 'size': len(payload),
+                    'sha256': digest}], f)
+    command = [sys.executable, os.path.join(SCRIPTS, 'setup.py'), '--models-only', '--manifest', manifest,
+               '--workers', str(args.workers)]
+    env = dict(os.environ, MODEL_CACHE_DIR=directory + '-cache')
+    process = subprocess.Popen(command, cwd=directory, env=env, stdout=subprocess.DEVNULL)
+    saved = 0
+    while saved < len(payload) // 4 and process.poll() is None:
+        time.sleep(0.05)
+        try:
+            with open(target + '.part.json') as f:
+                saved = sum(part[2] for part in json.load(f)['parts'])
+        except (OSError, ValueError):
+            pass  # Not written yet, or caught mid-replace
+    process.send_signal(signal.SIGKILL)
+    process.wait()
+    with open(target + '.part.json') as f:
+        saved = sum(part[2] for part in json.load(f)['parts'])
+    output, results['resumed_s'] = timed(lambda: subprocess.run(command, cwd=directory, env=env, capture_output=True,
+                                                                text=True).stdout)
+    results['resumed_from_mb'] = round(saved / (1024 * 1024), 1)
+    results['resumed_ok'] = 'Resuming at' in output and setup_script.sha256_file(target) == digest
+    server.shutdown()
+    shutil.rmtree(directory + '-cache', ignore_errors=True)
+
+    # A pinned checksum that does not match: the download fails and leaves nothing behind
+    server, url = start_server(payload, 0)
+    target = fresh(directory)
+    ok = setup_script.download_file(url, target, 'payload', len(payload), '0' * 64, args.workers)
+    results['bad_checksum_rejected'] = not ok and not os.listdir(directory)
+    server.shutdown()
+
+    # A server without byte ranges still works, as one stream
+    server, url = start_server(payload, 0, ranges=False)
+    target = fresh(directory)
+    ok = setup_script.download_file(url, target, 'payload', len(payload), digest, args.workers)
+    results['no_ranges_ok'] = ok and setup_script.sha256_file(target) == digest
+    server.shutdown()
+    shutil.rmtree(directory)
+
+    print(f"\n{args.size} MB payload, {args.throttle} MB/s per connection")
+    for name, value in results.items():
+        print(f"  {name:24} {value}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'size_mb': args.size, 'throttle_mb_s': args.throttle, 'results': results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Emergency medical summary latency benchmark
+Seeds databases of increasing size and times, for random users, what
+looking up one user's record cost before (view_medical loading the whole
+table), the summary query on a cache miss and a cache hit. Summary
+latency should stay flat as the table grows.
+
+    python scripts/bench_medical_summary.py --directory /tmp --sizes 1000 10000 100000
+"""
+
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import time
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import database  # noqa: E402
+import medical_summary  # noqa: E402
+from app import Medical  # noqa: E402
+from seed_db import seed  # noqa: E402
+
+
+def timed_us(function, arguments):
+    """Median and p99 microseconds of function over arguments"""
+    samples = []
+    for argument in arguments:
+        start = time.perf_counter()
+        function(argument)
+        samples.append((time.perf_counter() - start) * 1e6)
+    samples.sort()
+    return {'median_us': round(statistics.median(samples), 1),
+            'p99_us': round(samples[min(int(len(samples) * 0.99), len(samples) - 1)], 1)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time emergency medical summary lookups as the table grows")
+    parser.add_argument('--directory', default='/tmp', help="Where to create the scratch databases")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000])
+    parser.add_argument('--lookups', type=int, default=2000)
+    parser.add_argument('--legacy-lookups', type=int, default=5, help="Full-table loads per size (they are slow)")
+    parser.add_argument('--output', help="Write results as JSON to this path")
+    args = parser.parse_args()
+
+    results = {}
+    for size in args.sizes:
+        path = os.path.join(args.directory, f'voas-summary-{size}.db')
+        uri = f'sqlite:///{path}'
+        if not os.path.exists(path):
+            print(f"Seeding {size} users into {path}...")
+            seed(create_engine(uri), size)
+        engine = create_engine(uri, **database.engine_options(uri))
+        database.install_sqlite_pragmas(engine)
+        rng = random.Random(size)
+        user_ids = [rng.randint(1, size) for _ in range(args.lookups)]
+
+        with Session(engine) as session:
+            def legacy(user_id):
+                # view_medical() before pagination: every record, then find the user's
+                [record for record in session.query(Medical).all() if record.user_id == user_id]
+                session.expunge_all()
+
+            def miss(user_id):
+                medical_summary.load_summary(session, Medical, user_id)
+                session.expunge_all()
+
+            cache = medical_summary.SummaryCache(max_entries=size, ttl=0)
+            for user_id in set(user_ids):
+                cache.put(user_id, medical_summary.load_summary(session, Medical, user_id))
+            session.expunge_all()
+
+            results[size] = {
+                'legacy_full_table': timed_us(legacy, user_ids[:args.legacy_lookups]),
+                'summary_query': timed_us(miss, user_ids),
+                'summary_cached': timed_us(lambda user_id: cache.get(user_id, None), user_ids),
+            }
+        engine.dispose()
+
+        print(f"\n{size} users")
+        for name, stats in results[size].items():
+            print(f"  {name:20} median {stats['median_us']:12.1f} us  p99 {stats['p99_us']:12.1f} us")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'lookups': args.lookups, 'results': results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""
+YOLO model load benchmark
+Times each part of getting a network ready in fresh interpreters, with the
+page cache cold (when this user may drop it) and warm: checksumming the files
+with and without the manifest, readNetFromDarknet from the file paths and
+from memory-mapped buffers, and the registry's full load including the
+warm-up forward pass, with Winograd convolutions on and off.
+
+    python scripts/bench_model_load.py --runs 3
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+
+from config import Config  # noqa: E402
+
+READ_SCENARIOS = ('path', 'buffer')
+REGISTRY_SCENARIOS = ('winograd', 'no-winograd')
+
+
+def drop_page_cache():
+    """Drop the OS page cache (Linux, root only); returns False if not allowed"""
+    try:
+        os.sync()
+        with open('/proc/sys/vm/drop_caches', 'w') as f:
+            f.write('3\n')
+        return True
+    except OSError:
+        return False
+
+
+def child(scenario, cfg_path, weights_path):
+    """Run one scenario in this (fresh) interpreter and print its measurements as JSON"""
+    import cv2
+    import numpy as np
+
+    from model_registry import registry
+
+    result = {}
+    start = time.perf_counter()
+    if scenario == 'buffer':
+        cfg = np.fromfile(cfg_path, dtype=np.uint8)
+        weights = np.memmap(weights_path, dtype=np.uint8, mode='r')
+        cv2.dnn.readNetFromDarknet(cfg, weights)
+    elif scenario in REGISTRY_SCENARIOS:
+        model = registry.get(cfg_path=cfg_path, weights_path=weights_path)
+        result['warmup_s'] = model.warmup_seconds
+        result['rss_delta_mb'] = model.rss_delta_mb
+    else:
+        cv2.dnn.readNetFromDarknet(cfg_path, weights_path)
+    result['load_s'] = time.perf_counter() - start
+    print(json.dumps(result))
+
+
+def run(scenario, args, env):
+    command = [sys.executable, os.path.abspath(__file__), '--child', scenario, '--config', args.config,
+               '--weights', args.weights]
+    output = subprocess.run(command, cwd=ROOT, env=env, capture_output=True, text=True, check=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def median(runs, key):
+    return round(statistics.median(r[key] for r in runs), 3)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time YOLO model loading with a cold and a warm page cache")
+    parser.add_argument('--config', default=Config.YOLO_CONFIG_PATH)
+    parser.add_argument('--weights', default=Config.YOLO_WEIGHTS_PATH)
+    parser.add_argument('--runs', type=int, default=3)
+    parser.add_argument('--skip-registry', action='store_true', help="Skip the full load with warm-up (slow)")
+    parser.add_argument('--output', help="Write results as JSON to this path")
+    parser.add_argument('--child', choices=READ_SCENARIOS + REGISTRY_SCENARIOS, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child(args.child, args.config, args.weights)
+        return
+
+    import model_cache
+
+    cache_dir = tempfile.mkdtemp(prefix='voas-model-cache-')
+    env = dict(os.environ, MODEL_CACHE_DIR=cache_dir)
+    can_drop = drop_page_cache()
+    results = {'cold_cache': can_drop, 'checksum': {}, 'read': {}, 'registry': {}}
+
+    start = time.perf_counter()
+    model_cache.model_key(args.config, args.weights, cache_dir)
+    results['checksum']['hashed_s'] = round(time.perf_counter() - start, 3)
+    start = time.perf_counter()
+    model_cache.model_key(args.config, args.weights, cache_dir)
+    results['checksum']['manifest_s'] = round(time.perf_counter() - start, 6)
+
+    for scenario in READ_SCENARIOS:
+        timings = {}
+        for cache_state in (('cold', 'warm') if can_drop else ('warm',)):
+            runs = []
+            for _ in range(args.runs):
+                if cache_state == 'cold':
+                    drop_page_cache()
+                runs.append(run(scenario, args, env))
+            timings[f'{cache_state}_s'] = median(runs, 'load_s')
+        results['read'][scenario] = timings
+
+    if not args.skip_registry:
+        for scenario in REGISTRY_SCENARIOS:
+            if can_drop:
+                drop_page_cache()
+            scenario_env = dict(env, MODEL_WINOGRAD='true' if scenario == 'winograd' else 'false')
+            registry_run = run(scenario, args, scenario_env)
+            results['registry'][scenario] = {key: round(value, 3) for key, value in registry_run.items()}
+
+    print(f"\nchecksum of {os.path.basename(args.weights)}: hashed {results['checksum']['hashed_s']} s, "
+          f"from manifest {results['checksum']['manifest_s'] * 1000:.2f} ms")
+    if not can_drop:
+        print("(cannot drop the page cache as this user: warm cache only)")
+    print(f"readNetFromDarknet, median of {args.runs} fresh processes:")
+    for scenario, timings in results['read'].items():
+        print(f"  {scenario:10} " + '  '.join(f"{state} {value:.3f}" for state, value in timings.items()))
+    for scenario, timings in results['registry'].items():
+        print(f"registry load, {scenario}: {timings['load_s']} s, of which warm-up forward {timings['warmup_s']} s, "
+              f"+{timings['rss_delta_mb']} MB RSS")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
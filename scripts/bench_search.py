@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+Full-text search benchmark
+Times the first page of admin search results from the FTS5 index against
+the LIKE '%word%' scan it replaces, on seeded databases of several sizes,
+for common and rare words over users and medical records. Also reports the
+one-off index build and what the sync triggers add to bulk inserts.
+
+    python scripts/bench_search.py --directory /tmp --sizes 10000 100000
+"""
+
+import argparse
+import json
+import os
+import shutil
+import statistics
+import sys
+import time
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import database  # noqa: E402
+import search_index  # noqa: E402
+from app import Medical, Users  # noqa: E402
+from listings import paginate  # noqa: E402
+from seed_db import seed  # noqa: E402
+
+QUERIES = [
+    ('users', 'Patel'),              # a common last name
+    ('users', 'Asha Pat'),           # first name plus a last name prefix
+    ('users', 'user0004217'),        # one username
+    ('users', '900004'),             # a phone number prefix
+    ('medical', 'Glauc'),            # a condition prefix
+    ('medical', 'Penicillin Metformin'),
+]
+
+
+def timed(function, repeats):
+    samples = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        function()
+        samples.append((time.perf_counter() - start) * 1000)
+    return round(statistics.median(samples), 3)
+
+
+def make_engine(path):
+    uri = f'sqlite:///{path}'
+    engine = create_engine(uri, **database.engine_options(uri))
+    database.install_sqlite_pragmas(engine)
+    return engine
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark FTS5 admin search against LIKE scans")
+    parser.add_argument('--directory', default='/tmp', help="Where to create the scratch databases")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000])
+    parser.add_argument('--repeats', type=int, default=5)
+    parser.add_argument('--limit', type=int, default=50)
+    parser.add_argument('--insert-rows', type=int, default=5000, help="Rows for the trigger overhead timing")
+    parser.add_argument('--output', help="Write results as JSON to this path")
+    args = parser.parse_args()
+
+    results = {}
+    for size in args.sizes:
+        source = os.path.join(args.directory, f'voas-search-{size}.db')
+        if not os.path.exists(source):
+            print(f"Seeding {size} users into {source}...")
+            seed(create_engine(f'sqlite:///{source}'), size)
+        path = source + '.fts'
+        for suffix in ('', '-wal', '-shm'):
+            if os.path.exists(path + suffix):
+                os.remove(path + suffix)
+        shutil.copyfile(source, path)
+
+        engine = make_engine(path)
+        start = time.perf_counter()
+        search_index.ensure(engine)
+        size_results = {'index_build_ms': round((time.perf_counter() - start) * 1000, 1), 'queries': {}}
+
+        with Session(engine) as session:
+            for kind, words in QUERIES:
+                model = Users if kind == 'users' else Medical
+                columns = [getattr(model, column) for column in search_index.INDEXES[kind]['columns']]
+
+                def fts():
+                    page = search_index.search(session, model, kind, words, limit=args.limit)
+                    session.expunge_all()
+                    return page
+
+                def like():
+                    page = paginate(session.query(model).filter(search_index.like_filter(columns, words)),
+                                    {'id': model.id}, model.id, limit=args.limit)
+                    session.expunge_all()
+                    return page
+
+                size_results['queries'][f'{kind}: {words}'] = {
+                    'fts_ms': timed(fts, args.repeats),
+                    'like_ms': timed(like, args.repeats),
+                    'fts_rows': len(fts()),
+                    'like_rows': len(like()),
+                }
+
+        # What the triggers add to writes: the same rows into an indexed and a plain copy
+        for label, indexed in (('plain', False), ('indexed', True)):
+            copy = f'{source}.{label}'
+            for suffix in ('', '-wal', '-shm'):
+                if os.path.exists(copy + suffix):
+                    os.remove(copy + suffix)
+            shutil.copyfile(source, copy)
+            copy_engine = make_engine(copy)
+            if indexed:
+                search_index.ensure(copy_engine)
+            size_results[f'insert_{args.insert_rows}_users_{label}_s'] = round(seed(copy_engine, args.insert_rows), 3)
+            copy_engine.dispose()
+        engine.dispose()
+        results[size] = size_results
+
+        print(f"\n{size} users (index build {size_results['index_build_ms']} ms)")
+        print(f"  {'query':36} {'fts ms':>9} {'like ms':>9} {'rows':>6}")
+        for name, timing in size_results['queries'].items():
+            print(f"  {name:36} {timing['fts_ms']:9.2f} {timing['like_ms']:9.2f} {timing['fts_rows']:6d}")
+        print(f"  insert {args.insert_rows} users: plain {size_results[f'insert_{args.insert_rows}_users_plain_s']} s, "
+              f"with search triggers {size_results[f'insert_{args.insert_rows}_users_indexed_s']} s")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'limit': args.limit, 'results': results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Web worker startup benchmark
+Starts fresh interpreters that import the app and serve the login page and
+the admin pages, and reports import time, time to the first response,
+resident memory and whether OpenCV/NumPy were loaded. The detection scenario
+then also imports the detection stack (and the model, with --load-model), to
+show what a worker pays once it actually serves detection.
+
+    python scripts/bench_startup.py --runs 5
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+SCENARIOS = ('admin', 'detection')
+
+
+def child(scenario, load_model):
+    """Run one scenario in this (fresh) interpreter and print its measurements as JSON"""
+    sys.path.insert(0, ROOT)
+    start = time.perf_counter()
+    import app as web  # noqa: E402
+    import sysinfo  # noqa: E402
+    result = {'import_s': time.perf_counter() - start}
+
+    client = web.app.test_client()
+    client.get('/login')
+    result['first_response_s'] = time.perf_counter() - start
+    with client.session_transaction() as session:
+        session['user_id'] = 1
+        session['user_type'] = 'admin'
+    for url in ('/admin_home', '/users'):
+        client.get(url)
+
+    if scenario == 'detection':
+        import detection  # noqa: E402
+        result['stack_load_s'] = detection.stack().load_seconds
+        if load_model:
+            from model_registry import detector_profiles  # noqa: E402
+            if detector_profiles.files_present():
+                detector_profiles.active()
+    result['total_s'] = time.perf_counter() - start
+    result['rss_mb'] = sysinfo.current_rss_mb()
+    result['cv2_loaded'] = 'cv2' in sys.modules
+    result['numpy_loaded'] = 'numpy' in sys.modules
+    print(json.dumps(result))
+
+
+def run(scenario, load_model, env):
+    command = [sys.executable, os.path.abspath(__file__), '--child', scenario]
+    if load_model:
+        command.append('--load-model')
+    output = subprocess.run(command, cwd=ROOT, env=env, capture_output=True, text=True, check=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time web worker startup with and without the detection stack")
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--load-model', action='store_true', help="Also load the active YOLO model in the detection scenario")
+    parser.add_argument('--database', default='/tmp/voas-startup.db', help="Scratch database (the app creates its tables on import)")
+    parser.add_argument('--output', help="Write results as JSON to this path")
+    parser.add_argument('--child', choices=SCENARIOS, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child(args.child, args.load_model)
+        return
+
+    env = dict(os.environ, DATABASE_URL=f'sqlite:///{args.database}')
+    subprocess.run([sys.executable, '-c', 'from app import app, db\nwith app.app_context(): db.create_all()'],
+                   cwd=ROOT, env=env, check=True)
+    results = {}
+    for scenario in SCENARIOS:
+        runs = [run(scenario, args.load_model, env) for _ in range(args.runs)]
+        summary = {key: round(statistics.median(r[key] for r in runs), 3)
+                   for key in runs[0] if not key.endswith('_loaded')}
+        summary['cv2_loaded'] = runs[0]['cv2_loaded']
+        summary['numpy_loaded'] = runs[0]['numpy_loaded']
+        results[scenario] = summary
+
+        print(f"\n{scenario} ({args.runs} runs, medians)")
+        for key, value in summary.items():
+            print(f"  {key:18} {value}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'runs': args.runs, 'results': results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,330 @@
+#!/usr/bin/env python3
+"""
+Offline detection pipeline benchmark
+Replays a video file or a directory of images through the same detection
+code the web stream uses, without a camera or audio device, and reports
+per-stage timings, throughput, latency percentiles and peak RSS.
+--trace-alloc adds per-frame allocation figures (tracemalloc) and garbage
+collector pauses (gc.callbacks); --no-reuse runs the old allocate-per-frame
+path for comparison.
+
+    python scripts/benchmark.py --source clip.mp4 --profile yolov3-416 --output results/416.json
+    python scripts/benchmark.py --source frames/ --profile yolov3-tiny-320 --compare results/416.json
+    python scripts/benchmark.py --source clip.mp4 --trace-alloc --frames 1000
+"""
+
+import argparse
+import gc
+import glob
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+
+import cv2
+import numpy as np
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+
+from config import Config  # noqa: E402
+from frame_buffers import FrameBuffers  # noqa: E402
+from model_registry import registry  # noqa: E402
+from pipeline import AlertPolicy, build_detections, draw_detections, make_detection  # noqa: E402
+from speech import SpeechWorker  # noqa: E402
+from stream_encoder import ChunkEncoder, quality_levels  # noqa: E402
+from sysinfo import peak_rss_mb  # noqa: E402
+from tracker import IouTracker, KeyframeScheduler  # noqa: E402
+from yolo_postprocess import batched_nms, decode_outputs  # noqa: E402
+
+STAGES = ('capture', 'blob', 'forward', 'decode', 'nms', 'track', 'draw', 'encode', 'tts_enqueue')
+IMAGE_EXTENSIONS = ('*.jpg', '*.jpeg', '*.png', '*.bmp')
+
+
+def frame_source(source, frames):
+    """Yield (frame, capture seconds) from a video file or an image directory, looping if needed"""
+    if os.path.isdir(source):
+        paths = sorted(path for pattern in IMAGE_EXTENSIONS for path in glob.glob(os.path.join(source, pattern)))
+        if not paths:
+            raise RuntimeError(f"No images found in {source}")
+        for index in range(frames):
+            start = time.perf_counter()
+            frame = cv2.imread(paths[index % len(paths)])
+            yield frame, time.perf_counter() - start
+        return
+
+    capture = cv2.VideoCapture(source)
+    if not capture.isOpened():
+        raise RuntimeError(f"Unable to open {source}")
+    produced = 0
+    try:
+        while produced < frames:
+            start = time.perf_counter()
+            success, frame = capture.read()
+            if not success:
+                if produced == 0:
+                    raise RuntimeError(f"Could not read any frames from {source}")
+                capture.set(cv2.CAP_PROP_POS_FRAMES, 0)
+                continue
+            produced += 1
+            yield frame, time.perf_counter() - start
+    finally:
+        capture.release()
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT,
+                                       stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def summarize(samples):
+    """Percentiles in milliseconds for a list of durations in seconds"""
+    if not samples:
+        return {'count': 0}
+    values = np.array(samples) * 1000
+    return {
+        'count': len(values),
+        'mean_ms': round(float(values.mean()), 3),
+        'p50_ms': round(float(np.percentile(values, 50)), 3),
+        'p95_ms': round(float(np.percentile(values, 95)), 3),
+        'p99_ms': round(float(np.percentile(values, 99)), 3),
+    }
+
+
+class GcPauses:
+    """Times every garbage collection through gc.callbacks"""
+
+    def __init__(self):
+        self.pauses = {0: [], 1: [], 2: []}
+        self._start = None
+
+    def __call__(self, phase, info):
+        if phase == 'start':
+            self._start = time.perf_counter()
+        elif self._start is not None:
+            self.pauses[info['generation']].append(time.perf_counter() - self._start)
+            self._start = None
+
+    def summary(self, frames):
+        all_pauses = [pause for pauses in self.pauses.values() for pause in pauses]
+        return {
+            'collections': {str(generation): len(pauses) for generation, pauses in self.pauses.items()},
+            'collections_per_1000_frames': round(len(all_pauses) * 1000 / frames, 1) if frames else 0.0,
+            'total_pause_ms': round(sum(all_pauses) * 1000, 3),
+            'max_pause_ms': round(max(all_pauses, default=0.0) * 1000, 3),
+        }
+
+
+def run(args):
+    profile = Config.DETECTOR_PROFILES[args.profile]
+    load_start = time.perf_counter()
+    model = registry.get(cfg_path=profile['config'], weights_path=profile['weights'],
+                         classes_path=Config.YOLO_CLASSES_PATH, input_size=profile['input_size'])
+    load_seconds = time.perf_counter() - load_start
+    size = model.input_size
+
+    # The speech worker is never started: alerts are queued exactly as in the stream but never spoken
+    alerts = AlertPolicy(SpeechWorker())
+    tracker = IouTracker()
+    keyframes = KeyframeScheduler(args.keyframe_interval, adaptive=args.adaptive_keyframes)
+    # Encode at the level a viewer that keeps up with the stream gets
+    jpeg_quality, scale = quality_levels()[0]
+    buffers = None if args.no_reuse else FrameBuffers()
+    encoder = ChunkEncoder()
+    outputs = None
+
+    if args.gc_freeze:
+        # Move everything allocated during start-up out of the collector's generations
+        gc.collect()
+        gc.freeze()
+    gc_pauses = None
+    allocated = []
+    if args.trace_alloc:
+        gc_pauses = GcPauses()
+        gc.callbacks.append(gc_pauses)
+
+    timings = {stage: [] for stage in STAGES}
+    latencies = []
+    keyframe_count = 0
+
+    for index, (frame, capture_seconds) in enumerate(frame_source(args.source, args.frames + args.warmup)):
+        frame_start = time.perf_counter() - capture_seconds
+        measured = index >= args.warmup
+        stage_times = {'capture': capture_seconds}
+        if args.trace_alloc and index == args.warmup:
+            tracemalloc.start()
+            gc_pauses.pauses = {0: [], 1: [], 2: []}
+            retained_start = tracemalloc.get_traced_memory()[0]
+        if args.trace_alloc and measured:
+            frame_base = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+
+        if keyframes.is_keyframe():
+            keyframe_count += measured
+            height, width = frame.shape[:2]
+            start = time.perf_counter()
+            if buffers is None:
+                blob = cv2.dnn.blobFromImage(frame, 0.00392, (size, size), (0, 0, 0), True, crop=False)
+            else:
+                blob = buffers.blob.fill([frame], size)
+            stage_times['blob'] = time.perf_counter() - start
+
+            start = time.perf_counter()
+            outs = model.forward(blob, outputs)
+            if buffers is not None:
+                outputs = list(outs)
+            stage_times['forward'] = time.perf_counter() - start
+
+            start = time.perf_counter()
+            boxes, confidences, class_ids = decode_outputs(outs, width, height, profile['confidence'],
+                                                           buffers.decode if buffers is not None else None)
+            stage_times['decode'] = time.perf_counter() - start
+
+            start = time.perf_counter()
+            keep = batched_nms(boxes, confidences, class_ids, profile['confidence'], profile['nms'])
+            stage_times['nms'] = time.perf_counter() - start
+
+            start = time.perf_counter()
+            detections = tracker.update(build_detections(boxes[keep], confidences[keep], class_ids[keep],
+                                                         model.classes))
+            keyframes.adjust(detections, tracker)
+            stage_times['track'] = time.perf_counter() - start
+        else:
+            start = time.perf_counter()
+            detections = tracker.predict(make_detection)
+            stage_times['track'] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        alerts.announce(alerts.update(detections, time.monotonic()))
+        stage_times['tts_enqueue'] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        draw_detections(frame, detections, model.colors)
+        stage_times['draw'] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        encoder.encode(frame, jpeg_quality, scale)
+        stage_times['encode'] = time.perf_counter() - start
+
+        if args.trace_alloc and measured:
+            current, peak = tracemalloc.get_traced_memory()
+            # Peak above the frame's starting point: the transient memory this frame churned through
+            allocated.append(peak - frame_base)
+
+        if measured:
+            if index == args.warmup:
+                run_start = frame_start
+            latencies.append(time.perf_counter() - frame_start)
+            for stage, seconds in stage_times.items():
+                timings[stage].append(seconds)
+
+    elapsed = time.perf_counter() - run_start
+    allocations = None
+    if args.trace_alloc:
+        retained = tracemalloc.get_traced_memory()[0] - retained_start
+        tracemalloc.stop()
+        gc.callbacks.remove(gc_pauses)
+        values = np.array(allocated, dtype=np.float64) / 1024
+        allocations = {
+            'transient_kb_per_frame': {
+                'mean': round(float(values.mean()), 1),
+                'p50': round(float(np.percentile(values, 50)), 1),
+                'p99': round(float(np.percentile(values, 99)), 1),
+            },
+            'retained_kb': round(retained / 1024, 1),
+            'gc': gc_pauses.summary(len(allocated)),
+        }
+
+    return {
+        'meta': {
+            'commit': git_commit(),
+            'profile': args.profile,
+            'input_size': size,
+            'source': args.source,
+            'frames': len(latencies),
+            'keyframes': keyframe_count,
+            'keyframe_interval': args.keyframe_interval,
+            'adaptive_keyframes': args.adaptive_keyframes,
+            'reuse_buffers': not args.no_reuse,
+            'gc_freeze': args.gc_freeze,
+            'opencv': cv2.__version__,
+            'python': platform.python_version(),
+            'machine': platform.machine(),
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        },
+        'model_load_seconds': round(load_seconds, 3),
+        'throughput_fps': round(len(latencies) / elapsed, 2) if elapsed > 0 else 0.0,
+        'latency': summarize(latencies),
+        'stages': {stage: summarize(samples) for stage, samples in timings.items()},
+        'peak_rss_mb': round(peak_rss_mb(), 1),
+        'allocations': allocations,
+    }
+
+
+def print_report(results, baseline=None):
+    meta = results['meta']
+    print(f"Profile {meta['profile']} ({meta['input_size']}x{meta['input_size']}), {meta['frames']} frames, "
+          f"{meta['keyframes']} keyframes, commit {meta['commit']}")
+    print(f"{'stage':14}{'mean ms':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}" + (f"{'vs base':>10}" if baseline else ''))
+    rows = list(results['stages'].items()) + [('end-to-end', results['latency'])]
+    for stage, stats in rows:
+        if not stats.get('count'):
+            continue
+        line = f"{stage:14}{stats['mean_ms']:10.2f}{stats['p50_ms']:10.2f}{stats['p95_ms']:10.2f}{stats['p99_ms']:10.2f}"
+        if baseline:
+            base = baseline['latency'] if stage == 'end-to-end' else baseline['stages'].get(stage, {})
+            if base.get('count'):
+                line += f"{(stats['mean_ms'] / base['mean_ms'] - 1) * 100 if base['mean_ms'] else 0:+9.1f}%"
+        print(line)
+    print(f"Throughput: {results['throughput_fps']:.2f} FPS, peak RSS {results['peak_rss_mb']:.1f} MB")
+    allocations = results.get('allocations')
+    if allocations:
+        transient = allocations['transient_kb_per_frame']
+        gc_stats = allocations['gc']
+        print(f"Allocations: {transient['mean']:.1f} KB/frame mean, {transient['p99']:.1f} KB p99, "
+              f"{allocations['retained_kb']:.1f} KB retained over the run")
+        print(f"GC: {gc_stats['collections']} collections, {gc_stats['total_pause_ms']:.2f} ms total, "
+              f"{gc_stats['max_pause_ms']:.2f} ms max pause")
+    if baseline:
+        print(f"Baseline throughput: {baseline['throughput_fps']:.2f} FPS "
+              f"({baseline['meta']['profile']} @ {baseline['meta']['commit']})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the detection pipeline on recorded input")
+    parser.add_argument('--source', required=True, help="Video file or directory of images")
+    parser.add_argument('--profile', default=Config.DETECTOR_PROFILE, choices=sorted(Config.DETECTOR_PROFILES))
+    parser.add_argument('--frames', type=int, default=200, help="Frames to measure (the source loops)")
+    parser.add_argument('--warmup', type=int, default=5, help="Frames to run before measuring")
+    parser.add_argument('--keyframe-interval', type=int, default=1, help="Run YOLO every N frames")
+    parser.add_argument('--adaptive-keyframes', action='store_true', help="Let the keyframe interval adapt")
+    parser.add_argument('--trace-alloc', action='store_true',
+                        help="Measure per-frame allocations with tracemalloc and GC pauses (slows the run)")
+    parser.add_argument('--no-reuse', action='store_true', help="Allocate blobs and outputs per frame")
+    parser.add_argument('--gc-freeze', action='store_true', help="gc.freeze() after start-up before measuring")
+    parser.add_argument('--output', help="Write results as JSON to this path")
+    parser.add_argument('--compare', help="Earlier JSON results to compare against")
+    args = parser.parse_args()
+
+    results = run(args)
+    baseline = None
+    if args.compare:
+        with open(args.compare, 'r') as f:
+            baseline = json.load(f)
+    print_report(results, baseline)
+
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+"""
+Bulk import and export from the command line
+The same code as the admin Bulk Import page and export links, for files too
+large to upload in one request: password hashing alone takes about 0.1 s per
+user per core. Uses DATABASE_URL like the app.
+
+    python scripts/bulk_transfer.py import users clinic_users.csv
+    python scripts/bulk_transfer.py import medical clinic_medical.jsonl --dry-run
+    python scripts/bulk_transfer.py export users users.jsonl
+"""
+
+import argparse
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import bulk_io  # noqa: E402
+from app import app, db, Medical, Users  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Import or export users and medical records as CSV/JSONL")
+    parser.add_argument('action', choices=('import', 'export'))
+    parser.add_argument('kind', choices=('users', 'medical'))
+    parser.add_argument('path', help="File to read or write; '-' for stdin/stdout")
+    parser.add_argument('--format', choices=bulk_io.FORMATS, help="Default: from the file extension")
+    parser.add_argument('--dry-run', action='store_true', help="Validate and check duplicates without inserting")
+    parser.add_argument('--workers', type=int, help="Password hashing threads")
+    args = parser.parse_args()
+
+    fmt = bulk_io.detect_format(args.path, args.format)
+    if fmt is None:
+        parser.error("cannot tell the format from the file name; pass --format")
+
+    with app.app_context():
+        if args.action == 'export':
+            model, fields = (Users, bulk_io.USER_EXPORT_FIELDS) if args.kind == 'users' else \
+                (Medical, bulk_io.MEDICAL_EXPORT_FIELDS)
+            out = sys.stdout if args.path == '-' else open(args.path, 'w', encoding='utf-8', newline='')
+            try:
+                for text in bulk_io.export_stream(db.engine, model, fields, fmt):
+                    out.write(text)
+            finally:
+                if out is not sys.stdout:
+                    out.close()
+            return
+
+        stream = sys.stdin.buffer if args.path == '-' else open(args.path, 'rb')
+        try:
+            if args.kind == 'users':
+                report = bulk_io.import_users(db.session, Users, stream, fmt, args.dry_run, workers=args.workers)
+            else:
+                report = bulk_io.import_medical(db.session, Medical, Users, stream, fmt, args.dry_run)
+        finally:
+            if stream is not sys.stdin.buffer:
+                stream.close()
+    print(json.dumps(report.as_dict(), indent=2))
+    return 1 if report.error_count else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,219 @@
+#!/usr/bin/env python3
+"""
+Concurrent read/write load test for the database settings
+Runs registrations (duplicate check + insert), medical record updates and
+admin page reads (first page + stats) from several processes with several
+threads each, like a multi-worker deployment, first with
+a plain create_engine() - what app.py used before - and then with the
+engine options and pragmas from database.py, each on a fresh copy of the
+same seeded SQLite file. Reports throughput, error rate and latency.
+
+    python scripts/db_load_test.py --database /tmp/voas-load.db --processes 4 --writers 4 --readers 4 --seconds 10
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import random
+import shutil
+import statistics
+import sys
+import threading
+import time
+
+from sqlalchemy import create_engine, func, or_
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import sessionmaker
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import database  # noqa: E402
+from app import db, Medical, Users, USER_SORTS  # noqa: E402
+from listings import paginate  # noqa: E402
+from seed_db import seed  # noqa: E402
+
+
+class Results:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latencies = {}
+        self.errors = {}
+
+    def record(self, kind, seconds, error=None):
+        with self.lock:
+            if error is None:
+                self.latencies.setdefault(kind, []).append(seconds)
+            else:
+                key = f'{kind}: {error}'
+                self.errors[key] = self.errors.get(key, 0) + 1
+
+
+def register(session, rng, password_hash):
+    """What /register/ does: a duplicate check, then an insert and commit"""
+    index = rng.randrange(10 ** 9)
+    username, email, phone = f'load{index}', f'load{index}@example.com', f'7{index:09d}'
+    existing = session.query(Users).filter(
+        or_(Users.email == email, Users.phone == phone, Users.username == username)).first()
+    if existing is None:
+        session.add(Users(username=username, uname='Load', lname='Test', email=email, date='2000-01-01',
+                          address='1 Test Road', phone=phone, pass1=password_hash))
+    session.commit()
+
+
+def update_medical(session, rng, medical_count):
+    """What /update_medical/<id> does: load a record, change it, commit"""
+    record = session.get(Medical, rng.randint(1, medical_count))
+    if record is not None:
+        record.medications = rng.choice(('None', 'Metformin', 'Aspirin', 'Insulin'))
+        record.blood_pressure = f'{rng.randint(100, 150)}/{rng.randint(60, 95)}'
+    session.commit()
+
+
+def admin_read(session):
+    """What /users does: the first page plus the stats query"""
+    paginate(session.query(Users), USER_SORTS, Users.id, sort='lname')
+    session.query(session.query(func.count()).select_from(Users).scalar_subquery(),
+                  session.query(func.count()).select_from(Medical).scalar_subquery()).one()
+    session.rollback()
+
+
+def worker(kind, make_session, results, stop, seed_value, medical_count, password_hash):
+    rng = random.Random(seed_value)
+    while not stop.is_set():
+        session = make_session()
+        start = time.perf_counter()
+        try:
+            if kind == 'read':
+                admin_read(session)
+                operation = 'read'
+            elif rng.random() < 0.5:
+                register(session, rng, password_hash)
+                operation = 'register'
+            else:
+                update_medical(session, rng, medical_count)
+                operation = 'update'
+            results.record(operation, time.perf_counter() - start)
+        except OperationalError as e:
+            session.rollback()
+            results.record(kind, time.perf_counter() - start, str(e.orig))
+        finally:
+            session.close()
+
+
+def make_engine(label, uri):
+    if label == 'baseline':
+        return create_engine(uri)
+    engine = create_engine(uri, **database.engine_options(uri))
+    database.install_sqlite_pragmas(engine)
+    return engine
+
+
+def run_process(label, uri, writers, readers, seconds, medical_count, seed_offset, queue):
+    """One web-worker-like process: its own engine and pool, shared by writer and reader threads"""
+    engine = make_engine(label, uri)
+    make_session = sessionmaker(bind=engine)
+    results = Results()
+    stop = threading.Event()
+    password_hash = 'pbkdf2:sha256:600000$load$test'  # Hashing is not what is being measured
+    threads = [threading.Thread(target=worker, args=('write', make_session, results, stop, seed_offset + index,
+                                                     medical_count, password_hash))
+               for index in range(writers)]
+    threads += [threading.Thread(target=worker, args=('read', make_session, results, stop,
+                                                      seed_offset + 1000 + index, medical_count, password_hash))
+                for index in range(readers)]
+    for thread in threads:
+        thread.start()
+    time.sleep(seconds)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    engine.dispose()
+    queue.put((results.latencies, results.errors))
+
+
+def run(label, uri, args, medical_count):
+    queue = multiprocessing.Queue()
+    processes = [multiprocessing.Process(target=run_process,
+                                         args=(label, uri, args.writers, args.readers, args.seconds,
+                                               medical_count, index * 10000, queue))
+                 for index in range(args.processes)]
+    start = time.perf_counter()
+    for process in processes:
+        process.start()
+    latencies, errors = {}, {}
+    for _ in processes:
+        process_latencies, process_errors = queue.get()
+        for kind, samples in process_latencies.items():
+            latencies.setdefault(kind, []).extend(samples)
+        for error, count in process_errors.items():
+            errors[error] = errors.get(error, 0) + count
+    for process in processes:
+        process.join()
+    elapsed = time.perf_counter() - start
+
+    completed = sum(len(samples) for samples in latencies.values())
+    failed = sum(errors.values())
+    summary = {
+        'ops_per_second': round(completed / elapsed, 1),
+        'completed': completed,
+        'errors': failed,
+        'error_rate': round(failed / max(completed + failed, 1), 4),
+        'error_kinds': errors,
+        'operations': {},
+    }
+    for kind, samples in sorted(latencies.items()):
+        samples.sort()
+        summary['operations'][kind] = {
+            'count': len(samples),
+            'p50_ms': round(statistics.median(samples) * 1000, 2),
+            'p95_ms': round(samples[max(int(len(samples) * 0.95) - 1, 0)] * 1000, 2),
+            'max_ms': round(samples[-1] * 1000, 2),
+        }
+
+    print(f"\n{label}: {summary['ops_per_second']} ops/s, {completed} completed, {failed} failed "
+          f"({summary['error_rate'] * 100:.2f}%)")
+    for kind, stats in summary['operations'].items():
+        print(f"  {kind:9} {stats['count']:7d} ops  p50 {stats['p50_ms']:8.2f} ms  p95 {stats['p95_ms']:8.2f} ms  "
+              f"max {stats['max_ms']:8.2f} ms")
+    for error, count in errors.items():
+        print(f"  error x{count}: {error}")
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Concurrent read/write load test of the database settings")
+    parser.add_argument('--database', required=True, help="Scratch SQLite file; copies are made next to it")
+    parser.add_argument('--users', type=int, default=20000, help="Users to seed if the file does not exist")
+    parser.add_argument('--processes', type=int, default=4, help="Worker processes, each with its own pool")
+    parser.add_argument('--writers', type=int, default=4, help="Writer threads per process")
+    parser.add_argument('--readers', type=int, default=4, help="Reader threads per process")
+    parser.add_argument('--seconds', type=float, default=10)
+    parser.add_argument('--output', help="Write results as JSON to this path")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.database):
+        print(f"Seeding {args.users} users into {args.database}...")
+        seed(create_engine(f'sqlite:///{args.database}'), args.users)
+    seed_engine = create_engine(f'sqlite:///{args.database}')
+    with seed_engine.connect() as connection:
+        medical_count = connection.execute(db.select(func.count()).select_from(Medical)).scalar()
+    seed_engine.dispose()
+
+    summaries = {}
+    for label in ('baseline', 'tuned'):
+        path = f'{args.database}.{label}'
+        for suffix in ('', '-wal', '-shm'):
+            if os.path.exists(path + suffix):
+                os.remove(path + suffix)
+        shutil.copyfile(args.database, path)
+        summaries[label] = run(label, f'sqlite:///{path}', args, medical_count)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'processes': args.processes, 'writers': args.writers, 'readers': args.readers, 'seconds': args.seconds,
+                       'results': summaries}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+"""
+Replay a recorded frame sequence to /ingest as if it were a phone camera
+Logs in as a user, sends JPEG frames from a video file or image directory and
+prints the detections and alerts that come back for that session.
+
+    python scripts/replay_client.py --source clip.mp4 --email user@example.com --password secret
+    python scripts/replay_client.py --source frames/ --stream --fps 15 ...
+"""
+
+import argparse
+import glob
+import http.client
+import http.cookiejar
+import json
+import os
+import struct
+import threading
+import time
+import urllib.parse
+import urllib.request
+
+import cv2
+
+IMAGE_EXTENSIONS = ('*.jpg', '*.jpeg', '*.png', '*.bmp')
+
+
+def recorded_frames(source, frames, quality):
+    """Yield JPEG bytes from a video file or an image directory"""
+    if os.path.isdir(source):
+        paths = sorted(path for pattern in IMAGE_EXTENSIONS for path in glob.glob(os.path.join(source, pattern)))
+        images = (cv2.imread(path) for path in paths)
+    else:
+        capture = cv2.VideoCapture(source)
+        if not capture.isOpened():
+            raise RuntimeError(f"Unable to open {source}")
+
+        def read_video():
+            try:
+                while True:
+                    success, frame = capture.read()
+                    if not success:
+                        return
+                    yield frame
+            finally:
+                capture.release()
+        images = read_video()
+
+    for index, image in enumerate(images):
+        if frames and index >= frames:
+            return
+        ret, buffer = cv2.imencode('.jpg', image, [cv2.IMWRITE_JPEG_QUALITY, quality])
+        if ret:
+            yield buffer.tobytes()
+
+
+def paced(items, fps):
+    interval = 1.0 / fps if fps else 0
+    next_time = time.perf_counter()
+    for item in items:
+        delay = next_time - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+        next_time += interval
+        yield item
+
+
+class Client:
+    def __init__(self, url):
+        self.url = url.rstrip('/')
+        self.cookies = http.cookiejar.CookieJar()
+        self.opener = urllib.request.build_opener(urllib.request.HTTPCookieProcessor(self.cookies))
+
+    def login(self, email, password):
+        data = urllib.parse.urlencode({'email': email, 'pass1': password}).encode()
+        with self.opener.open(self.url + '/login', data) as response:
+            if not response.url.rstrip('/').endswith('/home'):
+                raise RuntimeError("Login failed; check the email and password")
+
+    def post_frame(self, data):
+        request = urllib.request.Request(self.url + '/ingest', data=data, headers={'Content-Type': 'image/jpeg'})
+        with self.opener.open(request) as response:
+            return json.load(response)
+
+    def cookie_header(self):
+        return '; '.join(f'{cookie.name}={cookie.value}' for cookie in self.cookies)
+
+    def post_stream(self, frames):
+        """Send every frame in one chunked request of length-prefixed JPEGs"""
+        parsed = urllib.parse.urlsplit(self.url)
+        connection = http.client.HTTPConnection(parsed.hostname, parsed.port or 80)
+        body = (struct.pack('>I', len(data)) + data for data in frames)
+        connection.request('POST', parsed.path + '/ingest', body=body, encode_chunked=True,
+                           headers={'Content-Type': 'application/octet-stream', 'Cookie': self.cookie_header()})
+        response = connection.getresponse()
+        return json.load(response)
+
+    def listen(self, on_event, stop):
+        """Read /detections server-sent events until stop is set"""
+        request = urllib.request.Request(self.url + '/detections')
+        with self.opener.open(request) as response:
+            for line in response:
+                if stop.is_set():
+                    return
+                if line.startswith(b'data: '):
+                    on_event(json.loads(line[len(b'data: '):]))
+
+
+def print_event(event, alerts=()):
+    if event:
+        objects = ', '.join(f"{item['label']}#{item['track_id']} {item['distance']}m"
+                            + (' WARNING' if item['warning'] else '') for item in event['objects'])
+        print(f"frame {event['seq']:5d} age {event['age_ms']:6.1f} ms  {objects or '-'}")
+    for alert in alerts:
+        print(f"  alert: {alert['text']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay recorded frames to /ingest as a client camera")
+    parser.add_argument('--url', default='http://127.0.0.1:5000')
+    parser.add_argument('--email', required=True)
+    parser.add_argument('--password', required=True)
+    parser.add_argument('--source', required=True, help="Video file or directory of images")
+    parser.add_argument('--frames', type=int, default=0, help="Stop after this many frames (0 = all)")
+    parser.add_argument('--fps', type=float, default=10, help="Send rate (0 = as fast as possible)")
+    parser.add_argument('--quality', type=int, default=70, help="JPEG quality of the sent frames")
+    parser.add_argument('--stream', action='store_true',
+                        help="Send one chunked request and read detections from /detections")
+    args = parser.parse_args()
+
+    client = Client(args.url)
+    client.login(args.email, args.password)
+    frames = paced(recorded_frames(args.source, args.frames, args.quality), args.fps)
+
+    start = time.perf_counter()
+    if args.stream:
+        # The first frame opens the session so /detections follows this client's frames
+        first = next(frames)
+        client.post_frame(first)
+        stop = threading.Event()
+        threading.Thread(target=client.listen, args=(print_event, stop), daemon=True).start()
+        result = client.post_stream(frames)
+        stop.set()
+        sent = result.get('frames', 0) + 1
+        print_event(result.get('event'), result.get('alerts', []))
+        print(f"Server queue: {result.get('source')}")
+    else:
+        sent = 0
+        round_trips = []
+        for data in frames:
+            request_start = time.perf_counter()
+            result = client.post_frame(data)
+            round_trips.append(time.perf_counter() - request_start)
+            sent += 1
+            print_event(result['event'], result['alerts'])
+        if round_trips:
+            round_trips.sort()
+            print(f"Round trip: median {round_trips[len(round_trips) // 2] * 1000:.1f} ms, "
+                  f"max {round_trips[-1] * 1000:.1f} ms")
+        print(f"Server queue: {result.get('source') if sent else None}")
+
+    elapsed = time.perf_counter() - start
+    print(f"Sent {sent} frames in {elapsed:.1f}s ({sent / elapsed if elapsed else 0:.1f} FPS)")
+
+
+if __name__ == "__main__":
+    main()
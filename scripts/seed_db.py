@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+Seed a database with synthetic users and medical records
+Rows go in with bulk inserts in large transactions; every user shares one
+precomputed password hash, since hashing 100k passwords would take longer
+than the rest of the run. Never point this at the production database.
+
+    python scripts/seed_db.py --database sqlite:////tmp/voas-100k.db --users 100000
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+from sqlalchemy import create_engine
+from werkzeug.security import generate_password_hash
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from app import db, Medical, Users  # noqa: E402
+
+FIRST_NAMES = ('Asha', 'Ravi', 'Meera', 'Arjun', 'Priya', 'Kiran', 'Neha', 'Vikram', 'Sara', 'Omar')
+LAST_NAMES = ('Patel', 'Sharma', 'Khan', 'Iyer', 'Reddy', 'Das', 'Mehta', 'Joshi', 'Nair', 'Singh')
+BLOOD_GROUPS = ('A+', 'A-', 'B+', 'B-', 'AB+', 'AB-', 'O+', 'O-')
+VISION = ('Blind', 'Low vision', 'Partially sighted')
+
+
+def user_rows(start, count, password_hash, rng):
+    for index in range(start, start + count):
+        yield {
+            'username': f'user{index:07d}',
+            'uname': rng.choice(FIRST_NAMES),
+            'lname': rng.choice(LAST_NAMES),
+            'email': f'user{index:07d}@example.com',
+            'date': f'{rng.randint(1940, 2010)}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}',
+            'address': f'{rng.randint(1, 999)} Main Road',
+            'phone': f'9{index:09d}',
+            'pass1': password_hash,
+        }
+
+
+def medical_rows(user_ids, rng):
+    for user_id in user_ids:
+        yield {
+            'user_id': user_id,
+            'uname': f'user{user_id:07d}',
+            'address': f'{rng.randint(1, 999)} Main Road',
+            'allergies': rng.choice(('None', 'Penicillin', 'Pollen', 'Peanuts')),
+            'visionstatus': rng.choice(VISION),
+            'medications': rng.choice(('None', 'Metformin', 'Aspirin')),
+            'surgeries': 'None',
+            'bloodgroup': rng.choice(BLOOD_GROUPS),
+            'age': str(rng.randint(16, 90)),
+            'chronic_conditions': rng.choice(('None', 'Diabetes', 'Hypertension', 'Glaucoma')),
+            'emergency_contact': f'8{rng.randint(0, 999999999):09d}',
+            'blood_pressure': f'{rng.randint(100, 150)}/{rng.randint(60, 95)}',
+        }
+
+
+def seed(engine, users, medical_ratio=1.0, batch=5000, seed_value=0):
+    """Create the tables if needed and append users and medical records; returns seconds taken"""
+    rng = random.Random(seed_value)
+    db.metadata.create_all(engine)
+    password_hash = generate_password_hash('password')
+    start = time.perf_counter()
+    with engine.begin() as connection:
+        first_id = connection.execute(db.select(db.func.coalesce(db.func.max(Users.id), 0))).scalar() + 1
+        for offset in range(0, users, batch):
+            rows = list(user_rows(first_id + offset, min(batch, users - offset), password_hash, rng))
+            connection.execute(Users.__table__.insert(), rows)
+        with_medical = [user_id for user_id in range(first_id, first_id + users) if rng.random() < medical_ratio]
+        for offset in range(0, len(with_medical), batch):
+            connection.execute(Medical.__table__.insert(),
+                               list(medical_rows(with_medical[offset:offset + batch], rng)))
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Seed synthetic users and medical records")
+    parser.add_argument('--database', required=True, help="SQLAlchemy URL, e.g. sqlite:////tmp/voas-100k.db")
+    parser.add_argument('--users', type=int, default=100000)
+    parser.add_argument('--medical-ratio', type=float, default=1.0, help="Fraction of users with a medical record")
+    parser.add_argument('--batch', type=int, default=5000)
+    args = parser.parse_args()
+
+    engine = create_engine(args.database)
+    elapsed = seed(engine, args.users, args.medical_ratio, args.batch)
+    print(f"Inserted {args.users} users in {elapsed:.1f}s into {args.database}")
+
+
+if __name__ == "__main__":
+    main()
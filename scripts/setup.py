@@ -4,26 +4,311 @@ VisionAssist Pro Setup Script
 Automatically downloads required YOLOv3 model files and sets up the environment
 """
 
+import argparse
+import hashlib
+import http.client
+import json
 import os
 import sys
+import threading
+import time
+import urllib.error
 import urllib.request
 import subprocess
 from pathlib import Path
 
-def download_file(url, filename, description):
-    """Download a file with progress indication"""
+MANIFEST_PATH = Path(__file__).resolve().parent / "models.json"
+DEFAULT_WORKERS = 4
+MIN_PART_SIZE = 8 * 1024 * 1024
+CHUNK_SIZE = 256 * 1024
+RETRIES = 5
+TIMEOUT = 30
+USER_AGENT = "VOAS-setup"
+
+def load_manifest(path=MANIFEST_PATH):
+    """Model files to download: url, filename, description and, where known, size and sha256"""
+    with open(path, 'r') as f:
+        return json.load(f)
+
+def sha256_file(filename):
+    digest = hashlib.sha256()
+    with open(filename, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def open_url(url, byte_range=None):
+    headers = {"User-Agent": USER_AGENT}
+    if byte_range is not None:
+        headers["Range"] = "bytes=%d-%d" % byte_range
+    return urllib.request.urlopen(urllib.request.Request(url, headers=headers), timeout=TIMEOUT)
+
+def probe(url):
+    """Return (final url after redirects, total size or None, whether byte ranges work, ETag/Last-Modified)"""
+    with open_url(url, (0, 0)) as response:
+        validator = response.headers.get("ETag") or response.headers.get("Last-Modified")
+        if response.status == 206:
+            total = response.headers.get("Content-Range", "").rpartition("/")[2]
+            if total.isdigit():
+                return response.geturl(), int(total), True, validator
+        length = response.headers.get("Content-Length")
+        return response.geturl(), int(length) if length and response.status == 200 else None, False, validator
+
+def retrying(action, description, progress=None):
+    """Run action, retrying network errors with backoff; client errors (4xx) are not retried
+
+    With progress (a callable returning bytes done), an attempt that got
+    further than the last one reconnects at once and restarts the count.
+    """
+    attempt = 0
+    last = progress() if progress else None
+    while True:
+        try:
+            return action()
+        except urllib.error.HTTPError as e:
+            if e.code < 500 or attempt >= RETRIES:
+                raise
+            error = e
+        except (OSError, http.client.HTTPException) as e:
+            if attempt >= RETRIES:
+                raise
+            error = e
+        if progress is not None and progress() != last:
+            last = progress()
+            attempt = 0
+            continue
+        delay = min(2 ** attempt, 10)
+        attempt += 1
+        print(f"\n  {description}: {error}; retrying in {delay}s")
+        time.sleep(delay)
+
+class RangedDownload:
+    """Download a file into filename.part as parallel byte ranges
+
+    Progress is saved to filename.part.json, so an interrupted download
+    resumes each range where it stopped instead of starting over.
+    """
+
+    def __init__(self, url, filename, total, validator, workers):
+        self.url = url
+        self.total = total
+        self.validator = validator
+        self.part_path = filename + ".part"
+        self.state_path = self.part_path + ".json"
+        self.lock = threading.Lock()
+        self.parts = self.load_state()
+        self.resumed = self.parts is not None
+        if self.parts is None:
+            self.parts = self.plan(workers)
+            with open(self.part_path, 'wb') as f:
+                f.truncate(total)
+            self.save_state()
+        self.initial = self.downloaded()
+
+    def plan(self, workers):
+        count = max(1, min(workers, self.total // MIN_PART_SIZE))
+        size = -(-self.total // count)
+        # [first byte, last byte, bytes done]
+        return [[start, min(start + size, self.total) - 1, 0] for start in range(0, self.total, size)]
+
+    def load_state(self):
+        try:
+            with open(self.state_path, 'r') as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if (state.get("total") != self.total or state.get("validator") != self.validator
+                or not os.path.exists(self.part_path) or os.path.getsize(self.part_path) != self.total):
+            return None  # The file changed on the server, or the partial file is gone
+        return state["parts"]
+
+    def save_state(self):
+        with self.lock:
+            state = {"url": self.url, "total": self.total, "validator": self.validator, "parts": self.parts}
+        temporary = self.state_path + ".tmp"
+        with open(temporary, 'w') as f:
+            json.dump(state, f)
+        os.replace(temporary, self.state_path)
+
+    def downloaded(self):
+        with self.lock:
+            return sum(part[2] for part in self.parts)
+
+    def fetch(self, part):
+        first, last, _ = part
+
+        def attempt():
+            with self.lock:
+                done = part[2]
+            if first + done > last:
+                return
+            with open_url(self.url, (first + done, last)) as response:
+                if response.status != 206:
+                    raise urllib.error.HTTPError(self.url, response.status, "Range request not honoured",
+                                                 response.headers, None)
+                # Unbuffered, so the saved progress never counts bytes still in a Python buffer
+                with open(self.part_path, 'r+b', buffering=0) as f:
+                    f.seek(first + done)
+                    while first + done <= last:
+                        chunk = response.read(min(CHUNK_SIZE, last - first - done + 1))
+                        if not chunk:
+                            raise http.client.IncompleteRead(b'', last - first - done + 1)
+                        f.write(chunk)
+                        done += len(chunk)
+                        with self.lock:
+                            part[2] = done
+
+        retrying(attempt, f"bytes {first}-{last}", progress=lambda: part[2])
+
+    def run(self):
+        """Fetch every unfinished range in its own thread; raises the first range's error"""
+        errors = []
+
+        def fetch(part):
+            try:
+                self.fetch(part)
+            except Exception as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=fetch, args=(part,), daemon=True)
+                   for part in self.parts if part[2] < part[1] - part[0] + 1]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        if errors:
+            raise errors[0]
+
+    def finish(self, filename):
+        os.replace(self.part_path, filename)
+        os.remove(self.state_path)
+
+    def discard(self):
+        for path in (self.part_path, self.state_path):
+            if os.path.exists(path):
+                os.remove(path)
+
+def download_whole(url, filename, description):
+    """Single-stream download for servers without byte ranges; a retry starts over"""
+    part_path = filename + ".part"
+
+    def attempt():
+        with open_url(url) as response, open(part_path, 'wb') as f:
+            for chunk in iter(lambda: response.read(CHUNK_SIZE), b''):
+                f.write(chunk)
+
+    retrying(attempt, description)
+    return part_path
+
+def format_mb(size):
+    return f"{size / (1024 * 1024):.1f} MB"
+
+def show_progress(download, description, stop, interval=0.5):
+    """Print progress and throughput until stop is set, saving resume state as it goes"""
+    started = time.perf_counter()
+    while not stop.wait(interval):
+        download.save_state()
+        done = download.downloaded()
+        elapsed = time.perf_counter() - started
+        rate = (done - download.initial) / elapsed if elapsed else 0
+        remaining = (download.total - done) / rate if rate else 0
+        line = (f"  {description}: {done * 100 / download.total:5.1f}% of {format_mb(download.total)}, "
+                f"{format_mb(rate)}/s, {remaining:.0f}s left")
+        if sys.stdout.isatty():
+            print("\r" + line, end="", flush=True)
+        else:
+            print(line, flush=True)
+    if sys.stdout.isatty():
+        print()
+
+def verify_file(filename, size=None, sha256=None):
+    """Return None if filename has the expected size and SHA-256, else what is wrong"""
+    actual_size = os.path.getsize(filename)
+    if size is not None and actual_size != size:
+        return f"size is {actual_size} bytes, expected {size}"
+    if sha256:
+        digest = sha256_file(filename)
+        if digest != sha256.lower():
+            return f"SHA-256 is {digest}, expected {sha256}"
+    return None
+
+def download_file(url, filename, description, size=None, sha256=None, workers=DEFAULT_WORKERS):
+    """Download a file in parallel byte ranges with resume, progress and checksum verification"""
     print(f"Downloading {description}...")
+    started = time.perf_counter()
+    download = None
     try:
-        urllib.request.urlretrieve(url, filename)
-        print(f"✓ Successfully downloaded {description}")
+        final_url, total, ranges, validator = retrying(lambda: probe(url), description)
+        if size is not None and total is not None and total != size:
+            print(f"✗ Error downloading {description}: server reports {total} bytes, the manifest {size}")
+            return False
+
+        if ranges and total:
+            download = RangedDownload(final_url, filename, total, validator, workers)
+            if download.resumed:
+                print(f"  Resuming at {format_mb(download.initial)} of {format_mb(total)}")
+            stop = threading.Event()
+            progress = threading.Thread(target=show_progress, args=(download, description, stop), daemon=True)
+            progress.start()
+            try:
+                download.run()
+            finally:
+                stop.set()
+                progress.join()
+                download.save_state()
+            part_path = download.part_path
+        else:
+            part_path = download_whole(final_url, filename, description)
+
+        problem = verify_file(part_path, size if size is not None else total, sha256)
+        if problem:
+            print(f"✗ Error downloading {description}: {problem}; the partial file was removed")
+            if download is not None:
+                download.discard()
+            else:
+                os.remove(part_path)
+            return False
+        if download is not None:
+            download.finish(filename)
+        else:
+            os.replace(part_path, filename)
+
+        elapsed = time.perf_counter() - started
+        fetched = os.path.getsize(filename) - (download.initial if download is not None else 0)
+        print(f"✓ Successfully downloaded {description} ({format_mb(fetched)} in {elapsed:.1f}s, "
+              f"{format_mb(fetched / elapsed if elapsed else 0)}/s)")
         return True
     except Exception as e:
+        # Ranged downloads keep their .part and state files so the next run resumes
         print(f"✗ Error downloading {description}: {e}")
         return False
 
-def check_file_exists(filename, description):
-    """Check if a file exists"""
+def pin_manifest(path, files_to_download):
+    """Record the size and SHA-256 of present files the manifest does not pin yet"""
+    pinned = []
+    for file_info in files_to_download:
+        filename = file_info["filename"]
+        if file_info.get("sha256") or not os.path.exists(filename):
+            continue
+        file_info["size"] = os.path.getsize(filename)
+        file_info["sha256"] = sha256_file(filename)
+        pinned.append(filename)
+    if not pinned:
+        print("✓ Every model file in the manifest is already pinned")
+        return
+    with open(path, 'w') as f:
+        json.dump(files_to_download, f, indent=2)
+        f.write("\n")
+    print(f"✓ Pinned {', '.join(pinned)} in {path}; check them against a trusted copy before committing")
+
+def check_file_exists(filename, description, size=None, sha256=None):
+    """Check if a file exists and matches the manifest; a file that does not is removed"""
     if os.path.exists(filename):
+        problem = verify_file(filename, size, sha256)
+        if problem:
+            print(f"⚠️  {description} is damaged or incomplete ({problem}); downloading it again")
+            os.remove(filename)
+            return False
         print(f"✓ {description} already exists")
         return True
     return False
@@ -70,49 +355,67 @@ def setup_environment():
         print("✗ Environment template file not found")
         return False
 
+def record_model_checksums(filenames):
+    """Checksum the model files into the model cache manifest so the app does not hash them on first load"""
+    print("Recording model checksums...")
+    try:
+        sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+        import model_cache
+        for filename in filenames:
+            if os.path.exists(filename):
+                print(f"  {filename}: {model_cache.checksum(filename)}")
+        print("✓ Model checksums recorded")
+        return True
+    except Exception as e:
+        print(f"✗ Error recording model checksums: {e}")
+        return False
+
 def main():
     """Main setup function"""
+    parser = argparse.ArgumentParser(description="Install requirements and download the YOLOv3 model files")
+    parser.add_argument("--manifest", default=MANIFEST_PATH, help="JSON list of files to download (default scripts/models.json)")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS, help="Parallel connections per download")
+    parser.add_argument("--models-only", action="store_true", help="Only download and check the model files")
+    parser.add_argument("--pin", action="store_true", help="Write the size and SHA-256 of unpinned files into the manifest")
+    args = parser.parse_args()
+
     print("🚀 VisionAssist Pro Setup")
     print("=" * 40)
     
-    # File URLs and descriptions
-    files_to_download = [
-        {
-            "url": "https://pjreddie.com/media/files/yolov3.weights",
-            "filename": "yolov3.weights",
-            "description": "YOLOv3 weights (248MB)"
-        },
-        {
-            "url": "https://github.com/pjreddie/darknet/raw/master/cfg/yolov3.cfg",
-            "filename": "yolov3.cfg", 
-            "description": "YOLOv3 configuration"
-        },
-        {
-            "url": "https://github.com/pjreddie/darknet/raw/master/data/coco.names",
-            "filename": "coco.names",
-            "description": "COCO class names"
-        }
-    ]
+    # File URLs, descriptions and, where pinned, sizes and checksums
+    files_to_download = load_manifest(args.manifest)
     
     success_count = 0
-    total_steps = len(files_to_download) + 2  # +2 for requirements and env setup
-    
-    # Step 1: Install requirements
-    if install_requirements():
-        success_count += 1
+    total_steps = len(files_to_download) + (1 if args.models_only else 3)  # requirements, env setup, model checksums
     
-    # Step 2: Setup environment
-    if setup_environment():
-        success_count += 1
+    if not args.models_only:
+        # Step 1: Install requirements
+        if install_requirements():
+            success_count += 1
+        
+        # Step 2: Setup environment
+        if setup_environment():
+            success_count += 1
     
-    # Step 3: Download model files
+    # Step 3: Download model files; existing ones are checked against the manifest
     for file_info in files_to_download:
-        if not check_file_exists(file_info["filename"], file_info["description"]):
-            if download_file(file_info["url"], file_info["filename"], file_info["description"]):
+        size, sha256 = file_info.get("size"), file_info.get("sha256")
+        if not sha256:
+            print(f"⚠️  No SHA-256 pinned for {file_info['filename']}; only its size can be checked")
+        if not check_file_exists(file_info["filename"], file_info["description"], size, sha256):
+            if download_file(file_info["url"], file_info["filename"], file_info["description"], size, sha256,
+                             args.workers):
                 success_count += 1
         else:
             success_count += 1
     
+    if args.pin:
+        pin_manifest(args.manifest, files_to_download)
+
+    # Step 4: Checksum the model files once
+    if record_model_checksums([file_info["filename"] for file_info in files_to_download]):
+        success_count += 1
+    
     print("\n" + "=" * 40)
     print(f"Setup Complete: {success_count}/{total_steps} steps successful")
     
@@ -0,0 +1,146 @@
+"""
+Full-text admin search
+SQLite FTS5 indexes over the searchable user and medical record columns.
+They are external-content tables kept in sync by triggers, so every write
+path (the register, edit, delete and medical routes, bulk import) updates
+them in the same transaction without any route having to remember to.
+Queries match every typed word as a prefix and come back ranked by BM25,
+a page at a time. Databases without FTS5 fall back to LIKE scans.
+"""
+
+import re
+import threading
+
+from sqlalchemy import and_, or_, text
+from sqlalchemy.exc import OperationalError
+
+from listings import DEFAULT_PAGE_SIZE, Page, decode_cursor, encode_cursor
+
+# Columns and BM25 weights (a username hit counts more than an address hit)
+INDEXES = {
+    'users': {'table': 'users', 'columns': ('username', 'uname', 'lname', 'email', 'phone', 'address'),
+              'weights': (5.0, 3.0, 3.0, 2.0, 2.0, 1.0)},
+    'medical': {'table': 'medical', 'columns': ('allergies', 'medications', 'chronic_conditions', 'visionstatus'),
+                'weights': (1.0, 1.0, 1.0, 1.0)},
+}
+WORD = re.compile(r'\w+', re.UNICODE)
+
+_ready = {}
+_lock = threading.Lock()
+
+
+def fts_table(kind):
+    return INDEXES[kind]['table'] + '_fts'
+
+
+def index_ddl(kind):
+    """CREATE statements for the FTS5 table of kind and the triggers that keep it in sync"""
+    spec = INDEXES[kind]
+    table, fts = spec['table'], fts_table(kind)
+    columns = ', '.join(spec['columns'])
+    new_values = ', '.join(f'new.{column}' for column in spec['columns'])
+    old_values = ', '.join(f'old.{column}' for column in spec['columns'])
+    return [
+        # prefix='2 3' keeps extra index entries so short prefix queries do not scan the term list
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5({columns}, content='{table}', content_rowid='id', "
+        f"tokenize='unicode61 remove_diacritics 2', prefix='2 3')",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_ai AFTER INSERT ON {table} BEGIN "
+        f"INSERT INTO {fts}(rowid, {columns}) VALUES (new.id, {new_values}); END",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_ad AFTER DELETE ON {table} BEGIN "
+        f"INSERT INTO {fts}({fts}, rowid, {columns}) VALUES ('delete', old.id, {old_values}); END",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_au AFTER UPDATE ON {table} BEGIN "
+        f"INSERT INTO {fts}({fts}, rowid, {columns}) VALUES ('delete', old.id, {old_values}); "
+        f"INSERT INTO {fts}(rowid, {columns}) VALUES (new.id, {new_values}); END",
+    ]
+
+
+def ensure(engine):
+    """Create the indexes and triggers if needed; returns False when full-text search is unavailable
+
+    An index created here is filled from its table once; after that the
+    triggers keep it current.
+    """
+    key = str(engine.url)
+    if key in _ready:
+        return _ready[key]
+    with _lock:
+        if key in _ready:
+            return _ready[key]
+        available = engine.dialect.name == 'sqlite'
+        if available:
+            try:
+                with engine.begin() as connection:
+                    for kind in INDEXES:
+                        exists = connection.exec_driver_sql(
+                            "SELECT 1 FROM sqlite_master WHERE name = ?", (fts_table(kind),)).first()
+                        for statement in index_ddl(kind):
+                            connection.exec_driver_sql(statement)
+                        if not exists:
+                            rebuild(connection, kind)
+            except OperationalError as e:
+                print(f"Full-text search unavailable, falling back to LIKE: {e.orig}")
+                available = False
+        _ready[key] = available
+        return available
+
+
+def rebuild(connection, kind):
+    """Re-read every row of the content table into its index"""
+    fts = fts_table(kind)
+    connection.exec_driver_sql(f"INSERT INTO {fts}({fts}) VALUES ('rebuild')")
+
+
+def match_query(search):
+    """FTS5 query matching every word of search as a prefix, or None if it has no words
+
+    Each word is quoted so AND/OR/NOT/NEAR and punctuation are taken literally.
+    """
+    words = WORD.findall(search or '')
+    if not words:
+        return None
+    return ' '.join(f'"{word}"*' for word in words)
+
+
+def like_filter(columns, search):
+    """Every word of search appears somewhere in one of columns: the LIKE scan fallback"""
+    words = WORD.findall(search or '')
+    return and_(*[or_(*[column.like(f'%{word}%') for column in columns]) for word in words])
+
+
+def search(session, model, kind, search_text, cursor=None, limit=DEFAULT_PAGE_SIZE):
+    """Return a Page of model rows matching search_text, best BM25 rank first
+
+    The cursor is keyset on (rank, id) like the listings, so later pages do
+    not re-rank and skip the earlier ones.
+    """
+    query = match_query(search_text)
+    if query is None:
+        return Page([], 'rank', 'asc', limit)
+    spec = INDEXES[kind]
+    fts = fts_table(kind)
+    rank = f"bm25({fts}, {', '.join(str(weight) for weight in spec['weights'])})"
+    position = decode_cursor(cursor)
+    backward = position is not None and position[2]
+    direction = 'DESC' if backward else 'ASC'
+    comparison = '<' if backward else '>'
+
+    sql = f"SELECT rowid, {rank} AS score FROM {fts} WHERE {fts} MATCH :query"
+    parameters = {'query': query, 'limit': limit + 1}
+    if position is not None:
+        sql += f" AND ({rank} {comparison} :score OR ({rank} = :score AND rowid {comparison} :row_id))"
+        parameters.update(score=position[0], row_id=position[1])
+    sql += f" ORDER BY score {direction}, rowid {direction} LIMIT :limit"
+    matches = session.execute(text(sql), parameters).all()
+
+    more = len(matches) > limit
+    matches = matches[:limit]
+    if backward:
+        matches.reverse()
+    rows = {row.id: row for row in session.query(model).filter(model.id.in_([match[0] for match in matches]))}
+    items = [rows[match[0]] for match in matches if match[0] in rows]
+
+    has_next = backward or more
+    has_prev = more if backward else position is not None
+    next_cursor = encode_cursor(matches[-1][1], matches[-1][0]) if matches and has_next else None
+    prev_cursor = encode_cursor(matches[0][1], matches[0][0], backward=True) if matches and has_prev else None
+    return Page(items, 'rank', 'asc', limit, next_cursor, prev_cursor)
@@ -0,0 +1,268 @@
+"""
+Non-blocking speech alerts
+A single worker thread owns the pyttsx3 engine and speaks alerts taken from a
+small priority queue, so the detection loop never waits on audio. Alerts with
+pre-rendered fragments are played from the phrase cache; the worker renders
+missing fragments while it has nothing to say.
+"""
+
+import heapq
+import itertools
+import threading
+import time
+
+import metrics
+from config import Config
+from phrase_cache import PhraseCache, all_fragments, get_player
+
+# Lower value is spoken first
+PRIORITY_WARNING = 0
+PRIORITY_INFO = 1
+
+DEFAULT_MAX_PENDING = 4
+DEFAULT_MAX_AGE = 3.0  # seconds before a queued alert is no longer worth saying
+
+
+class SpeechAlert:
+    """One queued sentence"""
+
+    def __init__(self, text, priority, key, max_age, fragments=None, private=False):
+        self.text = text
+        self.fragments = fragments
+        self.private = private
+        self.priority = priority
+        self.key = key
+        self.created = time.monotonic()
+        self.max_age = max_age
+
+    def is_stale(self, now):
+        return now - self.created > self.max_age
+
+
+class SpeechWorker:
+    """Speaks alerts on a dedicated thread from a bounded priority queue"""
+
+    def __init__(self, rate=150, max_pending=DEFAULT_MAX_PENDING, max_age=DEFAULT_MAX_AGE,
+                 phrases=None, prebuild=None, private_phrases=None):
+        self.rate = rate
+        self.phrases = phrases
+        # Memory-only clips for personal text; they never share, or evict from, the alert cache
+        self.private_phrases = private_phrases
+        self.prebuild = Config.PHRASE_CACHE_PREBUILD if prebuild is None else prebuild
+        self._to_render = []
+        self.max_pending = max_pending
+        self.max_age = max_age
+        self._pending = []
+        self._sequence = itertools.count()
+        self._cond = threading.Condition()
+        self._thread = None
+        self._running = False
+        self.spoken = 0
+        self.dropped_stale = 0
+        self.dropped_full = 0
+        self.superseded = 0
+        self.errors = 0
+
+    def start(self):
+        with self._cond:
+            if self._running:
+                return
+            self._running = True
+        self._thread = threading.Thread(target=self._run, name='speech-worker', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        with self._cond:
+            self._running = False
+            self._pending.clear()
+            self._cond.notify_all()
+
+    def say(self, text, priority=PRIORITY_INFO, key=None, max_age=None, fragments=None, private=False):
+        """Queue an alert without blocking; returns False if it was dropped
+
+        An alert with the same key as one still waiting replaces it, so only
+        the newest sentence about an object is ever spoken. fragments are the
+        phrase cache clips that together say text; private ones are kept in
+        the memory-only cache.
+        """
+        alert = SpeechAlert(text, priority, key, self.max_age if max_age is None else max_age, fragments, private)
+        with self._cond:
+            if key is not None:
+                remaining = [entry for entry in self._pending if entry[2].key != key]
+                if len(remaining) != len(self._pending):
+                    self.superseded += len(self._pending) - len(remaining)
+                    metrics.ALERTS_SUPPRESSED.labels('superseded').inc(len(self._pending) - len(remaining))
+                    heapq.heapify(remaining)
+                    self._pending = remaining
+
+            if len(self._pending) >= self.max_pending:
+                # Evict the least important, oldest alert, unless the new one is even less important
+                worst = max(self._pending, key=lambda entry: entry[:2])
+                self.dropped_full += 1
+                metrics.ALERTS_SUPPRESSED.labels('queue_full').inc()
+                if worst[0] < priority:
+                    return False
+                self._pending.remove(worst)
+                heapq.heapify(self._pending)
+
+            # Newest first within a priority: an older alert describes an older frame
+            heapq.heappush(self._pending, (priority, -next(self._sequence), alert))
+            self._cond.notify()
+        return True
+
+    def prerender(self, fragments, private=False):
+        """Queue phrase cache fragments to be rendered while the worker is idle; returns how many"""
+        phrases = self.private_phrases if private else self.phrases
+        if phrases is None or not self._running:
+            return 0
+        missing = phrases.missing(fragments)
+        with self._cond:
+            missing = [text for text in missing if (phrases, text) not in self._to_render]
+            self._to_render.extend((phrases, text) for text in missing)
+            self._cond.notify()
+        return len(missing)
+
+    def pending(self):
+        with self._cond:
+            return len(self._pending)
+
+    def stats(self):
+        stats = {
+            'pending': self.pending(),
+            'spoken': self.spoken,
+            'dropped_stale': self.dropped_stale,
+            'dropped_full': self.dropped_full,
+            'superseded': self.superseded,
+            'errors': self.errors,
+        }
+        if self.phrases is not None:
+            stats['phrases'] = dict(self.phrases.stats(), to_render=len(self._to_render))
+        return stats
+
+    def _next_alert(self):
+        """Return the next alert, False when idle with fragments left to render, or None once stopped"""
+        with self._cond:
+            while self._running:
+                while self._pending:
+                    alert = heapq.heappop(self._pending)[2]
+                    if alert.is_stale(time.monotonic()):
+                        self.dropped_stale += 1
+                        metrics.ALERTS_SUPPRESSED.labels('stale').inc()
+                        continue
+                    return alert
+                if self._to_render:
+                    return False
+                self._cond.wait()
+        return None
+
+    def _render_some(self, engine, batch=8):
+        # Small batches so a new alert waits for a few fragments at most, not the whole set
+        with self._cond:
+            phrases = self._to_render[0][0]
+            fragments = []
+            while self._to_render and len(fragments) < batch and self._to_render[0][0] is phrases:
+                fragments.append(self._to_render.pop(0)[1])
+        try:
+            phrases.render(engine, fragments)
+        except Exception as e:
+            print(f"Error rendering speech phrases: {e}")
+            with self._cond:
+                self._to_render.clear()
+
+    def _speak(self, engine, play, alert):
+        phrases = self.private_phrases if alert.private else self.phrases
+        if play is not None and phrases is not None and alert.fragments:
+            audio = phrases.audio(alert.fragments)
+            if audio is not None:
+                metrics.ALERT_START_SECONDS.labels('cache').observe(time.monotonic() - alert.created)
+                play(*audio)
+                return
+            # Say it this time and render the fragments once the queue is idle
+            self.prerender(alert.fragments, alert.private)
+        metrics.ALERT_START_SECONDS.labels('synthesized').observe(time.monotonic() - alert.created)
+        engine.say(alert.text)
+        engine.runAndWait()
+
+    def _run(self):
+        # pyttsx3 engines must be driven from the thread that created them
+        try:
+            import pyttsx3
+            engine = pyttsx3.init()
+            engine.setProperty('rate', self.rate)  # Speed of speech
+        except Exception as e:
+            print(f"Error initializing text-to-speech engine: {e}")
+            with self._cond:
+                self._running = False
+            return
+
+        play = None
+        if self.phrases is not None:
+            play = get_player()
+            if play is None:
+                print("No audio output for cached phrases; alerts will be synthesized")
+            elif self.prebuild:
+                self._queue_all_fragments()
+
+        while True:
+            alert = self._next_alert()
+            if alert is None:
+                break
+            if alert is False:
+                self._render_some(engine)
+                continue
+            try:
+                self._speak(engine, play, alert)
+                self.spoken += 1
+                metrics.ALERTS_SPOKEN.inc()
+            except Exception:
+                self.errors += 1  # Ignore voice errors
+
+
+    def _queue_all_fragments(self):
+        try:
+            from model_registry import load_labels
+            classes = load_labels(Config.YOLO_CLASSES_PATH)[0]
+        except Exception as e:
+            print(f"Error loading class names for the phrase cache: {e}")
+            return
+        missing = self.phrases.missing(all_fragments(classes))
+        with self._cond:
+            self._to_render.extend((self.phrases, text) for text in missing)
+
+
+_worker = None
+_worker_lock = threading.Lock()
+
+
+def get_speech_worker():
+    """Return the process-wide speech worker, starting it on first use"""
+    global _worker
+    if _worker is None:
+        with _worker_lock:
+            if _worker is None:
+                rate = 150
+                phrases = None
+                private_phrases = None
+                if Config.PHRASE_CACHE_ENABLED:
+                    try:
+                        phrases = PhraseCache(voice=f'rate={rate}')
+                        private_phrases = PhraseCache(voice=f'rate={rate}', memory_only=True,
+                                                      max_memory=Config.MEDICAL_SUMMARY_AUDIO_CLIPS)
+                    except Exception as e:
+                        print(f"Error opening phrase cache: {e}")
+                worker = SpeechWorker(rate=rate, phrases=phrases, private_phrases=private_phrases)
+                worker.start()
+                metrics.SPEECH_QUEUE_DEPTH.set_function(worker.pending)
+                _worker = worker
+    return _worker
+
+
+def running_speech_worker():
+    """The process-wide speech worker if something has already started it, else None"""
+    return _worker
+
+
+def speech_status():
+    """Stats of the process-wide speech worker, or None if it has not been started"""
+    worker = _worker
+    return worker.stats() if worker is not None else None
@@ -0,0 +1,106 @@
+"""
+Adaptive JPEG encoding for the MJPEG stream
+Each viewer has its own quality/scale level that steps down when it cannot
+keep up with the stream and back up once it drains frames reliably again.
+Viewers on the same level share one encode per frame.
+"""
+
+import threading
+
+import cv2
+import numpy as np
+
+from config import Config
+
+
+def quality_levels(max_quality=None, min_quality=None, min_scale=None, steps=None):
+    """Return (jpeg quality, scale) pairs from best to cheapest"""
+    max_quality = Config.STREAM_JPEG_QUALITY if max_quality is None else max_quality
+    min_quality = Config.STREAM_MIN_JPEG_QUALITY if min_quality is None else min_quality
+    min_scale = Config.STREAM_MIN_SCALE if min_scale is None else min_scale
+    steps = max(1, Config.STREAM_QUALITY_STEPS if steps is None else steps)
+    if steps == 1:
+        return [(int(max_quality), 1.0)]
+    levels = []
+    for step in range(steps):
+        fraction = step / (steps - 1)
+        quality = round(max_quality + (min_quality - max_quality) * fraction)
+        scale = round(1.0 + (min_scale - 1.0) * fraction, 2)
+        levels.append((int(quality), scale))
+    return levels
+
+
+class StreamQuality:
+    """Tracks how fast one viewer drains its slot and picks its encoding level"""
+
+    def __init__(self, levels=None, adaptive=None, down_after=2, up_after=30):
+        self.levels = levels or quality_levels()
+        self.adaptive = Config.STREAM_ADAPTIVE_QUALITY if adaptive is None else adaptive
+        self.down_after = down_after
+        self.up_after = up_after
+        self.level = 0
+        self.delivered = 0
+        self.dropped = 0
+        self._recent_drops = 0
+        self._clean = 0
+        self._lock = threading.Lock()
+
+    def settings(self):
+        return self.levels[self.level]
+
+    def record(self, dropped):
+        """Update the level after a put into the viewer's slot"""
+        with self._lock:
+            self.delivered += 1
+            if dropped:
+                # The previous frame was still unread, so the viewer is slower than the stream
+                self.dropped += 1
+                self._recent_drops += 1
+                self._clean = 0
+                if self.adaptive and self._recent_drops >= self.down_after:
+                    self.level = min(self.level + 1, len(self.levels) - 1)
+                    self._recent_drops = 0
+            else:
+                self._clean += 1
+                if self._clean >= self.up_after:
+                    self._recent_drops = 0
+                    self._clean = 0
+                    if self.adaptive:
+                        self.level = max(self.level - 1, 0)
+
+    def status(self):
+        quality, scale = self.settings()
+        return {'quality': quality, 'scale': scale, 'delivered': self.delivered, 'dropped': self.dropped}
+
+
+class ChunkEncoder:
+    """Encodes frames as multipart/x-mixed-replace parts, reusing its resize buffers and parameters
+
+    cv2.imencode always returns a new array and the WSGI server needs a bytes
+    object, so one JPEG buffer and one chunk per frame and level remain.
+    """
+
+    def __init__(self):
+        self._resized = {}
+        self._params = {}
+
+    def encode(self, frame, quality, scale):
+        """Return the encoded chunk for frame, or None on failure"""
+        if scale < 1.0:
+            height, width = frame.shape[:2]
+            size = (max(1, round(width * scale)), max(1, round(height * scale)))
+            resized = self._resized.get(scale)
+            if resized is None or resized.shape[:2] != (size[1], size[0]):
+                resized = self._resized[scale] = np.empty((size[1], size[0], 3), dtype=np.uint8)
+            frame = cv2.resize(frame, size, dst=resized, interpolation=cv2.INTER_AREA)
+        params = self._params.get(quality)
+        if params is None:
+            params = self._params[quality] = [cv2.IMWRITE_JPEG_QUALITY, quality]
+        ret, buffer = cv2.imencode('.jpg', frame, params)
+        if not ret:
+            return None
+        header = (b'--frame\r\n'
+                  b'Content-Type: image/jpeg\r\n'
+                  b'Content-Length: ' + str(buffer.size).encode() + b'\r\n\r\n')
+        # join reads the encoded array through the buffer protocol: one copy instead of tobytes() plus concatenation
+        return b''.join((header, buffer, b'\r\n'))
@@ -0,0 +1,190 @@
+"""
+One detection producer per physical camera, shared by every /video_feed and
+/detections viewer
+The camera is reference-counted: it opens with the first subscriber and is
+released when the last one leaves.
+"""
+
+import contextlib
+import threading
+
+import metrics
+from pipeline import DetectionPipeline, LatestSlot
+from stream_encoder import StreamQuality
+
+
+VIDEO = 'video'
+EVENTS = 'events'
+POLL = 'poll'
+
+
+class LatestValue(LatestSlot):
+    """Holds the newest event for polling; being overwritten is expected, not a drop"""
+
+    def put(self, item):
+        super().put(item)
+        return False
+
+
+class Subscriber:
+    """One viewer of a shared camera stream with its own drop-oldest slot
+
+    Video subscribers receive multipart JPEG chunks; event subscribers
+    receive JSON detection events and cost no encoding at all. Poll
+    subscribers only keep the newest event for whoever asks for it.
+    """
+
+    def __init__(self, hub, producer, owner=None, kind=VIDEO):
+        self.hub = hub
+        self.producer = producer
+        self.owner = owner
+        self.kind = kind
+        self.slot = LatestValue() if kind == POLL else LatestSlot()
+        self.quality = StreamQuality() if kind == VIDEO else None
+        self.active = True
+
+    def frames(self, keepalive=None):
+        """Yield chunks or events until closed or the camera stops
+
+        If keepalive is given it is yielded whenever nothing arrived for a
+        second, so a disconnected client is noticed on a quiet stream.
+        """
+        counter = 'streamed' if self.kind == VIDEO else 'events'
+        try:
+            while self.active and self.producer.running:
+                item = self.slot.get(timeout=1)
+                if item is None:
+                    if keepalive is not None:
+                        yield keepalive
+                    continue
+                self.producer.counters.increment(counter)
+                yield item
+        finally:
+            self.close()
+
+    def poll(self):
+        """Take the newest item without waiting, or None if nothing new arrived"""
+        item = self.slot.get(timeout=0)
+        if item is not None:
+            self.producer.counters.increment('events')
+        return item
+
+    def status(self):
+        status = self.quality.status() if self.quality is not None else {}
+        status['kind'] = self.kind
+        return status
+
+    def close(self):
+        if self.active:
+            self.active = False
+            self.slot.close()
+            self.hub.unsubscribe(self)
+
+
+class StreamHub:
+    """Keeps one DetectionPipeline per camera source and fans its frames out
+
+    _lock only guards the maps and is never held while a camera opens or
+    closes, so metrics, status and other cameras are not held up by it.
+    Starting and stopping a producer is serialized per source instead, by a
+    lock that is dropped once no caller holds or waits for it, so sources
+    that come and go (client cameras) do not pile up.
+    """
+
+    def __init__(self, pipeline_factory=DetectionPipeline):
+        self.pipeline_factory = pipeline_factory
+        self._producers = {}
+        self._subscribers = {}
+        self._source_locks = {}
+        self._lock = threading.Lock()
+
+    @contextlib.contextmanager
+    def _source_lock(self, source):
+        with self._lock:
+            entry = self._source_locks.setdefault(source, [threading.Lock(), 0])
+            entry[1] += 1
+        try:
+            with entry[0]:
+                yield
+        finally:
+            with self._lock:
+                entry[1] -= 1
+                if not entry[1]:
+                    del self._source_locks[source]
+
+    def subscribe(self, source=0, owner=None, kind=VIDEO, **pipeline_kwargs):
+        """Attach a new subscriber to the camera, starting its producer if needed"""
+        with self._source_lock(source):
+            with self._lock:
+                producer = self._producers.get(source)
+            started = producer is None or not producer.running
+            if started:
+                producer = self.pipeline_factory(source, **pipeline_kwargs)
+                producer.start()
+
+            subscriber = Subscriber(self, producer, owner, kind)
+            if kind in (EVENTS, POLL):
+                producer.add_event_output(subscriber.slot)
+            else:
+                producer.add_output(subscriber.slot, subscriber.quality)
+            with self._lock:
+                if started:
+                    self._producers[source] = producer
+                    self._subscribers[source] = []
+                self._subscribers[source].append(subscriber)
+            return subscriber
+
+    def unsubscribe(self, subscriber):
+        """Detach a subscriber and release the camera if it was the last one"""
+        producer = subscriber.producer
+        producer.remove_output(subscriber.slot)
+        producer.remove_event_output(subscriber.slot)
+        with self._source_lock(producer.source):
+            with self._lock:
+                subscribers = self._subscribers.get(producer.source, [])
+                if subscriber in subscribers:
+                    subscribers.remove(subscriber)
+                if subscribers or self._producers.get(producer.source) is not producer:
+                    return
+                del self._producers[producer.source]
+                del self._subscribers[producer.source]
+            # Stopped under the source lock so a new subscriber cannot reopen the device before it is released
+            producer.stop()
+
+    def close_owner(self, owner):
+        """Close every subscriber opened by owner, e.g. when a user stops detection"""
+        with self._lock:
+            owned = [subscriber for subscribers in self._subscribers.values()
+                     for subscriber in subscribers if subscriber.owner == owner]
+        for subscriber in owned:
+            subscriber.close()
+
+    def subscriber_count(self):
+        """Open /video_feed and /detections responses; a client camera's own poll subscription is not one"""
+        with self._lock:
+            return sum(1 for subscribers in self._subscribers.values()
+                       for subscriber in subscribers if subscriber.kind != POLL)
+
+    def camera_count(self):
+        with self._lock:
+            return sum(1 for producer in self._producers.values() if producer.running)
+
+    def status(self):
+        with self._lock:
+            producers = list(self._producers.items())
+            clients = {source: [subscriber.status() for subscriber in subscribers]
+                       for source, subscribers in self._subscribers.items()}
+        streams = []
+        for source, producer in producers:
+            status = producer.counters.snapshot()
+            status['source'] = source if isinstance(source, (int, str)) else str(source)
+            status['subscribers'] = len(clients.get(source, []))
+            status['clients'] = clients.get(source, [])
+            status['running'] = producer.running
+            streams.append(status)
+        return {'streams': streams}
+
+
+hub = StreamHub()
+metrics.ACTIVE_STREAMS.set_function(hub.subscriber_count)
+metrics.OPEN_CAMERAS.set_function(hub.camera_count)
@@ -0,0 +1,180 @@
+"""
+Lightweight IoU tracker for detection-plus-tracking mode
+YOLO runs on keyframes only; in between, tracks are carried forward with a
+constant-velocity prediction so boxes, labels, distances and track ids stay
+available on every frame.
+"""
+
+import itertools
+
+import numpy as np
+
+
+def iou_matrix(boxes_a, boxes_b):
+    """Pairwise IoU between two (N, 4) and (M, 4) arrays of [x, y, w, h] boxes"""
+    a = np.asarray(boxes_a, dtype=np.float32).reshape(-1, 4)
+    b = np.asarray(boxes_b, dtype=np.float32).reshape(-1, 4)
+    ax2 = a[:, 0] + a[:, 2]
+    ay2 = a[:, 1] + a[:, 3]
+    bx2 = b[:, 0] + b[:, 2]
+    by2 = b[:, 1] + b[:, 3]
+
+    inter_w = np.clip(np.minimum(ax2[:, None], bx2[None, :]) - np.maximum(a[:, None, 0], b[None, :, 0]), 0, None)
+    inter_h = np.clip(np.minimum(ay2[:, None], by2[None, :]) - np.maximum(a[:, None, 1], b[None, :, 1]), 0, None)
+    intersection = inter_w * inter_h
+    union = (a[:, 2] * a[:, 3])[:, None] + (b[:, 2] * b[:, 3])[None, :] - intersection
+    return intersection / np.maximum(union, 1e-6)
+
+
+class Track:
+    """One object followed across frames"""
+
+    def __init__(self, track_id, detection):
+        self.id = track_id
+        self.label = detection['label']
+        self.class_id = detection['class_id']
+        self.confidence = detection['confidence']
+        self.box = np.array(detection['box'], dtype=np.float32)
+        self.velocity = np.zeros(4, dtype=np.float32)
+        self.hits = 1
+        self.misses = 0
+        self.frames_since_update = 0
+
+    def predict(self):
+        self.box = self.box + self.velocity
+        # Keep width and height usable for drawing and distance estimates
+        self.box[2:] = np.maximum(self.box[2:], 1)
+        self.frames_since_update += 1
+
+    def update(self, detection):
+        box = np.array(detection['box'], dtype=np.float32)
+        # The prediction already advanced self.box, so measure motion from where the track was last seen
+        steps = max(self.frames_since_update, 1)
+        last_seen = self.box - self.velocity * self.frames_since_update
+        self.velocity = (box - last_seen) / steps
+        self.box = box
+        self.confidence = detection['confidence']
+        self.hits += 1
+        self.misses = 0
+        self.frames_since_update = 0
+
+    def speed(self):
+        """Centroid motion per frame relative to the box size"""
+        size = max(float(self.box[2]), float(self.box[3]), 1.0)
+        return float(np.hypot(self.velocity[0] + self.velocity[2] / 2,
+                              self.velocity[1] + self.velocity[3] / 2)) / size
+
+
+class IouTracker:
+    """Associates keyframe detections with existing tracks by class and IoU"""
+
+    def __init__(self, iou_threshold=0.3, max_misses=2):
+        self.iou_threshold = iou_threshold
+        self.max_misses = max_misses
+        self.tracks = []
+        self._ids = itertools.count(1)
+        self.new_tracks = 0
+
+    def update(self, detections):
+        """Match fresh detections to tracks; returns the detections with track ids set"""
+        self.new_tracks = 0
+        matched_tracks = set()
+        matched_detections = set()
+
+        if self.tracks and detections:
+            ious = iou_matrix([track.box for track in self.tracks],
+                              [detection['box'] for detection in detections])
+            # A track can only continue as the same class
+            track_classes = np.array([track.class_id for track in self.tracks])
+            detection_classes = np.array([detection['class_id'] for detection in detections])
+            ious[track_classes[:, None] != detection_classes[None, :]] = 0
+
+            # Greedy assignment, best overlap first
+            for flat in np.argsort(ious, axis=None)[::-1]:
+                t, d = divmod(int(flat), len(detections))
+                if ious[t, d] < self.iou_threshold:
+                    break
+                if t in matched_tracks or d in matched_detections:
+                    continue
+                self.tracks[t].update(detections[d])
+                detections[d]['track_id'] = self.tracks[t].id
+                matched_tracks.add(t)
+                matched_detections.add(d)
+
+        survivors = []
+        for index, track in enumerate(self.tracks):
+            if index not in matched_tracks:
+                track.misses += 1
+                if track.misses > self.max_misses:
+                    continue
+            survivors.append(track)
+
+        for index, detection in enumerate(detections):
+            if index not in matched_detections:
+                track = Track(next(self._ids), detection)
+                detection['track_id'] = track.id
+                survivors.append(track)
+                self.new_tracks += 1
+
+        self.tracks = survivors
+        return detections
+
+    def predict(self, build_detection):
+        """Advance every track one frame and return detections built from the predicted boxes
+
+        As on keyframes, a track the last keyframe did not match is kept for
+        re-association but not reported, so its box does not flicker.
+        """
+        detections = []
+        for track in self.tracks:
+            track.predict()
+            if track.misses:
+                continue
+            x, y, w, h = (int(value) for value in track.box)
+            detection = build_detection(track.label, track.class_id, track.confidence, (x, y, w, h))
+            detection['track_id'] = track.id
+            detections.append(detection)
+        return detections
+
+    def max_speed(self):
+        return max((track.speed() for track in self.tracks), default=0.0)
+
+
+class KeyframeScheduler:
+    """Decides which frames run the full detector
+
+    With adaptive scheduling the interval shrinks to min_interval whenever
+    something is close, new or moving fast, and grows back by one frame at a
+    time while the scene is stable.
+    """
+
+    def __init__(self, interval=3, adaptive=True, min_interval=1, max_interval=8, fast_motion=0.08):
+        self.interval = max(1, interval)
+        self.adaptive = adaptive
+        self.min_interval = max(1, min_interval)
+        self.max_interval = max(self.min_interval, max_interval)
+        self.fast_motion = fast_motion
+        self._since_keyframe = None
+
+    def is_keyframe(self):
+        if self._since_keyframe is None or self._since_keyframe + 1 >= self.interval:
+            self._since_keyframe = 0
+            return True
+        self._since_keyframe += 1
+        return False
+
+    def retry(self):
+        """Make the next frame a keyframe again, e.g. after detection failed"""
+        self._since_keyframe = None
+
+    def adjust(self, detections, tracker):
+        """Update the interval after a keyframe from what the detector just saw"""
+        if not self.adaptive:
+            return
+        urgent = (any(detection['warning'] for detection in detections)
+                  or tracker.new_tracks > 0
+                  or tracker.max_speed() > self.fast_motion)
+        if urgent:
+            self.interval = self.min_interval
+        else:
+            self.interval = min(self.interval + 1, self.max_interval)
@@ -0,0 +1,386 @@
+"""
+Multi-process inference worker pool
+Each worker process holds its own loaded network and runs blob, forward and
+decode/NMS outside the web process's GIL. Frames go to the workers and
+detections come back through multiprocessing.shared_memory ring buffers;
+only small (slot, shape, profile) tuples travel through the queues.
+
+A worker that dies is replaced; the frame it was holding fails with a
+WorkerError and its slot is freed. A profile switch is warmed in the
+workers, so the web process never loads a network in pool mode.
+"""
+
+import atexit
+import multiprocessing
+import os
+import queue
+import threading
+import time
+from multiprocessing import shared_memory
+
+import cv2
+import numpy as np
+
+import metrics
+from config import Config
+
+# Rows of (x, y, w, h, confidence, class id) a slot can hold after NMS
+MAX_DETECTIONS = 256
+OUTPUT_SLOT_BYTES = MAX_DETECTIONS * 6 * 4
+# A worker that keeps dying (e.g. out of memory while loading) is restarted at most this often
+RESPAWN_INTERVAL = 5.0
+# How often an idle worker checks for a profile to warm, and how long a switch waits for all of them
+IDLE_POLL_SECONDS = 1.0
+WARM_TIMEOUT = 300.0
+
+
+class WorkerError(RuntimeError):
+    """An inference worker failed, died or timed out on a frame"""
+
+
+def _worker_main(worker_id, input_name, output_name, slot_bytes, tasks, results, threads, current, wanted):
+    """Worker process loop: read a frame from its input slot, write detections to its output slot
+
+    current[worker_id] holds the slot being worked on (-1 when idle), so the
+    parent knows which frame was lost if this process dies. While idle the
+    worker loads and warms the profile named in wanted, keeping the current
+    network until a frame asks for the new one.
+    """
+    # Imported here so the parent never pays for them just to start the pool
+    from frame_buffers import FrameBuffers
+    from model_registry import registry
+    from sysinfo import release_freed_memory
+    from yolo_postprocess import decode_outputs, batched_nms
+
+    cv2.setNumThreads(threads)
+    input_memory = shared_memory.SharedMemory(name=input_name)
+    output_memory = shared_memory.SharedMemory(name=output_name)
+    buffers = FrameBuffers()
+    model = warmed = None
+    tried = ''
+
+    def load(profile_name):
+        profile = Config.DETECTOR_PROFILES[profile_name]
+        return registry.get(cfg_path=profile['config'], weights_path=profile['weights'],
+                            classes_path=Config.YOLO_CLASSES_PATH, input_size=profile['input_size'])
+
+    try:
+        while True:
+            try:
+                task = tasks.get(timeout=IDLE_POLL_SECONDS)
+            except queue.Empty:
+                name = wanted.value.decode()
+                if name and name != tried:
+                    tried = name
+                    started = time.perf_counter()
+                    try:
+                        warmed = load(name)
+                        error = None
+                    except Exception as e:
+                        error = str(e)
+                    results.put((-1, 0, worker_id, os.getpid(), time.perf_counter() - started, 0.0, error, name))
+                continue
+            if task is None:
+                break
+            slot, shape, width, height, profile_name, confidence, nms = task
+            current[worker_id] = slot
+            started = time.perf_counter()
+            try:
+                loaded = load(profile_name)
+                if any(other is not None and other is not loaded for other in (model, warmed)):
+                    # Profile switch: drop the other networks rather than keep every profile loaded
+                    for other in (model, warmed):
+                        if other is not None and other is not loaded:
+                            registry.discard(other)
+                    model = warmed = buffers = None
+                    release_freed_memory()
+                    buffers = FrameBuffers()
+                model = loaded
+                frame = np.ndarray(shape, dtype=np.uint8, buffer=input_memory.buf, offset=slot * slot_bytes)
+                outs = buffers.forward(model, frame)
+                forward_seconds = time.perf_counter() - started
+
+                # Decode against the original frame size, so a downscaled hand-off still gives full-size boxes
+                boxes, confidences, class_ids = decode_outputs(outs, width, height, confidence, buffers.decode)
+                keep = batched_nms(boxes, confidences, class_ids, confidence, nms)[:MAX_DETECTIONS]
+                count = len(keep)
+                output = np.ndarray((MAX_DETECTIONS, 6), dtype=np.float32, buffer=output_memory.buf,
+                                    offset=slot * OUTPUT_SLOT_BYTES)
+                output[:count, :4] = boxes[keep]
+                output[:count, 4] = confidences[keep]
+                output[:count, 5] = class_ids[keep]
+                busy = time.perf_counter() - started
+                result = (slot, count, worker_id, os.getpid(), busy, forward_seconds, None, profile_name)
+            except Exception as e:
+                result = (slot, 0, worker_id, os.getpid(), time.perf_counter() - started, 0.0, str(e), profile_name)
+            current[worker_id] = -1
+            results.put(result)
+    finally:
+        input_memory.close()
+        output_memory.close()
+
+
+class _WorkerStats:
+    def __init__(self):
+        self.pid = None
+        self.tasks = 0
+        self.errors = 0
+        self.restarts = 0
+        self.spawned_at = 0.0
+        self.busy_seconds = 0.0
+        self.warmed = None
+        self.warm_error = None
+
+
+class InferencePool:
+    """Runs keyframe detection on a pool of worker processes
+
+    The ring has workers * queue_depth slots; a caller waits for a free
+    slot, so at most that many frames are ever in flight.
+    """
+
+    def __init__(self, workers=2, queue_depth=2, max_width=1920, max_height=1080, timeout=30.0):
+        self.workers = max(1, workers)
+        self.queue_depth = max(1, queue_depth)
+        self.slots = self.workers * self.queue_depth
+        self.max_width = max_width
+        self.max_height = max_height
+        self.slot_bytes = max_width * max_height * 3
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._processes = []
+        self._input = None
+        self._output = None
+        self._started_at = None
+        self._free = queue.Queue()
+        # Slots whose caller gave up; each goes back to _free once its late result arrives
+        self._abandoned = set()
+        self._done = [threading.Event() for _ in range(self.slots)]
+        self._results = [None] * self.slots
+        self._stats = [_WorkerStats() for _ in range(self.workers)]
+        # spawn, not fork: the web process has threads and an OpenCV runtime that must not be copied
+        self._context = multiprocessing.get_context('spawn')
+        # Profile the workers load and warm while idle, set by warm()
+        self._wanted = self._context.Array('c', 64)
+        self._warm_cond = threading.Condition()
+
+    @property
+    def running(self):
+        return bool(self._processes)
+
+    def start(self):
+        """Create the shared rings and spawn the workers (once)"""
+        with self._lock:
+            if self._processes:
+                return self
+            self._input = shared_memory.SharedMemory(create=True, size=self.slots * self.slot_bytes)
+            self._output = shared_memory.SharedMemory(create=True, size=self.slots * OUTPUT_SLOT_BYTES)
+            self._tasks = self._context.Queue()
+            self._result_queue = self._context.Queue()
+            self._current = self._context.Array('i', [-1] * self.workers, lock=False)
+            # Split the cores between workers instead of every worker starting a thread per core
+            self._threads = max(1, (os.cpu_count() or 1) // self.workers)
+            self._processes = [self._spawn(worker_id) for worker_id in range(self.workers)]
+            for slot in range(self.slots):
+                self._free.put(slot)
+            self._started_at = time.perf_counter()
+            self._collector = threading.Thread(target=self._collect_results, name='inference-pool-results',
+                                               daemon=True)
+            self._collector.start()
+            print(f"Started {self.workers} inference workers ({self.slots} shared-memory slots, "
+                  f"{self._threads} OpenCV threads each)")
+        return self
+
+    def _spawn(self, worker_id):
+        process = self._context.Process(target=_worker_main, name=f'inference-worker-{worker_id}', daemon=True,
+                                        args=(worker_id, self._input.name, self._output.name, self.slot_bytes,
+                                              self._tasks, self._result_queue, self._threads, self._current,
+                                              self._wanted))
+        process.start()
+        stats = self._stats[worker_id]
+        stats.pid = process.pid
+        stats.spawned_at = time.monotonic()
+        stats.warmed = stats.warm_error = None
+        return process
+
+    def warm(self, profile_name, timeout=WARM_TIMEOUT):
+        """Have every worker load and warm profile_name, returning once all of them hold it
+
+        Raises WorkerError if a worker fails to load it or they are not done
+        within timeout. Before start() it only records the profile, which the
+        workers then load as soon as they are up.
+        """
+        deadline = time.monotonic() + timeout
+        with self._warm_cond:
+            self._wanted.value = profile_name.encode()
+            while self.running:
+                errors = [stats.warm_error for stats in self._stats if stats.warmed == profile_name and stats.warm_error]
+                if errors:
+                    raise WorkerError(f"Inference worker failed to load {profile_name}: {errors[0]}")
+                if all(stats.warmed == profile_name for stats in self._stats):
+                    return
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise WorkerError(f"Inference workers did not load {profile_name} within {timeout:.0f}s")
+                # Also wakes up now and then so a respawned worker is waited for too
+                self._warm_cond.wait(min(remaining, RESPAWN_INTERVAL))
+                self._replace_dead_workers()
+
+    def _replace_dead_workers(self):
+        """Respawn workers that have exited and fail the frame each was holding"""
+        with self._lock:
+            for worker_id, process in enumerate(self._processes):
+                if process.is_alive():
+                    continue
+                slot = self._current[worker_id]
+                if slot >= 0:
+                    self._current[worker_id] = -1
+                    self._finish(slot, 0, f"worker {worker_id} exited with code {process.exitcode}")
+                if time.monotonic() - self._stats[worker_id].spawned_at < RESPAWN_INTERVAL:
+                    continue
+                print(f"Inference worker {worker_id} (pid {process.pid}) exited with code {process.exitcode}; "
+                      f"restarting it")
+                self._stats[worker_id].restarts += 1
+                self._processes[worker_id] = self._spawn(worker_id)
+
+    def _finish(self, slot, count, error):
+        """Hand a slot's result to its caller, or back to the ring if the caller gave up (under _lock)"""
+        self._results[slot] = (count, error)
+        self._done[slot].set()
+        if slot in self._abandoned:
+            self._abandoned.discard(slot)
+            self._free.put(slot)
+
+    def _holder(self, slot):
+        for worker_id in range(self.workers):
+            if self._current[worker_id] == slot:
+                return worker_id
+        return None
+
+    def close(self):
+        with self._lock:
+            if not self._processes:
+                return
+            for _ in self._processes:
+                self._tasks.put(None)
+            for process in self._processes:
+                process.join(timeout=5)
+                if process.is_alive():
+                    process.terminate()
+            self._processes = []
+            self._result_queue.put(None)
+            self._collector.join(timeout=5)
+            for memory in (self._input, self._output):
+                memory.close()
+                memory.unlink()
+
+    def detect(self, frame, profile_name, profile):
+        """Run detection for one frame on a worker; returns (boxes, confidences, class_ids)"""
+        height, width = frame.shape[:2]
+        if width > self.max_width or height > self.max_height:
+            scale = min(self.max_width / width, self.max_height / height)
+            frame = cv2.resize(frame, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+
+        try:
+            slot = self._free.get(timeout=self.timeout)
+        except queue.Empty:
+            raise WorkerError(f"No free inference slot within {self.timeout:.0f}s")
+        try:
+            target = np.ndarray(frame.shape, dtype=np.uint8, buffer=self._input.buf, offset=slot * self.slot_bytes)
+            target[...] = frame
+            self._done[slot].clear()
+            self._tasks.put((slot, frame.shape, width, height, profile_name,
+                             profile['confidence'], profile['nms']))
+            deadline = time.monotonic() + self.timeout
+            suspect = None
+            while not self._done[slot].wait(0.5):
+                self._replace_dead_workers()
+                if time.monotonic() < deadline or self._done[slot].is_set():
+                    continue
+                worker_id = self._holder(slot)
+                if worker_id is None:
+                    # Still queued behind slower frames: a worker will still write to the slot, so
+                    # it only goes back to the ring when that late result arrives
+                    with self._lock:
+                        if self._done[slot].is_set():
+                            continue
+                        self._abandoned.add(slot)
+                    slot = None
+                    raise WorkerError(f"No inference result within {self.timeout:.0f}s")
+                if worker_id != suspect:
+                    # It may only just have picked the frame up: give it a full timeout of its own
+                    suspect = worker_id
+                    deadline = time.monotonic() + self.timeout
+                    continue
+                # Stuck on this frame: replace the worker, which fails the frame and frees the slot
+                self._processes[worker_id].terminate()
+                self._processes[worker_id].join(timeout=5)
+                deadline = time.monotonic() + self.timeout
+            count, error = self._results[slot]
+            if error is not None:
+                raise WorkerError(f"Inference worker failed: {error}")
+            output = np.ndarray((MAX_DETECTIONS, 6), dtype=np.float32, buffer=self._output.buf,
+                                offset=slot * OUTPUT_SLOT_BYTES)[:count]
+            return (output[:, :4].astype(np.int32), output[:, 4].copy(), output[:, 5].astype(np.int32))
+        finally:
+            if slot is not None:
+                self._free.put(slot)
+
+    def _collect_results(self):
+        while True:
+            result = self._result_queue.get()
+            if result is None:
+                return
+            slot, count, worker_id, pid, busy, forward_seconds, error, profile_name = result
+            stats = self._stats[worker_id]
+            stats.pid = pid
+            if slot < 0:
+                with self._warm_cond:
+                    stats.warmed, stats.warm_error = profile_name, error
+                    self._warm_cond.notify_all()
+                continue
+            stats.tasks += 1
+            stats.busy_seconds += busy
+            if error is not None:
+                stats.errors += 1
+            else:
+                metrics.INFERENCE_SECONDS.observe(forward_seconds)
+                metrics.DECODE_SECONDS.observe(busy - forward_seconds)
+            with self._lock:
+                self._finish(slot, count, error)
+
+    def stats(self):
+        elapsed = time.perf_counter() - self._started_at if self._started_at else 0.0
+        return {
+            'workers': self.workers,
+            'queue_depth': self.queue_depth,
+            'slots': self.slots,
+            'in_flight': self.slots - self._free.qsize() if self.running else 0,
+            'per_worker': [{
+                'worker': worker_id,
+                'pid': stats.pid,
+                'tasks': stats.tasks,
+                'errors': stats.errors,
+                'restarts': stats.restarts,
+                'mean_ms': round(stats.busy_seconds / stats.tasks * 1000, 1) if stats.tasks else 0.0,
+                'utilization': round(stats.busy_seconds / elapsed, 3) if elapsed else 0.0,
+            } for worker_id, stats in enumerate(self._stats)],
+        }
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    """Return the process-wide worker pool, or None when INFERENCE_WORKERS is 0"""
+    global _pool
+    if Config.INFERENCE_WORKERS <= 0:
+        return None
+    with _pool_lock:
+        if _pool is None:
+            _pool = InferencePool(Config.INFERENCE_WORKERS, Config.INFERENCE_WORKER_QUEUE_DEPTH,
+                                  Config.INFERENCE_WORKER_MAX_WIDTH, Config.INFERENCE_WORKER_MAX_HEIGHT,
+                                  Config.INFERENCE_WORKER_TIMEOUT)
+            atexit.register(_pool.close)
+    return _pool
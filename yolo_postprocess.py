@@ -0,0 +1,96 @@
+"""
+Vectorized YOLO output decoding and class-aware non-max suppression
+Shared by the web stream in app.py and the standalone detect.py script
+"""
+
+import cv2
+import numpy as np
+
+
+def decode_outputs(outs, width, height, conf_threshold=0.5, scratch=None):
+    """Decode raw YOLO output layers into pixel boxes, confidences and class ids
+
+    Returns boxes as an (N, 4) int32 array of [x, y, w, h], confidences as an
+    (N,) float32 array and class_ids as an (N,) int32 array, keeping only rows
+    whose best class score is above conf_threshold. With a DecodeScratch the
+    full-size work arrays are reused; only candidate rows are allocated.
+    """
+    columns = outs[0].shape[-1]
+    rows = sum(out.size // columns for out in outs)
+    if len(outs) == 1:
+        detections = outs[0].reshape(-1, columns)
+    elif scratch is not None:
+        detections = np.concatenate([out.reshape(-1, columns) for out in outs],
+                                    out=scratch.rows(rows, columns))
+    else:
+        detections = np.concatenate([out.reshape(-1, columns) for out in outs])
+
+    # Darknet region layers already scale class scores by objectness, so a row whose
+    # objectness is below the threshold can never pass; dropping those first means the
+    # per-class argmax only runs over a few candidate rows instead of every anchor
+    objectness = detections[:, 4]
+    if scratch is not None:
+        candidates = np.greater(objectness, conf_threshold, out=scratch.mask(rows))
+    else:
+        candidates = objectness > conf_threshold
+    if not candidates.any():
+        return (np.empty((0, 4), dtype=np.int32),
+                np.empty(0, dtype=np.float32),
+                np.empty(0, dtype=np.int32))
+    detections = detections[candidates]
+
+    scores = detections[:, 5:]
+    class_ids = scores.argmax(axis=1)
+    confidences = np.take_along_axis(scores, class_ids[:, None], axis=1).ravel()
+
+    mask = confidences > conf_threshold
+    if not mask.any():
+        return (np.empty((0, 4), dtype=np.int32),
+                np.empty(0, dtype=np.float32),
+                np.empty(0, dtype=np.int32))
+
+    detections = detections[mask]
+    confidences = confidences[mask].astype(np.float32)
+    class_ids = class_ids[mask].astype(np.int32)
+
+    # Same truncation as int() in the original per-row loop
+    centers_x = (detections[:, 0] * width).astype(np.int32)
+    centers_y = (detections[:, 1] * height).astype(np.int32)
+    widths = (detections[:, 2] * width).astype(np.int32)
+    heights = (detections[:, 3] * height).astype(np.int32)
+
+    boxes = np.empty((len(detections), 4), dtype=np.int32)
+    boxes[:, 0] = centers_x - widths // 2
+    boxes[:, 1] = centers_y - heights // 2
+    boxes[:, 2] = widths
+    boxes[:, 3] = heights
+    return boxes, confidences, class_ids
+
+
+def batched_nms(boxes, confidences, class_ids, score_threshold=0.5, nms_threshold=0.4):
+    """Run per-class non-max suppression and return the kept row indices as an int array"""
+    if len(boxes) == 0:
+        return np.empty(0, dtype=np.int32)
+
+    if hasattr(cv2.dnn, 'NMSBoxesBatched'):
+        indexes = cv2.dnn.NMSBoxesBatched(boxes.tolist(), confidences.tolist(), class_ids.tolist(),
+                                          score_threshold, nms_threshold)
+    else:
+        # OpenCV < 4.7: shift each class into its own region so boxes of
+        # different classes never overlap, then run one plain NMS
+        span = int((boxes[:, :2] + boxes[:, 2:]).max() - boxes[:, :2].min()) + 1
+        offsets = class_ids.astype(np.int64) * span
+        shifted = boxes.astype(np.int64)
+        shifted[:, 0] += offsets
+        shifted[:, 1] += offsets
+        indexes = cv2.dnn.NMSBoxes(shifted.tolist(), confidences.tolist(),
+                                   score_threshold, nms_threshold)
+
+    return np.asarray(indexes, dtype=np.int32).reshape(-1)
+
+
+def postprocess(outs, width, height, conf_threshold=0.5, nms_threshold=0.4, scratch=None):
+    """Decode YOLO outputs and apply NMS, returning only the kept boxes, confidences and class ids"""
+    boxes, confidences, class_ids = decode_outputs(outs, width, height, conf_threshold, scratch)
+    keep = batched_nms(boxes, confidences, class_ids, conf_threshold, nms_threshold)
+    return boxes[keep], confidences[keep], class_ids[keep]